@@ -0,0 +1,206 @@
+"""
+AI_Client.py
+------------
+Async chat-completion client shared by the AI endpoints.
+
+- one AsyncOpenAI client per API key (LRU), all on one pooled httpx client
+- global + per-key semaphores, with queue-time metrics
+- timeouts and retries delegated to the OpenAI SDK
+- singleflight: identical in-flight prompts of the same API key share one
+  upstream call
+- token streaming for the SSE endpoints
+
+Set OPENAI_BASE_URL (e.g. http://127.0.0.1:8001/v1 with Stub_LLM.py) to
+point it at a local stub of the chat-completions endpoint.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import httpx
+from openai import AsyncOpenAI
+
+from Metrics import LLM_LATENCY
+
+BASE_URL = os.environ.get("OPENAI_BASE_URL")  # None → api.openai.com
+TIMEOUT = float(os.environ.get("FINNLP_LLM_TIMEOUT", 60))
+MAX_RETRIES = int(os.environ.get("FINNLP_LLM_RETRIES", 2))
+GLOBAL_CONCURRENCY = int(os.environ.get("FINNLP_LLM_CONCURRENCY", 32))
+PER_KEY_CONCURRENCY = int(os.environ.get("FINNLP_LLM_PER_KEY", 4))
+MAX_CLIENTS = 128
+
+
+def _fingerprint(value: str) -> str:
+    # API keys never appear in logs/metrics, only a short hash of them
+    return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+
+class AIClient:
+    def __init__(self, base_url: str | None = BASE_URL, timeout: float = TIMEOUT,
+                 max_retries: int = MAX_RETRIES, global_limit: int = GLOBAL_CONCURRENCY,
+                 per_key_limit: int = PER_KEY_CONCURRENCY):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.global_limit = global_limit
+        self.per_key_limit = per_key_limit
+        self._http = None
+        self._clients = OrderedDict()   # key fingerprint -> AsyncOpenAI
+        self._global = None
+        # key fingerprint -> Semaphore, dropped once no call holds a reference to it
+        self._per_key = weakref.WeakValueDictionary()
+        self._inflight = {}             # request fingerprint -> Task
+        self.metrics = {
+            "requests": 0, "upstream_calls": 0, "coalesced": 0, "errors": 0,
+            "waiting": 0, "active": 0,
+            "queue_time_total": 0.0, "queue_time_max": 0.0,
+            "upstream_time_total": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    # ------------------------------------------------------
+    # CLIENTS
+    # ------------------------------------------------------
+    def _client(self, api_key: str) -> AsyncOpenAI:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.global_limit * 2,
+                                    max_keepalive_connections=self.global_limit),
+                timeout=self.timeout,
+            )
+        fp = _fingerprint(api_key)
+        client = self._clients.get(fp)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, base_url=self.base_url, http_client=self._http,
+                                 timeout=self.timeout, max_retries=self.max_retries)
+            self._clients[fp] = client
+            while len(self._clients) > MAX_CLIENTS:
+                self._clients.popitem(last=False)  # the shared httpx pool stays open
+        self._clients.move_to_end(fp)
+        return client
+
+    def _semaphores(self, api_key: str):
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.global_limit)
+        fp = _fingerprint(api_key)
+        key_sem = self._per_key.get(fp)
+        if key_sem is None:
+            # an idle semaphore has all its slots free: recreating it is equivalent
+            key_sem = self._per_key[fp] = asyncio.Semaphore(self.per_key_limit)
+        return self._global, key_sem
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self._clients.clear()
+        self._per_key.clear()
+        self._global = None
+
+    # ------------------------------------------------------
+    # COMPLETIONS
+    # ------------------------------------------------------
+    @asynccontextmanager
+    async def _slot(self, api_key: str, kind: str):
+        """Hold a per-key + global concurrency slot, recording queue and upstream time."""
+        m = self.metrics
+        global_sem, key_sem = self._semaphores(api_key)
+        queued = time.perf_counter()
+        m["waiting"] += 1
+        acquired = False
+        try:
+            async with key_sem, global_sem:
+                acquired = True
+                waited = time.perf_counter() - queued
+                m["waiting"] -= 1
+                m["queue_time_total"] += waited
+                m["queue_time_max"] = max(m["queue_time_max"], waited)
+                m["active"] += 1
+                m["upstream_calls"] += 1
+                start = time.perf_counter()
+                try:
+                    yield
+                finally:
+                    elapsed = time.perf_counter() - start
+                    m["active"] -= 1
+                    m["upstream_time_total"] += elapsed
+                    LLM_LATENCY.observe(elapsed, kind)
+        finally:
+            if not acquired:
+                m["waiting"] -= 1
+
+    def _count_usage(self, usage):
+        if usage is not None:
+            self.metrics["prompt_tokens"] += usage.prompt_tokens or 0
+            self.metrics["completion_tokens"] += usage.completion_tokens or 0
+
+    async def _call(self, api_key: str, model: str, prompt: str) -> str:
+        async with self._slot(api_key, "complete"):
+            response = await self._client(api_key).chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+        self._count_usage(response.usage)
+        return response.choices[0].message.content.strip()
+
+    async def complete(self, api_key: str, prompt: str, model: str) -> str:
+        """Chat completion for a single user prompt; coalesces identical in-flight prompts per API key."""
+        self.metrics["requests"] += 1
+        # the key is part of it: a caller never gets a result (or error) billed to another key
+        key = _fingerprint(f"{_fingerprint(api_key)}\x00{model}\x00{prompt}")
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(api_key, model, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        else:
+            self.metrics["coalesced"] += 1
+        try:
+            # shield: a cancelled caller must not cancel the call other callers share
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+
+    async def stream(self, api_key: str, prompt: str, model: str):
+        """Async generator of completion text deltas (no coalescing: each caller streams)."""
+        self.metrics["requests"] += 1
+        async with self._slot(api_key, "stream"):
+            try:
+                response = await self._client(api_key).chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                # closed on every exit, including a caller that stops reading early
+                async with response:
+                    async for chunk in response:
+                        self._count_usage(chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            except Exception:
+                self.metrics["errors"] += 1
+                raise
+
+    def stats(self) -> dict:
+        m = dict(self.metrics)
+        calls = m["upstream_calls"]
+        m["queue_time_avg_ms"] = round(1000 * m.pop("queue_time_total") / calls, 3) if calls else 0.0
+        m["queue_time_max_ms"] = round(1000 * m.pop("queue_time_max"), 3)
+        m["upstream_time_avg_ms"] = round(1000 * m.pop("upstream_time_total") / calls, 3) if calls else 0.0
+        m["in_flight"] = len(self._inflight)
+        m["clients"] = len(self._clients)
+        m["keys_active"] = len(self._per_key)
+        return m
+
+
+# Shared client used by the API
+ai_client = AIClient()
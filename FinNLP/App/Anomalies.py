@@ -0,0 +1,418 @@
+"""
+Anomalies.py
+------------
+Unusual spending, scored with robust z-scores per merchant and per category.
+
+- amount:    an expense is compared with the median / MAD of the same
+             merchant's (and category's) expenses over the previous
+             WINDOW_MONTHS months: z = 0.6745 * (amount - median) / MAD
+- frequency: a group's number of expenses in a week is compared with the
+             median / MAD of its previous WINDOW_WEEKS weekly counts
+
+Everything is vectorized with numpy. Per group the state is a log-scale
+amount histogram per month (BINS bins from LOW to HIGH, so a window's
+median and MAD come from summed histograms, not from the rows) and a count
+per week. A full pass reads the expenses once, in rowid ranges spread over
+worker processes for large tables. Afterwards, rows appended since the
+last pass are scored against the current state and then added to it; a
+new full pass runs only when the table changed in any other way: a row
+was updated or deleted (`meta.rewrites` moved, whatever column changed)
+or the expense count / total in insights_summary do not match the rows
+appended.
+
+Amounts are compared as stored (no FX conversion) and a row is scored
+when its window holds at least MIN_HISTORY expenses. Each tenant has its
+own detector (current_detector), the MAX_OPEN_SHARDS most recently used are
+kept in memory.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from Database import (MAX_OPEN_SHARDS, ConnectionPool, current_tenant, data_version, gc_paused,
+                      pool as default_pool, rewrite_count)
+
+THRESHOLD = 3.5                 # |z| above which a value is an anomaly (Iglewicz-Hoaglin)
+WINDOW_MONTHS = 6
+WINDOW_WEEKS = 8
+MIN_HISTORY = 20                # expenses needed in the amount window
+MIN_BURST = 5                   # expenses needed in a flagged week
+BINS = 160
+LOW, HIGH = 0.1, 1e6            # histogram range of |amount|
+MIN_MAD_FRACTION = 0.05         # MAD floor, as a fraction of the median
+MAX_GROUPS = 2000               # per key; smaller merchants are scored by category only
+READ_CHUNK = 500_000            # rowids per read task
+PARALLEL_MIN_ROWS = 2_000_000   # below this, one process reads everything
+WORKERS = int(os.environ.get("FINNLP_ANOMALY_WORKERS", os.cpu_count() or 1))
+KEYS = ("merchant", "category")
+
+_STEP = (math.log(HIGH) - math.log(LOW)) / BINS
+_CENTERS = np.exp(math.log(LOW) + (np.arange(BINS) + 0.5) * _STEP)
+_EPOCH_MONDAY = 3               # 1970-01-01 is a Thursday
+
+SELECT = ("SELECT rowid, date, -amount, merchant, category FROM transactions "
+          "WHERE amount < 0 AND rowid > ? AND rowid <= ?")
+
+
+# ----------------------------------------------------------
+# READ
+# ----------------------------------------------------------
+def _columns(rows: list) -> dict:
+    """Rows of SELECT → numpy columns, keys factorized per chunk."""
+    if not rows:
+        empty = {k: (np.empty(0, dtype=np.int64), []) for k in KEYS}
+        return {"rowid": np.empty(0, dtype=np.int64), "day": np.empty(0, dtype=np.int64),
+                "amount": np.empty(0), **empty}
+    rowid, day, amount, merchant, category = zip(*rows)
+    out = {
+        "rowid": np.fromiter(rowid, dtype=np.int64, count=len(rows)),
+        "day": np.array(day, dtype="datetime64[D]").astype(np.int64),
+        "amount": np.fromiter(amount, dtype=np.float64, count=len(rows)),
+    }
+    for key, values in zip(KEYS, (merchant, category)):
+        codes, names = pd.factorize(pd.Series(values, dtype=object))
+        out[key] = (codes.astype(np.int64), list(names))
+    return out
+
+
+def _read_range(path: str, lo: int, hi: int) -> dict:
+    """Worker process: expenses with lo < rowid <= hi from a read-only connection."""
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        with gc_paused():
+            return _columns(conn.execute(SELECT, (lo, hi)).fetchall())
+    finally:
+        conn.close()
+
+
+def _recode(codes: np.ndarray, names: list, index: pd.Index) -> np.ndarray:
+    """Codes into `names` → codes into `index` (-1 for missing values and unknown names)."""
+    if not names:
+        return np.full(len(codes), -1, dtype=np.int64)
+    mapping = index.get_indexer(pd.Index(names, dtype=object))
+    return np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1)
+
+
+def _concat(parts: list) -> dict:
+    """Merge chunks, re-coding each key against one global list of names."""
+    out = {c: np.concatenate([p[c] for p in parts]) for c in ("rowid", "day", "amount")}
+    for key in KEYS:
+        index = pd.Index(pd.unique(pd.Series([n for p in parts for n in p[key][1]], dtype=object)))
+        codes = np.concatenate([_recode(*p[key], index) for p in parts])
+        out[key] = (codes, list(index))
+    return out
+
+
+def read_expenses(db_pool: ConnectionPool, after: int = 0) -> tuple[dict, int]:
+    """All expenses with rowid > `after` as numpy columns, plus the max rowid seen."""
+    with db_pool.read() as conn:
+        (hi,) = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM transactions").fetchone()
+        if hi - after < PARALLEL_MIN_ROWS or WORKERS < 2:
+            with gc_paused():
+                return _columns(conn.execute(SELECT, (after, hi)).fetchall()), hi
+    bounds = list(range(after, hi, READ_CHUNK)) + [hi]
+    # spawn: the API process is multi-threaded, so no fork
+    with ProcessPoolExecutor(WORKERS, mp_context=get_context("spawn")) as ex:
+        parts = list(ex.map(_read_range, [str(db_pool.path)] * (len(bounds) - 1), bounds[:-1], bounds[1:]))
+    return _concat(parts), hi
+
+
+# ----------------------------------------------------------
+# ROBUST STATISTICS
+# ----------------------------------------------------------
+def _bins(amount: np.ndarray) -> np.ndarray:
+    b = np.floor((np.log(np.maximum(amount, LOW)) - math.log(LOW)) / _STEP)
+    return np.clip(b, 0, BINS - 1).astype(np.int64)
+
+
+def _window_stats(hist: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    hist (G, M, BINS) → n, median, MAD per (group, month) over the `window`
+    months before it (the month itself excluded).
+    """
+    cum = np.concatenate([np.zeros_like(hist[:, :1]), np.cumsum(hist, axis=1, dtype=np.int64)], axis=1)
+    months = np.arange(hist.shape[1])
+    win = cum[:, months] - cum[:, np.maximum(months - window, 0)]
+    n = win.sum(axis=-1)
+    half = n[..., None] / 2.0
+    cdf = np.cumsum(win, axis=-1)
+    b = np.minimum((cdf < half).sum(axis=-1), BINS - 1)
+    # linear interpolation inside the median bin (in log space)
+    before = np.take_along_axis(cdf, b[..., None], -1)[..., 0] - np.take_along_axis(win, b[..., None], -1)[..., 0]
+    inside = np.take_along_axis(win, b[..., None], -1)[..., 0]
+    frac = np.where(inside > 0, (n / 2.0 - before) / np.maximum(inside, 1), 0.5)
+    median = np.exp(math.log(LOW) + (b + np.clip(frac, 0, 1)) * _STEP)
+    # MAD: weighted median of |bin center - median|
+    dev = np.abs(_CENTERS - median[..., None])
+    order = np.argsort(dev, axis=-1)
+    wsum = np.cumsum(np.take_along_axis(win, order, -1), axis=-1)
+    k = np.minimum((wsum < half).sum(axis=-1), BINS - 1)
+    mad = np.take_along_axis(np.take_along_axis(dev, order, -1), k[..., None], -1)[..., 0]
+    return n, median, np.maximum(mad, MIN_MAD_FRACTION * median)
+
+
+def _rolling_counts(counts: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """counts (G, W) → median, MAD per (group, week) over the `window` weeks before it."""
+    padded = np.concatenate([np.zeros((counts.shape[0], window), counts.dtype), counts], axis=1)
+    win = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)[:, :counts.shape[1]]
+    median = np.median(win, axis=-1)
+    mad = np.median(np.abs(win - median[..., None]), axis=-1)
+    return median, mad
+
+
+def robust_z(value, median, mad):
+    return 0.6745 * (value - median) / mad
+
+
+# ----------------------------------------------------------
+# STATE
+# ----------------------------------------------------------
+def _grow(array: np.ndarray, axis: int, before: int, after: int) -> np.ndarray:
+    if before <= 0 and after <= 0:
+        return array
+    pad = [(0, 0)] * array.ndim
+    pad[axis] = (max(before, 0), max(after, 0))
+    return np.pad(array, pad)
+
+
+class Detector:
+    """Per-group histograms / weekly counts plus the anomalies found so far."""
+
+    def __init__(self, db_pool: ConnectionPool = default_pool):
+        self.db_pool = db_pool
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.version = None
+        self.last_rowid = 0
+        self.rewrites = None
+        self.n = 0
+        self.total = 0.0
+        self.month0 = self.week0 = None
+        self.groups = {k: pd.Index([], dtype=object) for k in KEYS}
+        self.hist = {k: np.zeros((0, 0, BINS), np.int32) for k in KEYS}
+        self.counts = {k: np.zeros((0, 0), np.int32) for k in KEYS}
+        self.amount = pd.DataFrame()
+        self.frequency = pd.DataFrame()
+        self.last_pass = {}
+
+    # ------------------------------------------------------
+    # REFRESH
+    # ------------------------------------------------------
+    def refresh(self) -> dict:
+        """Bring the state up to the current data version (incrementally when possible)."""
+        with self._lock:
+            with self.db_pool.read() as conn:
+                version, rewrites = data_version(conn), rewrite_count(conn)
+                row = conn.execute("SELECT n, total FROM insights_summary WHERE sign = -1").fetchone()
+            if version == self.version:
+                return self.last_pass
+            n, total = (row[0], -row[1]) if row else (0, 0.0)
+            start = time.perf_counter()
+            mode = "incremental"
+            # an update of date / merchant / category keeps count and total: only the counter shows it
+            if self.version is None or rewrites != self.rewrites or n < self.n:
+                mode = "full"
+            else:
+                data, hi = read_expenses(self.db_pool, self.last_rowid)
+                appended = (n == self.n + len(data["rowid"])
+                            and math.isclose(total, self.total + data["amount"].sum(), rel_tol=1e-9, abs_tol=1e-6))
+                if appended:
+                    self._apply(data, score=True)
+                else:
+                    mode = "full"
+            if mode == "full":
+                self._reset()
+                data, hi = read_expenses(self.db_pool)
+                self._apply(data, score=True)
+            self.version, self.rewrites, self.last_rowid, self.n, self.total = version, rewrites, hi, n, total
+            self.last_pass = {"mode": mode, "rows": int(len(data["rowid"])),
+                              "seconds": round(time.perf_counter() - start, 3), "data_version": version}
+            return self.last_pass
+
+    def _codes(self, key: str, data: dict) -> np.ndarray:
+        """Global group index per row (-1 = not tracked), adding new groups up to MAX_GROUPS."""
+        codes, names = data[key]
+        if not len(codes):
+            return codes
+        known = self.groups[key]
+        seen = pd.Series(codes[codes >= 0]).value_counts()
+        new = [names[c] for c in seen.index if names[c] not in known]
+        room = MAX_GROUPS - len(known)
+        if new and room > 0:
+            # most frequent first when the cap is reached
+            new = new[:room]
+            self.groups[key] = known.append(pd.Index(new, dtype=object))
+            self.hist[key] = _grow(self.hist[key], 0, 0, len(new))
+            self.counts[key] = _grow(self.counts[key], 0, 0, len(new))
+        return _recode(codes, names, self.groups[key])
+
+    def _axes(self, month: np.ndarray, week: np.ndarray):
+        """Extend the month / week axes (shared by every key) to cover the new rows."""
+        if self.month0 is None:
+            self.month0, self.week0 = int(month.min()), int(week.min())
+        months, weeks = self.hist[KEYS[0]].shape[1], self.counts[KEYS[0]].shape[1]
+        m_before, m_after = self.month0 - int(month.min()), int(month.max()) - (self.month0 + months - 1)
+        w_before, w_after = self.week0 - int(week.min()), int(week.max()) - (self.week0 + weeks - 1)
+        for key in KEYS:
+            self.hist[key] = _grow(self.hist[key], 1, m_before, m_after)
+            self.counts[key] = _grow(self.counts[key], 1, w_before, w_after)
+        self.month0 -= max(m_before, 0)
+        self.week0 -= max(w_before, 0)
+
+    def _apply(self, data: dict, score: bool):
+        """Score `data` against the state (before it is added), then add it."""
+        if not len(data["rowid"]):
+            return
+        day = data["day"]
+        month = day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        week = (day + _EPOCH_MONDAY) // 7
+        self._axes(month, week)
+        m, w = month - self.month0, week - self.week0
+        bins = _bins(data["amount"])
+        codes = {key: self._codes(key, data) for key in KEYS}
+
+        # Histograms first: a month's baseline only uses earlier months,
+        # so rows of the same batch never score against themselves
+        for key in KEYS:
+            g = codes[key]
+            ok = g >= 0
+            G, M, _ = self.hist[key].shape
+            W = self.counts[key].shape[1]
+            self.hist[key] += np.bincount(((g[ok] * M + m[ok]) * BINS + bins[ok]),
+                                          minlength=G * M * BINS).reshape(G, M, BINS).astype(np.int32)
+            self.counts[key] += np.bincount(g[ok] * W + w[ok], minlength=G * W).reshape(G, W).astype(np.int32)
+
+        if score:
+            self._score_amounts(data, codes, m)
+        self._score_frequency()
+
+    def _score_amounts(self, data: dict, codes: dict, m: np.ndarray):
+        scores = {}
+        for key in KEYS:
+            n, median, mad = _window_stats(self.hist[key], WINDOW_MONTHS)
+            g = codes[key]
+            ok = g >= 0
+            z = np.full(len(g), np.nan)
+            med = np.full(len(g), np.nan)
+            gi, mi = g[ok], m[ok]
+            valid = n[gi, mi] >= MIN_HISTORY
+            z_ok = np.where(valid, robust_z(data["amount"][ok], median[gi, mi], mad[gi, mi]), np.nan)
+            z[ok], med[ok] = z_ok, np.where(valid, median[gi, mi], np.nan)
+            scores[key] = (z, med)
+        best = np.fmax(scores["merchant"][0], scores["category"][0])
+        flagged = np.flatnonzero(best >= THRESHOLD)
+        if not len(flagged):
+            return
+        found = pd.DataFrame({
+            "rowid": data["rowid"][flagged],
+            "date": data["day"][flagged].astype("datetime64[D]").astype(str),
+            "amount": -data["amount"][flagged],
+            "score": np.round(best[flagged], 2),
+            **{f"{key}_score": np.round(scores[key][0][flagged], 2) for key in KEYS},
+            **{f"{key}_median": -np.round(scores[key][1][flagged], 2) for key in KEYS},
+        })
+        self.amount = pd.concat([self.amount, found], ignore_index=True) if len(self.amount) else found
+
+    def _score_frequency(self):
+        frames = []
+        for key in KEYS:
+            counts = self.counts[key]
+            if not counts.size:
+                continue
+            median, mad = _rolling_counts(counts, WINDOW_WEEKS)
+            # counts are at least Poisson-noisy: MAD no smaller than 0.6745 * sqrt(median)
+            z = robust_z(counts, median, np.maximum(mad, np.maximum(0.6745 * np.sqrt(median), 1.0)))
+            active = (counts > 0).argmax(axis=1)
+            history = np.arange(counts.shape[1])[None, :] >= active[:, None] + WINDOW_WEEKS
+            g, w = np.nonzero(history & (z >= THRESHOLD) & (counts >= MIN_BURST))
+            if not len(g):
+                continue
+            monday = ((w + self.week0) * 7 - _EPOCH_MONDAY).astype("datetime64[D]").astype(str)
+            frames.append(pd.DataFrame({
+                "by": key, "group": self.groups[key][g], "week": monday, "count": counts[g, w],
+                "median": median[g, w], "mad": mad[g, w], "score": np.round(z[g, w], 2),
+            }))
+        self.frequency = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    # ------------------------------------------------------
+    # QUERY
+    # ------------------------------------------------------
+    def page(self, kind: str = "amount", by: str = "all", min_score: float = THRESHOLD,
+             offset: int = 0, limit: int = 50) -> dict:
+        """Anomalies sorted by score (highest first), `limit` items from `offset`."""
+        state = self.refresh()
+        if kind == "amount":
+            frame = self.amount
+            column = "score" if by == "all" else f"{by}_score"
+            if len(frame):
+                frame = frame[frame[column] >= min_score].sort_values([column, "rowid"], ascending=False)
+        else:
+            frame = self.frequency
+            if len(frame):
+                frame = frame[frame["score"] >= min_score]
+                if by != "all":
+                    frame = frame[frame["by"] == by]
+                frame = frame.sort_values(["score", "week"], ascending=False)
+        items = frame.iloc[offset:offset + limit]
+        if kind == "amount":
+            items = self._with_details(items)
+        else:
+            items = items.to_dict(orient="records")
+        return {"kind": kind, "by": by, "min_score": min_score, "total": int(len(frame)),
+                "offset": offset, "limit": limit, "items": items, "state": state}
+
+    def _with_details(self, items: pd.DataFrame) -> list:
+        if not len(items):
+            return []
+        rowids = [int(r) for r in items["rowid"]]
+        with self.db_pool.read() as conn:
+            details = {r[0]: r[1:] for r in conn.execute(
+                "SELECT rowid, id, description, currency, merchant, category FROM transactions "
+                f"WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids)}
+        out = []
+        for item in items.to_dict(orient="records"):
+            extra = details.get(item.pop("rowid"))
+            if extra is None:
+                continue  # replaced since the last pass
+            out.append({**dict(zip(("id", "description", "currency", "merchant", "category"), extra)),
+                        **{k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in item.items()}})
+        return out
+
+    def stats(self) -> dict:
+        return {
+            **self.last_pass,
+            "groups": {k: len(v) for k, v in self.groups.items()},
+            "amount_anomalies": int(len(self.amount)),
+            "frequency_anomalies": int(len(self.frequency)),
+            "state_mb": round(sum(a.nbytes for a in (*self.hist.values(), *self.counts.values())) / 2**20, 1),
+        }
+
+
+# Detectors used by the API, one per tenant; each reads through the tenant-aware pool
+_detectors = OrderedDict()
+_detectors_lock = threading.Lock()
+
+
+def current_detector() -> Detector:
+    """Detector of the current tenant."""
+    tenant = current_tenant.get()
+    with _detectors_lock:
+        found = _detectors.get(tenant)
+        if found is None:
+            found = _detectors[tenant] = Detector(default_pool)
+            while len(_detectors) > MAX_OPEN_SHARDS:
+                _detectors.popitem(last=False)
+        _detectors.move_to_end(tenant)
+        return found
@@ -0,0 +1,152 @@
+"""
+Bulk_Loader.py
+--------------
+Chunked, resumable loader for CSV / Parquet transaction files.
+
+- streams the source in chunks (never the whole file in memory)
+- upserts by `id` with executemany, one large transaction per chunk
+- `merchant` / `category` may be missing (column or value): Classifier
+  labels them from the description, unlabelled rows are counted
+- drops triggers/secondary indexes for the load and rebuilds them after
+- records progress in `load_progress`, so an interrupted load resumes
+  from the last committed chunk
+"""
+
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from Classifier import classifier
+from Database import COLUMNS, ConnectionPool, drop_maintenance, ensure_schema, pool as default_pool, router
+
+CHUNK_SIZE = 100_000
+
+PROGRESS_DDL = """
+CREATE TABLE IF NOT EXISTS load_progress (
+    source TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    rows_done INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+UPSERT = (
+    f"INSERT INTO transactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+    f"ON CONFLICT(id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "id")
+)
+
+
+def _signature(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_size}:{int(st.st_mtime)}"
+
+
+def iter_chunks(path: Path, chunk_size: int = CHUNK_SIZE, skip: int = 0):
+    """Yield DataFrame chunks with the transaction columns (missing ones as NaN), skipping `skip` rows."""
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        seen = 0
+        source = pq.ParquetFile(path)
+        columns = [c for c in COLUMNS if c in source.schema_arrow.names]
+        for batch in source.iter_batches(batch_size=chunk_size, columns=columns):
+            if seen + batch.num_rows <= skip:
+                seen += batch.num_rows
+                continue
+            df = batch.to_pandas()
+            if seen < skip:
+                df = df.iloc[skip - seen:]
+            seen += batch.num_rows
+            yield df.reindex(columns=list(COLUMNS))
+    else:
+        for df in pd.read_csv(
+            path, chunksize=chunk_size, skiprows=range(1, skip + 1),
+            usecols=lambda c: c in COLUMNS, dtype={c: str for c in COLUMNS if c != "amount"},
+        ):
+            yield df.reindex(columns=list(COLUMNS))
+
+
+def to_rows(df: pd.DataFrame) -> list:
+    """DataFrame → list of tuples in COLUMNS order, NaN → None."""
+    df = df[list(COLUMNS)].astype(object)
+    return list(df.where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def bulk_load(source, db_pool: ConnectionPool = default_pool,
+              chunk_size: int = CHUNK_SIZE, resume: bool = True) -> dict:
+    """Load `source` into the transactions table. Returns rows, seconds and rows/sec."""
+    path = Path(source)
+    if not path.exists():
+        raise FileNotFoundError(f"❌ Source file not found: {path}")
+    key, signature = str(path.resolve()), _signature(path)
+
+    skip = 0
+    with db_pool.write() as conn:
+        conn.execute(PROGRESS_DDL)
+        row = conn.execute(
+            "SELECT signature, rows_done, finished FROM load_progress WHERE source = ?", (key,)
+        ).fetchone()
+        if resume and row and row[0] == signature and not row[2]:
+            skip = row[1]
+            print(f"↩️  Resuming {path.name} after {skip} rows")
+
+    with db_pool.write() as conn:
+        drop_maintenance(conn)
+        conn.execute("PRAGMA synchronous=OFF")
+
+    start = time.perf_counter()
+    loaded = 0
+    labels = {"classified": 0, "unmatched": 0}
+    try:
+        for df in iter_chunks(path, chunk_size, skip):
+            for name, n in classifier.fill(df).items():
+                labels[name] += n
+            rows = to_rows(df)
+            with db_pool.write() as conn:
+                conn.executemany(UPSERT, rows)
+                conn.execute(
+                    "INSERT INTO load_progress (source, signature, rows_done) VALUES (?, ?, ?) "
+                    "ON CONFLICT(source) DO UPDATE SET signature = excluded.signature, "
+                    "rows_done = excluded.rows_done, finished = 0, updated_at = CURRENT_TIMESTAMP",
+                    (key, signature, skip + loaded + len(rows)),
+                )
+            loaded += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f"   {skip + loaded:>12,} rows  ({loaded / elapsed:,.0f} rows/sec)")
+    finally:
+        with db_pool.write() as conn:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            print("🧱 Rebuilding indexes and summaries...")
+            ensure_schema(conn)  # triggers are missing → recreate + full rebuild
+
+    with db_pool.write() as conn:
+        conn.execute("UPDATE load_progress SET finished = 1 WHERE source = ?", (key,))
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "source": key,
+        "rows": loaded,
+        "skipped": skip,
+        **labels,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(loaded / elapsed) if elapsed else None,
+    }
+    print(f"✅ Loaded {loaded:,} rows in {elapsed:.1f}s ({stats['rows_per_sec']:,} rows/sec)")
+    if labels["classified"] or labels["unmatched"]:
+        print(f"🏷️  Labelled {labels['classified']:,} rows from their description, {labels['unmatched']:,} unmatched")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk-load transactions into SQLite")
+    parser.add_argument("source", help="CSV or Parquet file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--no-resume", action="store_true", help="restart from the first row")
+    parser.add_argument("--tenant", help="load into this tenant's shard (see Tenants.py)")
+    args = parser.parse_args()
+    db_pool = router.get(args.tenant) if args.tenant else default_pool
+    bulk_load(args.source, db_pool=db_pool, chunk_size=args.chunk_size, resume=not args.no_resume)
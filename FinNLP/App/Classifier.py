@@ -0,0 +1,272 @@
+"""
+Classifier.py
+-------------
+Merchant / category labels for raw statement lines ("TESCO STORES 3021",
+"Tesco Lake Henrybury") that arrive without `merchant` / `category`.
+
+Descriptions are normalized (accents and apostrophes dropped, lowercase,
+anything else that is not a letter or digit becomes a space) and split into
+tokens, then matched in three steps:
+- dictionary: one Aho-Corasick automaton over the token sequences of every
+  merchant name and alias finds all of them in one pass over the tokens;
+  the longest match wins (the leftmost on a tie)
+- token: spacing variants ("PURE GYM" for "PureGym", "JUSTEAT") by
+  comparing runs of up to 3 joined tokens with the merchant names without
+  spaces (names of at least 4 characters)
+- keyword: category only, from generic words (KEYWORDS: "pharmacy", "taxi")
+Lines without any match are counted as unmatched.
+
+Labels are memoized per distinct description (up to MEMO_ENTRIES, then the
+memo starts over), and a batch is factorized first, so each distinct line
+of the batch is normalized (vectorized) and matched once.
+
+The dictionary is CATEGORIES + ALIASES, or Data/merchants.csv
+(FINNLP_MERCHANTS_PATH) with columns merchant,category[,aliases] when that
+file exists, aliases separated by '|'.
+
+    python Classifier.py statement.csv [--out labelled.csv]
+"""
+
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MERCHANTS_PATH = Path(
+    os.environ.get("FINNLP_MERCHANTS_PATH", Path(__file__).resolve().parent.parent / "Data" / "merchants.csv")
+)
+MEMO_ENTRIES = 500_000
+MAX_JOINED = 3                  # tokens joined by the token fallback
+MIN_JOINED_CHARS = 4            # shorter names ("H&M", "EE") only match as whole tokens
+
+CATEGORIES = {
+    "Food": ["McDonald's", "Subway", "Starbucks", "Pizza Express", "Just Eat"],
+    "Groceries": ["Tesco", "Sainsbury's", "Lidl", "Aldi", "Waitrose"],
+    "Transport": ["Uber", "Trainline", "Shell", "BP Petrol", "Transport for London"],
+    "Shopping": ["Amazon", "Zara", "H&M", "IKEA", "Apple Store"],
+    "Entertainment": ["Netflix", "Spotify", "Cineworld", "PlayStation Store"],
+    "Utilities": ["British Gas", "Thames Water", "EE Mobile", "Octopus Energy"],
+    "Health": ["Boots Pharmacy", "NHS Prescription", "PureGym", "Vision Express"],
+    "Travel": ["Ryanair", "Booking.com", "Airbnb", "EasyJet"],
+    "Income": ["Salary ACME Ltd", "Freelance Payment", "Tax Refund"],
+    "Other": ["PayPal", "TransferWise", "Bank Fee"],
+}
+
+# Other spellings seen on bank statements
+ALIASES = {
+    "McDonald's": ["McD"],
+    "Transport for London": ["TfL"],
+    "BP Petrol": ["BP"],
+    "Amazon": ["AMZN", "Amazon Mktplace"],
+    "EE Mobile": ["EE"],
+    "Boots Pharmacy": ["Boots"],
+    "NHS Prescription": ["NHS"],
+    "Salary ACME Ltd": ["ACME Ltd"],
+    "TransferWise": ["Wise"],
+}
+
+# Generic words → category, used when no merchant matches
+KEYWORDS = {
+    "Food": ["restaurant", "cafe", "coffee", "pizza", "burger", "bakery", "takeaway", "kitchen", "grill"],
+    "Groceries": ["supermarket", "supermarkets", "grocery", "groceries", "grocer"],
+    "Transport": ["taxi", "fuel", "petrol", "parking", "railway", "rail", "trains", "bus"],
+    "Shopping": ["clothing", "fashion", "shoes", "bookshop", "electronics"],
+    "Entertainment": ["cinema", "theatre", "concert", "tickets", "games", "streaming"],
+    "Utilities": ["energy", "electricity", "water", "broadband", "telecom", "council"],
+    "Health": ["pharmacy", "chemist", "gym", "dental", "dentist", "clinic", "optician", "opticians"],
+    "Travel": ["hotel", "hostel", "airline", "airways", "airlines", "flights"],
+    "Income": ["salary", "payroll", "wages", "refund", "dividend", "interest"],
+    "Other": ["fee", "fees", "atm", "cash", "transfer"],
+}
+
+METHODS = ("dictionary", "token", "keyword")
+
+
+def normalize(text: pd.Series) -> pd.Series:
+    """Vectorized: ASCII, lowercase, no apostrophes, words separated by single spaces."""
+    text = text.astype(str).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    text = text.str.lower().str.replace(r"['`]", "", regex=True)
+    return text.str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+
+def _tokens(name: str) -> tuple:
+    return tuple(normalize(pd.Series([name]))[0].split())
+
+
+class MerchantClassifier:
+    def __init__(self, categories: dict = CATEGORIES, aliases: dict = ALIASES, keywords: dict = KEYWORDS,
+                 memo_entries: int = MEMO_ENTRIES):
+        self.labels = []                # (merchant, category) per dictionary entry
+        self.goto, self.fail, self.out = [{}], [0], [None]
+        self.joined = {}
+        for category, merchants in categories.items():
+            for merchant in merchants:
+                entry = len(self.labels)
+                self.labels.append((merchant, category))
+                for name in (merchant, *aliases.get(merchant, ())):
+                    tokens = _tokens(name)
+                    if tokens:
+                        self._add(tokens, entry)
+                    if len("".join(tokens)) >= MIN_JOINED_CHARS:
+                        self.joined.setdefault("".join(tokens), entry)
+        self._link()
+        self.keywords = {word: category for category, words in keywords.items() for word in words}
+        self.memo_entries = memo_entries
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    @classmethod
+    def from_csv(cls, path: Path, **kwargs) -> "MerchantClassifier":
+        """Dictionary from a merchant,category[,aliases] CSV (aliases separated by '|')."""
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        categories, aliases = {}, {}
+        for row in frame.itertuples(index=False):
+            categories.setdefault(row.category, []).append(row.merchant)
+            extra = getattr(row, "aliases", "")
+            if extra:
+                aliases[row.merchant] = [a.strip() for a in extra.split("|") if a.strip()]
+        return cls(categories, aliases, **kwargs)
+
+    # ----------------------------------------------------------
+    # AUTOMATON
+    # ----------------------------------------------------------
+    def _add(self, tokens: tuple, entry: int):
+        state = 0
+        for token in tokens:
+            nxt = self.goto[state].get(token)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][token] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(None)
+            state = nxt
+        if self.out[state] is None:     # first entry wins for a name listed twice
+            self.out[state] = (entry, len(" ".join(tokens)))
+
+    def _link(self):
+        """Failure links, breadth first; out[s] becomes the longest name ending at s."""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for token, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and token not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(token, 0)
+                if self.out[nxt] is None:
+                    self.out[nxt] = self.out[self.fail[nxt]]
+
+    def _match(self, text: str) -> tuple:
+        """(merchant, category, method) for one normalized description."""
+        tokens = text.split()
+        goto, fail, out = self.goto, self.fail, self.out
+        state, best = 0, None
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            hit = out[state]
+            if hit is not None and (best is None or hit[1] > best[1]):
+                best = hit
+        if best is not None:
+            return (*self.labels[best[0]], "dictionary")
+
+        for size in range(MAX_JOINED, 0, -1):
+            for i in range(len(tokens) - size + 1):
+                entry = self.joined.get("".join(tokens[i:i + size]))
+                if entry is not None:
+                    return (*self.labels[entry], "token")
+
+        for token in tokens:
+            category = self.keywords.get(token)
+            if category is not None:
+                return (None, category, "keyword")
+        return (None, None, None)
+
+    # ----------------------------------------------------------
+    # BATCHES
+    # ----------------------------------------------------------
+    def label(self, descriptions) -> pd.DataFrame:
+        """merchant / category / method for each description (None where unmatched or missing)."""
+        series = pd.Series(descriptions, dtype=object).reset_index(drop=True)
+        codes, uniques = pd.factorize(series)
+        memo = self._memo
+        found = [memo.get(d) for d in uniques]
+        todo = [i for i, hit in enumerate(found) if hit is None]
+        if todo:
+            if len(memo) + len(todo) > self.memo_entries:
+                memo.clear()
+            texts = normalize(pd.Series(uniques[todo], dtype=object))
+            for i, text in zip(todo, texts):
+                found[i] = memo[uniques[i]] = self._match(text)
+
+        table = np.empty((len(found) + 1, 3), dtype=object)     # last row: missing description
+        if found:
+            table[:-1] = found
+        rows = table[codes]
+        labelled = pd.DataFrame(rows, columns=["merchant", "category", "method"])
+        with self._lock:
+            self._counts["lines"] += len(series)
+            self._counts["distinct"] += len(uniques)
+            self._counts["memo_hits"] += len(uniques) - len(todo)
+            for method, n in pd.Series(rows[:, 2]).fillna("unmatched").value_counts().items():
+                self._counts[method] += int(n)
+        return labelled
+
+    def fill(self, frame: pd.DataFrame) -> dict:
+        """
+        Fill missing merchant / category of `frame` in place, from the merchant
+        when present, else from the description. Returns classified / unmatched counts.
+        """
+        need = (frame["merchant"].isna() | frame["category"].isna()).to_numpy(dtype=bool)
+        text = frame["merchant"].where(frame["merchant"].notna(), frame["description"])
+        need = need & text.notna().to_numpy(dtype=bool)
+        if not need.any():
+            return {"classified": 0, "unmatched": 0}
+        labelled = self.label(text[need])
+        rows = np.flatnonzero(need)
+        for column in ("merchant", "category"):
+            values = frame[column].to_numpy(dtype=object, copy=True)
+            empty = pd.isna(values[rows])
+            values[rows[empty]] = labelled[column].to_numpy()[empty]
+            frame[column] = values
+        matched = int(labelled["method"].notna().sum())
+        return {"classified": matched, "unmatched": int(need.sum()) - matched}
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "entries": len(self.labels), "states": len(self.goto), "memo_size": len(self._memo),
+            **{key: counts.get(key, 0) for key in ("lines", "distinct", "memo_hits", *METHODS, "unmatched")},
+        }
+
+
+classifier = MerchantClassifier.from_csv(MERCHANTS_PATH) if MERCHANTS_PATH.exists() else MerchantClassifier()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Label merchant / category of a statement file")
+    parser.add_argument("source", help="CSV with a description column")
+    parser.add_argument("--out", help="write the labelled CSV here")
+    args = parser.parse_args()
+
+    frame = pd.read_csv(args.source, dtype=str)
+    for column in ("merchant", "category"):
+        if column not in frame:
+            frame[column] = None
+    start = time.perf_counter()
+    result = classifier.fill(frame)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {len(frame):,} lines in {elapsed:.2f}s ({len(frame) / elapsed:,.0f} lines/sec): "
+          f"{result['classified']:,} classified, {result['unmatched']:,} unmatched")
+    if args.out:
+        frame.to_csv(args.out, index=False)
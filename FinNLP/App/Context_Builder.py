@@ -0,0 +1,122 @@
+"""
+Context_Builder.py
+------------------
+Builds the data section of AI prompts under a hard token budget.
+
+Instead of the first N raw records, a prompt gets, in priority order:
+1. headline figures (insights_summary)
+2. compact aggregate tables from monthly_rollup: per category, per
+   currency, per month (last 12)
+3. the transactions most relevant to the question, ranked with BM25 on the
+   trigram FTS index (already kept in sync with the table by triggers),
+   or the most recent ones for reports
+
+Sections are added until the budget is spent; a section that does not fit
+is cut row by row. Tables are rendered as pipe-separated lines, which cost
+far fewer tokens than Python dict reprs.
+"""
+
+import re
+
+from Database import pool
+
+DEFAULT_BUDGET = 1500       # tokens for the data part of a prompt
+CHARS_PER_TOKEN = 4         # rough average for English text and numbers
+RECENT_MONTHS = 12
+STOPWORDS = {
+    "the", "and", "for", "how", "much", "many", "did", "does", "what", "which", "when",
+    "where", "who", "why", "was", "were", "are", "have", "has", "had", "you", "your",
+    "mine", "spend", "spent", "spending", "money", "transactions", "transaction",
+    "about", "with", "from", "this", "that", "there", "their", "they", "than", "then",
+    "can", "could", "would", "should", "any", "all", "most", "more", "less", "last",
+    "month", "year", "week", "day", "total", "average", "show", "tell", "give",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _table(title: str, header: tuple, rows) -> list[str]:
+    lines = [f"## {title}", " | ".join(header)]
+    lines += [" | ".join("" if v is None else f"{v:.2f}" if isinstance(v, float) else str(v)
+                         for v in row) for row in rows]
+    return lines
+
+
+# ----------------------------------------------------------
+# SECTIONS
+# ----------------------------------------------------------
+def _headline(conn) -> list[str]:
+    rows = conn.execute(
+        "SELECT CASE sign WHEN 1 THEN 'income' WHEN -1 THEN 'expense' ELSE 'zero' END, n, total "
+        "FROM insights_summary WHERE n > 0 ORDER BY sign DESC").fetchall()
+    return _table("Totals (all rows, unconverted)", ("type", "count", "total"), rows)
+
+
+def _aggregates(conn) -> list[list[str]]:
+    by_category = conn.execute(
+        "SELECT category, SUM(n), SUM(spent), SUM(income) FROM monthly_rollup "
+        "WHERE n > 0 GROUP BY category ORDER BY SUM(spent)").fetchall()
+    by_currency = conn.execute(
+        "SELECT currency, SUM(n), SUM(spent), SUM(income) FROM monthly_rollup "
+        "WHERE n > 0 GROUP BY currency ORDER BY currency").fetchall()
+    by_month = conn.execute(
+        "SELECT month, SUM(n), SUM(spent), SUM(income) FROM monthly_rollup "
+        "WHERE n > 0 GROUP BY month ORDER BY month DESC LIMIT ?", (RECENT_MONTHS,)).fetchall()
+    header = ("count", "spent", "income")
+    return [
+        _table("Per category", ("category",) + header, by_category),
+        _table("Per currency", ("currency",) + header, by_currency),
+        _table(f"Per month (last {RECENT_MONTHS})", ("month",) + header, by_month[::-1]),
+    ]
+
+
+def keywords(question: str) -> list[str]:
+    words = re.findall(r"[\w'&.]+", question.lower())
+    # trigram index: terms need at least 3 characters
+    return [w for w in dict.fromkeys(words) if len(w) >= 3 and w not in STOPWORDS]
+
+
+def _relevant_rows(conn, question: str | None, limit: int) -> list[str]:
+    columns = "t.date, t.merchant, t.category, t.amount, t.currency, t.city"
+    terms = keywords(question) if question else []
+    rows = []
+    if terms:
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        rows = conn.execute(
+            f"SELECT {columns} FROM transactions_fts f JOIN transactions t ON t.rowid = f.rowid "
+            "WHERE transactions_fts MATCH ? ORDER BY bm25(transactions_fts) LIMIT ?",
+            (match, limit)).fetchall()
+        title = "Most relevant transactions"
+    if not rows:
+        rows = conn.execute(
+            f"SELECT {columns} FROM transactions t ORDER BY date DESC, id DESC LIMIT ?",
+            (limit,)).fetchall()
+        title = "Most recent transactions"
+    return _table(title, ("date", "merchant", "category", "amount", "currency", "city"), rows)
+
+
+# ----------------------------------------------------------
+# BUDGET
+# ----------------------------------------------------------
+def build_context(question: str | None = None, budget: int = DEFAULT_BUDGET,
+                  max_rows: int = 50) -> str:
+    """Data context for a prompt, never longer than `budget` tokens (estimated)."""
+    with pool.read() as conn:
+        sections = [_headline(conn), *_aggregates(conn), _relevant_rows(conn, question, max_rows)]
+
+    out, used = [], 0
+    for lines in sections:
+        for i, line in enumerate(lines):
+            cost = estimate_tokens(line + "\n")
+            if used + cost > budget:
+                if i <= 2:
+                    del out[len(out) - i:]  # no room for a single row: drop title/header
+                else:
+                    out.append("(truncated)")
+                return "\n".join(out).strip()
+            out.append(line)
+            used += cost
+        out.append("")
+    return "\n".join(out).strip()
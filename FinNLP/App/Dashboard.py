@@ -9,19 +9,28 @@ Integrates with FastAPI backend for:
 - AI-powered Q&A
 """
 
+import os
 import streamlit as st
 import pandas as pd
 import requests
+import json
 import matplotlib.pyplot as plt
-from streamlit_option_menu import option_menu
+from collections import OrderedDict
 from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
+from requests.adapters import HTTPAdapter
+from streamlit_option_menu import option_menu
+from urllib.parse import urlencode
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow è opzionale: senza, si usa JSON
+    pa = None
 
 # -----------------------------------------------------------
 # CONFIG
 # -----------------------------------------------------------
 BASE_URL = "http://127.0.0.1:8000"  # FastAPI deve essere avviato prima
+TENANT = os.environ.get("FINNLP_TENANT")  # X-Tenant-ID; vuoto = database di default
 st.set_page_config(page_title="FinNLP AI Dashboard", layout="wide", page_icon="💸")
 
 # -----------------------------------------------------------
@@ -42,27 +51,199 @@ with st.sidebar:
 
     selected = option_menu(
         menu_title="💸 FinNLP Dashboard",
-        options=["Home", "Transactions", "Filter", "Insights", "AI Report", "AI Q&A"],
-        icons=["house", "table", "funnel", "bar-chart-line", "file-text", "robot"],
+        options=["Home", "Transactions", "Filter", "Insights", "Anomalies", "AI Report", "AI Q&A"],
+        icons=["house", "table", "funnel", "bar-chart-line", "exclamation-triangle", "file-text", "robot"],
         menu_icon="cast",
         default_index=0,
     )
 
+# -----------------------------------------------------------
+# HELPER — HTTP SESSION & CACHES
+# -----------------------------------------------------------
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+VERSION_TTL = 2        # secondi: ogni quanto si ricontrolla /version
+ETAG_ENTRIES = 64
+
+@st.cache_resource
+def http_session():
+    """One pooled keep-alive session shared by every rerun and page"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if TENANT:
+        session.headers["X-Tenant-ID"] = TENANT
+    return session
+
+@st.cache_resource
+def etag_store():
+    """(endpoint, accept) -> (etag, content-type, body) of the last 200 response"""
+    return OrderedDict()
+
+def api_get(endpoint: str, accept: str | None = None):
+    """Conditional GET: revalidates with If-None-Match, a 304 reuses the stored body.
+    Returns (status, content-type, body)."""
+    store = etag_store()
+    key = (endpoint, accept)
+    headers = {"Accept": accept} if accept else {}
+    cached = store.get(key)
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = http_session().get(f"{BASE_URL}/{endpoint}", headers=headers, timeout=30)
+    if r.status_code == 304 and cached:
+        store.move_to_end(key)
+        return 200, cached[1], cached[2]
+    content_type = r.headers.get("content-type", "")
+    if r.status_code == 200 and "ETag" in r.headers:
+        store[key] = (r.headers["ETag"], content_type, r.content)
+        while len(store) > ETAG_ENTRIES:
+            store.popitem(last=False)
+    return r.status_code, content_type, r.content
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def data_version() -> int | None:
+    """Current data version from the API (None if unreachable: nothing gets cached by it)"""
+    try:
+        return http_session().get(f"{BASE_URL}/version", timeout=5).json()["data_version"]
+    except Exception:
+        return None
+
 # -----------------------------------------------------------
 # HELPER — GET DATA
 # -----------------------------------------------------------
-def fetch_json(endpoint: str):
-    """Fetch data from FastAPI backend and return DataFrame"""
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_frame(endpoint: str, arrow: bool, version: int | None) -> pd.DataFrame:
+    """Fetch a row endpoint as DataFrame; cached per data version (errors are not cached)"""
+    status, content_type, body = api_get(endpoint, ARROW_MIME if arrow and pa is not None else None)
+    if status != 200:
+        raise RuntimeError(f"❌ API returned {status}")
+    if content_type.startswith(ARROW_MIME):
+        return pa.ipc.open_stream(body).read_all().to_pandas(split_blocks=True, self_destruct=True)
+    return pd.DataFrame(json.loads(body))
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_json(endpoint: str, version: int | None):
+    status, _, body = api_get(endpoint)
+    if status != 200:
+        raise RuntimeError(f"❌ API returned {status}")
+    return json.loads(body)
+
+def fetch_json(endpoint: str, arrow: bool = False):
+    """Fetch data from FastAPI backend and return DataFrame (Arrow IPC if `arrow`)"""
     try:
-        r = requests.get(f"{BASE_URL}/{endpoint}")
-        if r.status_code == 200:
-            return pd.DataFrame(r.json())
-        else:
-            st.error(f"❌ API returned {r.status_code}")
+        return load_frame(endpoint, arrow, data_version())
+    except RuntimeError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"⚠️ Could not reach API server: {e}")
     return pd.DataFrame()
 
+# -----------------------------------------------------------
+# HELPER — FIGURES (PNG cached per data version)
+# -----------------------------------------------------------
+def figure_png(fig) -> bytes:
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def amount_histogram(version: int | None, bins: int = 30) -> bytes:
+    """Histogram of every amount, from pre-binned counts (/stats/histogram)"""
+    data = load_json(f"stats/histogram?bins={bins}", version)
+    edges = data["edges"]
+    fig, ax = plt.subplots()
+    if edges:
+        ax.stairs(data["counts"], edges, fill=True, color="#3498db", alpha=0.7)
+    ax.set_xlabel("Amount (original currency)")
+    ax.set_ylabel("Count")
+    return figure_png(fig)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def monthly_chart(version: int | None, target: str) -> bytes:
+    points = load_json(f"stats/timeseries?bucket=month&target={target}", version)["points"]
+    fig, ax = plt.subplots(figsize=(8, 3.5))
+    months = [p["period"] for p in points]
+    ax.plot(months, [abs(p["spent"]) for p in points], color="#e74c3c", label="Expenses")
+    ax.plot(months, [p["income"] for p in points], color="#2ecc71", label="Income")
+    ax.set_xticks(months[::max(1, len(months) // 12)])
+    ax.tick_params(axis="x", rotation=45)
+    ax.set_ylabel(f"{target} Amount")
+    ax.legend()
+    return figure_png(fig)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def category_chart(version: int | None, target: str) -> bytes:
+    items = load_json(f"stats/breakdown?by=category&sign=expense&limit=12&target={target}", version)["items"]
+    fig, ax = plt.subplots(figsize=(8, 3.5))
+    ax.barh([str(i["key"]) for i in items][::-1], [abs(i["total"]) for i in items][::-1], color="#e67e22")
+    ax.set_xlabel(f"{target} Spent")
+    return figure_png(fig)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def forecast_chart(version: int | None, currency: str, months: int) -> bytes:
+    data = load_json(f"insights/forecast?months={months}&currency={currency}", version)
+    history = {}
+    for item in data["items"]:
+        for p in item["history"]:
+            history[p["month"]] = history.get(p["month"], 0) + p["spent"]
+    ahead = next(t["forecast"] for t in data["totals"] if t["currency"] == currency)
+    fig, ax = plt.subplots(figsize=(8, 3.5))
+    ax.plot(list(history), list(history.values()), color="#e74c3c", label="Spent")
+    ax.plot([p["month"] for p in ahead], [p["spent"] for p in ahead], color="#e74c3c",
+            linestyle="--", marker="o", label="Forecast")
+    ax.tick_params(axis="x", rotation=45)
+    ax.set_ylabel(f"{currency} Spent")
+    ax.legend()
+    return figure_png(fig)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def income_expense_chart(version: int | None, target: str) -> bytes:
+    data = load_json(f"insights?target={target}", version)
+    fig, ax = plt.subplots()
+    ax.bar(["Income", "Expenses"],
+           [data["total_income"], abs(data["total_spent"])],
+           color=["#2ecc71", "#e74c3c"])
+    ax.set_ylabel(f"{target} Amount")
+    return figure_png(fig)
+
+def stream_sse(endpoint: str, payload: dict):
+    """POST to a streaming AI endpoint and yield text deltas as they arrive"""
+    with http_session().post(f"{BASE_URL}/{endpoint}", json=payload, stream=True, timeout=120) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"Backend error ({r.status_code}): {r.text}")
+        event = None
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                event = None
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[5:])
+                if event == "error":
+                    raise RuntimeError(data.get("detail", "AI generation failed"))
+                if "delta" in data:
+                    yield data["delta"]
+
+PDF_POLL_SECONDS = 2
+
+@st.fragment(run_every=PDF_POLL_SECONDS)
+def report_pdf_status():
+    """Check the PDF job once per run: the fragment reruns on its own, the page never blocks"""
+    job_id = st.session_state.get("report_job")
+    if not job_id:
+        return
+    job = http_session().get(f"{BASE_URL}/jobs/{job_id}").json()
+    if job.get("status") in ("done", "failed"):
+        # PDF scaricato una sola volta, poi il job esce dalla sessione
+        if job["status"] == "done":
+            st.session_state["report_pdf"] = http_session().get(f"{BASE_URL}/jobs/{job_id}/pdf").content
+        else:
+            st.session_state["report_pdf_error"] = job.get("error")
+        del st.session_state["report_job"]
+        st.rerun()
+    st.info("⏳ Preparing PDF...")
+
 # -----------------------------------------------------------
 # HOME
 # -----------------------------------------------------------
@@ -79,7 +260,7 @@ if selected == "Home":
     """)
 
     try:
-        r = requests.get(f"{BASE_URL}/")
+        r = http_session().get(f"{BASE_URL}/", timeout=5)
         if r.status_code == 200:
             st.success("✅ API connected successfully!")
         else:
@@ -94,16 +275,12 @@ elif selected == "Transactions":
     st.header("📜 Transactions Viewer")
 
     limit = st.slider("How many transactions to display?", 5, 200, 20)
-    df = fetch_json(f"transactions?limit={limit}")
+    df = fetch_json(f"transactions?limit={limit}", arrow=True)
 
     if not df.empty:
         st.dataframe(df, use_container_width=True)
-        st.subheader("💰 Transaction Distribution")
-        fig, ax = plt.subplots()
-        df["amount"].plot(kind="hist", bins=30, ax=ax, color="#3498db", alpha=0.7)
-        ax.set_xlabel("Amount (€)")
-        ax.set_ylabel("Count")
-        st.pyplot(fig)
+        st.subheader("💰 Transaction Distribution (all transactions)")
+        st.image(amount_histogram(data_version()))
     else:
         st.info("No data available.")
 
@@ -115,16 +292,19 @@ elif selected == "Filter":
 
     category = st.text_input("Filter by category (optional):", placeholder="e.g. Food, Transport")
     merchant = st.text_input("Filter by merchant (optional):", placeholder="e.g. Uber, Starbucks")
+    text = st.text_input("Search description (optional):", placeholder="e.g. London")
+    mode = st.radio("Match mode:", ["substring", "prefix", "exact"], horizontal=True)
     limit = st.slider("Results:", 5, 100, 20)
 
     if st.button("Apply Filter"):
-        params = []
+        params = {"mode": mode, "limit": limit}
         if category:
-            params.append(f"category={category}")
+            params["category"] = category
         if merchant:
-            params.append(f"merchant={merchant}")
-        query = "&".join(params)
-        df = fetch_json(f"transactions/filter?{query}&limit={limit}")
+            params["merchant"] = merchant
+        if text:
+            params["q"] = text
+        df = fetch_json(f"transactions/filter?{urlencode(params)}", arrow=True)
         if not df.empty:
             st.dataframe(df, use_container_width=True)
         else:
@@ -137,33 +317,83 @@ elif selected == "Insights":
     st.header("📈 Financial Insights")
 
     try:
-        r = requests.get(f"{BASE_URL}/insights")
-        if r.status_code == 200:
-            data = r.json()
-
+        version = data_version()
+        target = st.selectbox("Show amounts in:", load_json("fx/currencies", version)["currencies"])
+        data = load_json(f"insights?target={target}", version)
+        if data:
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Transactions", data["total_transactions"])
             col2.metric("Top Category", data["top_category"])
-            col3.metric("Total Spent (€)", abs(data["total_spent"]))
-            col4.metric("Total Income (€)", data["total_income"])
+            col3.metric(f"Total Spent ({target})", abs(data["total_spent"]))
+            col4.metric(f"Total Income ({target})", data["total_income"])
 
-            st.markdown(f"**Average Expense:** {abs(data['average_expense']):.2f} €")
+            st.markdown(f"**Average Expense:** {abs(data['average_expense']):.2f} {target}")
+            if data.get("missing_rates"):
+                st.caption(f"No FX rate for {', '.join(data['missing_rates'])}: excluded from the totals.")
             summary = data["summary"].replace(". ", ".<br>")
             st.markdown(f"<div style='line-height:1.6; font-size:16px;'>{summary}</div>", unsafe_allow_html=True)
 
             # Chart
             st.subheader("💶 Total Income vs Expenses")
-            fig, ax = plt.subplots()
-            ax.bar(["Income", "Expenses"],
-                   [data["total_income"], abs(data["total_spent"])],
-                   color=["#2ecc71", "#e74c3c"])
-            ax.set_ylabel("€ Amount")
-            st.pyplot(fig)
+            st.image(income_expense_chart(version, target))
+
+            st.subheader("📅 Monthly Income vs Expenses")
+            st.image(monthly_chart(version, target))
+
+            st.subheader("🏷️ Spending by Category")
+            st.image(category_chart(version, target))
+
+            st.subheader("🔮 Spend Forecast")
+            forecast = load_json("insights/forecast?months=3", version)
+            if forecast["totals"]:
+                col1, col2 = st.columns(2)
+                currency = col1.selectbox("Currency:", [t["currency"] for t in forecast["totals"]])
+                months = col2.slider("Months ahead:", 1, 12, 3)
+                st.image(forecast_chart(version, currency, months))
+                st.caption("Per category and currency: seasonal naive or exponential smoothing, "
+                           "whichever predicted the last months better. Amounts as stored, not converted.")
+
+            st.subheader("🔁 Recurring Payments")
+            recurring = load_json(f"insights/recurring?target={target}", version)
+            col1, col2 = st.columns(2)
+            col1.metric(f"Committed per Month ({target})", recurring["monthly_committed"])
+            col2.metric(f"Recurring Income per Month ({target})", recurring["monthly_income"])
+            if recurring["upcoming"]:
+                st.markdown(f"**Expected in the {recurring['horizon_days']} days after {recurring['as_of']}:**")
+                st.dataframe(pd.DataFrame(recurring["upcoming"]), use_container_width=True)
+            else:
+                st.info("No recurring payments detected.")
         else:
             st.error("❌ Could not fetch insights.")
     except Exception as e:
         st.error(f"⚠️ Could not fetch insights: {e}")
 
+# -----------------------------------------------------------
+# ANOMALIES
+# -----------------------------------------------------------
+elif selected == "Anomalies":
+    st.header("🚨 Unusual Spending")
+    st.caption("Robust z-score (median / MAD) against the same merchant or category "
+               "in the previous months (amounts) or weeks (frequency).")
+
+    col1, col2, col3 = st.columns(3)
+    kind = col1.radio("Type:", ["amount", "frequency"], horizontal=True)
+    by = col2.radio("Compared with:", ["all", "merchant", "category"], horizontal=True)
+    page_size = col3.selectbox("Per page:", [25, 50, 100], index=0)
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+
+    try:
+        params = {"kind": kind, "by": by, "limit": page_size, "offset": (page - 1) * page_size}
+        data = load_json(f"insights/anomalies?{urlencode(params)}", data_version())
+        pages = max(1, -(-data["total"] // page_size))
+        st.markdown(f"**{data['total']}** anomalies — page {page} of {pages}")
+        if data["items"]:
+            st.dataframe(pd.DataFrame(data["items"]), use_container_width=True)
+        else:
+            st.info("No anomalies on this page.")
+    except Exception as e:
+        st.error(f"⚠️ Could not fetch anomalies: {e}")
+
 # -----------------------------------------------------------
 # AI REPORT
 # -----------------------------------------------------------
@@ -177,41 +407,30 @@ elif selected == "AI Report":
         if not api_key:
             st.error("⚠️ Please enter your OpenAI API key in the sidebar first.")
         else:
-            with st.spinner("Generating AI report..."):
-                try:
-                    r = requests.post(f"{BASE_URL}/ai/report", json={"limit": limit, "api_key": api_key})
-                    if r.status_code != 200:
-                        st.error(f"❌ Backend error ({r.status_code}): {r.text}")
-                    else:
-                        data = r.json()
-                        report = data.get("report")
-                        if not report:
-                            st.error(data.get("error", "No report returned."))
-                        else:
-                            st.success("✅ Report generated successfully!")
-                            st.text_area("AI Financial Report", report, height=250)
-
-                            # Export as PDF
-                            if st.button("📄 Download Report as PDF"):
-                                buffer = BytesIO()
-                                pdf = canvas.Canvas(buffer, pagesize=A4)
-                                pdf.setFont("Helvetica", 12)
-                                pdf.drawString(50, 800, "FinNLP AI Financial Report")
-                                y = 780
-                                for line in report.split("\n"):
-                                    pdf.drawString(50, y, line[:100])
-                                    y -= 14
-                                    if y < 50:
-                                        pdf.showPage()
-                                        pdf.setFont("Helvetica", 12)
-                                        y = 780
-                                pdf.save()
-                                buffer.seek(0)
-                                st.download_button("Download PDF", buffer,
-                                                   file_name="FinNLP_Report.pdf",
-                                                   mime="application/pdf")
-                except Exception as e:
-                    st.error(f"AI report generation failed: {e}")
+            try:
+                st.subheader("AI Financial Report")
+                report = st.write_stream(stream_sse("ai/report/stream", {"limit": limit, "api_key": api_key}))
+                if not report:
+                    st.error("No report returned.")
+                else:
+                    st.success("✅ Report generated successfully!")
+                    # PDF costruito dal server in background (stesso prompt → risposta dalla cache LLM)
+                    r = http_session().post(f"{BASE_URL}/jobs/report", json={"limit": limit, "api_key": api_key})
+                    if r.status_code == 202:
+                        st.session_state["report_job"] = r.json()["job_id"]
+                        st.session_state.pop("report_pdf", None)
+                        st.session_state.pop("report_pdf_error", None)
+            except Exception as e:
+                st.error(f"AI report generation failed: {e}")
+
+    # Fuori dal bottone: sopravvive ai rerun di Streamlit
+    if st.session_state.get("report_job"):
+        report_pdf_status()
+    if "report_pdf" in st.session_state:
+        st.download_button("📄 Download Report as PDF", st.session_state["report_pdf"],
+                           file_name="FinNLP_Report.pdf", mime="application/pdf")
+    if "report_pdf_error" in st.session_state:
+        st.error(f"PDF generation failed: {st.session_state['report_pdf_error']}")
 
 # -----------------------------------------------------------
 # AI Q&A
@@ -222,24 +441,21 @@ elif selected == "AI Q&A":
     api_key = st.session_state.get("OPENAI_API_KEY")
     user_q = st.text_input("Enter your question:", placeholder="e.g. How much did I spend on Food?")
 
+    st.caption("Totals, averages, counts and top-N questions are answered instantly from the database, no key needed.")
+
     if st.button("Ask AI"):
-        if not api_key:
-            st.error("⚠️ Please enter your OpenAI API key in the sidebar first.")
-        elif not user_q:
+        if not user_q:
             st.warning("Please enter a question.")
         else:
-            with st.spinner("Thinking..."):
-                try:
-                    r = requests.post(f"{BASE_URL}/ai/question", json={"question": user_q, "api_key": api_key})
-                    if r.status_code != 200:
-                        st.error(f"❌ Backend error ({r.status_code}): {r.text}")
-                    else:
-                        data = r.json()
-                        answer = data.get("answer")
-                        if not answer:
-                            st.warning(data.get("error", "No answer returned."))
-                        else:
-                            st.markdown("### 🧠 AI Answer:")
-                            st.write(answer)
-                except Exception as e:
+            try:
+                st.markdown("### 🧠 AI Answer:")
+                answer = st.write_stream(stream_sse("ai/question/stream", {"question": user_q, "api_key": api_key}))
+                if not answer:
+                    st.warning("No answer returned.")
+            except RuntimeError as e:
+                if "API key" in str(e):
+                    st.error("⚠️ This question needs the AI: please enter your OpenAI API key in the sidebar.")
+                else:
                     st.error(f"AI Q&A failed: {e}")
+            except Exception as e:
+                st.error(f"AI Q&A failed: {e}")
@@ -1,24 +1,1018 @@
 """
 database.py
 -----------
-Creates and manages a connection to the local SQLite database.
+Creates and manages connections to the local SQLite database.
 Used by all API endpoints that read or write transaction data.
+
+Reads go through a bounded pool of read-only connections, so a worker
+thread borrows an already-open, already-tuned connection instead of paying
+`sqlite3.connect` on every request. Writes go through one serialized
+writer connection.
+
+Each tenant has its own SQLite file (shard) and its own pool: `pool`
+routes every call to the shard of the tenant in `current_tenant`, set per
+request by Tenants.TenantMiddleware. Without a tenant, DB_PATH is used.
 """
 
+import gc
+import os
+import queue
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
 
-# Path to the local SQLite database
-DB_PATH = Path("../Data/finllm.db")
+# Column order of the transactions table (same as the CSV)
+COLUMNS = ("id", "date", "description", "amount", "currency", "merchant", "category", "city", "country")
+
+# Path to the local SQLite database (override with FINNLP_DB_PATH)
+DB_PATH = Path(
+    os.environ.get("FINNLP_DB_PATH", Path(__file__).resolve().parent.parent / "Data" / "finllm.db")
+)
+
+# Same as the default AnyIO threadpool used by FastAPI for sync routes
+READ_POOL_SIZE = int(os.environ.get("FINNLP_READ_POOL_SIZE", 40))
+READ_TIMEOUT = 30.0                    # seconds to wait for a free read connection
+WRITE_TIMEOUT = 30.0                   # seconds to wait for another process's write lock
+CACHE_SIZE_KIB = 64 * 1024             # page cache per connection (64 MiB)
+MMAP_SIZE = 256 * 1024 * 1024          # memory-mapped I/O window (256 MiB)
+
+# Tenant shards: <TENANT_DIR>/<tenant>.db, at most MAX_OPEN_SHARDS pools open at once
+TENANT_DIR = Path(os.environ.get("FINNLP_TENANT_DIR", DB_PATH.parent / "tenants"))
+TENANT_READ_POOL_SIZE = int(os.environ.get("FINNLP_TENANT_READ_POOL_SIZE", 8))
+MAX_OPEN_SHARDS = int(os.environ.get("FINNLP_MAX_OPEN_SHARDS", 32))
+TENANT_AUTOCREATE = os.environ.get("FINNLP_TENANT_AUTOCREATE", "0") == "1"
+DEFAULT_TENANT = "default"
+
+# ----------------------------------------------------------
+# SCHEMA
+# ----------------------------------------------------------
+# Derived tables are kept in sync by triggers, so reads never rescan
+# `transactions`. `insights_summary` holds one row per amount sign
+# (1 = income, -1 = expense, 0 = zero), `category_counts` one row per
+# category and `merchant_counts` one per merchant (NULL stored as '', like
+# in `monthly_rollup`, so the upserts and decrements always find the row). `transactions_fts` is a trigram full-text index over
+# merchant/category/description used for substring search, and the
+# NOCASE indexes serve exact and prefix lookups. (date, id) is the
+# keyset used for pagination and exports. `monthly_rollup` is the
+# month x category x currency cube (spent / income / count) that prompt
+# context and forecasts aggregate instead of raw rows; `daily_rollup`
+# (date x currency) is what the as-of FX conversion of the /insights totals
+# reads. `meta.data_version` is bumped on
+# every change to `transactions` or `fx_rates` (and `meta.updated_at` set to
+# the unix time); together they stamp caches and HTTP validators.
+# `meta.rewrites` counts the rows updated or deleted (and rebuilds): while
+# it stands still, `transactions` has only been appended to.
+TABLE = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    description TEXT,
+    amount REAL NOT NULL,
+    currency TEXT,
+    merchant TEXT,
+    category TEXT,
+    city TEXT,
+    country TEXT
+);
+"""
+
+# batch = 1 while write_batch maintains the derived tables itself: the row
+# triggers on `transactions` are gated on it (a trigger on a main table
+# cannot read a temp table, hence a one-row table here)
+TRIGGER_CONTROL = """
+CREATE TABLE IF NOT EXISTS trigger_control (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    batch INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO trigger_control (id) VALUES (1);
+"""
+
+SCHEMA = TABLE + TRIGGER_CONTROL + """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('updated_at', CAST(strftime('%s', 'now') AS INTEGER));
+INSERT OR IGNORE INTO meta (key, value) VALUES ('rewrites', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_version_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE meta SET value = CASE key WHEN 'data_version' THEN value + 1
+                                     ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+    WHERE key IN ('data_version', 'updated_at');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE meta SET value = CASE key WHEN 'updated_at' THEN CAST(strftime('%s', 'now') AS INTEGER)
+                                     ELSE value + 1 END
+    WHERE key IN ('data_version', 'rewrites', 'updated_at');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_update AFTER UPDATE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE meta SET value = CASE key WHEN 'updated_at' THEN CAST(strftime('%s', 'now') AS INTEGER)
+                                     ELSE value + 1 END
+    WHERE key IN ('data_version', 'rewrites', 'updated_at');
+END;
+
+-- Daily FX rates: value of 1 unit of `currency` in EUR from `date` on (as-of)
+CREATE TABLE IF NOT EXISTS fx_rates (
+    currency TEXT NOT NULL,
+    date TEXT NOT NULL,
+    rate REAL NOT NULL,
+    PRIMARY KEY (currency, date)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_fx_insert AFTER INSERT ON fx_rates BEGIN
+    UPDATE meta SET value = CASE key WHEN 'data_version' THEN value + 1
+                                     ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+    WHERE key IN ('data_version', 'updated_at');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_fx_delete AFTER DELETE ON fx_rates BEGIN
+    UPDATE meta SET value = CASE key WHEN 'data_version' THEN value + 1
+                                     ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+    WHERE key IN ('data_version', 'updated_at');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_fx_update AFTER UPDATE ON fx_rates BEGIN
+    UPDATE meta SET value = CASE key WHEN 'data_version' THEN value + 1
+                                     ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+    WHERE key IN ('data_version', 'updated_at');
+END;
+
+CREATE TABLE IF NOT EXISTS insights_summary (
+    sign INTEGER PRIMARY KEY,
+    n INTEGER NOT NULL,
+    total REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS category_counts (
+    category TEXT NOT NULL PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO insights_summary (sign, n, total)
+    VALUES ((NEW.amount > 0) - (NEW.amount < 0), 1, NEW.amount)
+    ON CONFLICT(sign) DO UPDATE SET n = n + 1, total = total + excluded.total;
+    INSERT INTO category_counts (category, n) VALUES (IFNULL(NEW.category, ''), 1)
+    ON CONFLICT(category) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE insights_summary SET n = n - 1, total = total - OLD.amount
+    WHERE sign = (OLD.amount > 0) - (OLD.amount < 0);
+    UPDATE category_counts SET n = n - 1 WHERE category = IFNULL(OLD.category, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_update AFTER UPDATE OF amount, category ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE insights_summary SET n = n - 1, total = total - OLD.amount
+    WHERE sign = (OLD.amount > 0) - (OLD.amount < 0);
+    INSERT INTO insights_summary (sign, n, total)
+    VALUES ((NEW.amount > 0) - (NEW.amount < 0), 1, NEW.amount)
+    ON CONFLICT(sign) DO UPDATE SET n = n + 1, total = total + excluded.total;
+    UPDATE category_counts SET n = n - 1 WHERE category = IFNULL(OLD.category, '');
+    INSERT INTO category_counts (category, n) VALUES (IFNULL(NEW.category, ''), 1)
+    ON CONFLICT(category) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS merchant_counts (
+    merchant TEXT NOT NULL PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_merchants_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO merchant_counts (merchant, n) VALUES (IFNULL(NEW.merchant, ''), 1)
+    ON CONFLICT(merchant) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_merchants_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE merchant_counts SET n = n - 1 WHERE merchant = IFNULL(OLD.merchant, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_merchants_update AFTER UPDATE OF merchant ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE merchant_counts SET n = n - 1 WHERE merchant = IFNULL(OLD.merchant, '');
+    INSERT INTO merchant_counts (merchant, n) VALUES (IFNULL(NEW.merchant, ''), 1)
+    ON CONFLICT(merchant) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS monthly_rollup (
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    spent REAL NOT NULL,
+    income REAL NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (month, category, currency)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO monthly_rollup (month, category, currency, spent, income, n)
+    VALUES (substr(NEW.date, 1, 7), IFNULL(NEW.category, ''), IFNULL(NEW.currency, ''),
+            MIN(NEW.amount, 0), MAX(NEW.amount, 0), 1)
+    ON CONFLICT(month, category, currency) DO UPDATE SET
+        spent = spent + excluded.spent, income = income + excluded.income, n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE monthly_rollup SET
+        spent = spent - MIN(OLD.amount, 0), income = income - MAX(OLD.amount, 0), n = n - 1
+    WHERE month = substr(OLD.date, 1, 7) AND category = IFNULL(OLD.category, '')
+      AND currency = IFNULL(OLD.currency, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_update AFTER UPDATE OF date, amount, category, currency ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE monthly_rollup SET
+        spent = spent - MIN(OLD.amount, 0), income = income - MAX(OLD.amount, 0), n = n - 1
+    WHERE month = substr(OLD.date, 1, 7) AND category = IFNULL(OLD.category, '')
+      AND currency = IFNULL(OLD.currency, '');
+    INSERT INTO monthly_rollup (month, category, currency, spent, income, n)
+    VALUES (substr(NEW.date, 1, 7), IFNULL(NEW.category, ''), IFNULL(NEW.currency, ''),
+            MIN(NEW.amount, 0), MAX(NEW.amount, 0), 1)
+    ON CONFLICT(month, category, currency) DO UPDATE SET
+        spent = spent + excluded.spent, income = income + excluded.income, n = n + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    date TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    spent REAL NOT NULL,
+    income REAL NOT NULL,
+    n_spent INTEGER NOT NULL,
+    n_income INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (date, currency)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO daily_rollup (date, currency, spent, income, n_spent, n_income, n)
+    VALUES (NEW.date, IFNULL(NEW.currency, ''), MIN(NEW.amount, 0), MAX(NEW.amount, 0),
+            NEW.amount < 0, NEW.amount > 0, 1)
+    ON CONFLICT(date, currency) DO UPDATE SET
+        spent = spent + excluded.spent, income = income + excluded.income,
+        n_spent = n_spent + excluded.n_spent, n_income = n_income + excluded.n_income, n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE daily_rollup SET
+        spent = spent - MIN(OLD.amount, 0), income = income - MAX(OLD.amount, 0),
+        n_spent = n_spent - (OLD.amount < 0), n_income = n_income - (OLD.amount > 0), n = n - 1
+    WHERE date = OLD.date AND currency = IFNULL(OLD.currency, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_daily_update AFTER UPDATE OF date, amount, currency ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    UPDATE daily_rollup SET
+        spent = spent - MIN(OLD.amount, 0), income = income - MAX(OLD.amount, 0),
+        n_spent = n_spent - (OLD.amount < 0), n_income = n_income - (OLD.amount > 0), n = n - 1
+    WHERE date = OLD.date AND currency = IFNULL(OLD.currency, '');
+    INSERT INTO daily_rollup (date, currency, spent, income, n_spent, n_income, n)
+    VALUES (NEW.date, IFNULL(NEW.currency, ''), MIN(NEW.amount, 0), MAX(NEW.amount, 0),
+            NEW.amount < 0, NEW.amount > 0, 1)
+    ON CONFLICT(date, currency) DO UPDATE SET
+        spent = spent + excluded.spent, income = income + excluded.income,
+        n_spent = n_spent + excluded.n_spent, n_income = n_income + excluded.n_income, n = n + 1;
+END;
+
+CREATE INDEX IF NOT EXISTS idx_tx_category ON transactions (category COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tx_merchant ON transactions (merchant COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_tx_date_id ON transactions (date, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+    merchant, category, description,
+    content = 'transactions', content_rowid = 'rowid', tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO transactions_fts (rowid, merchant, category, description)
+    VALUES (NEW.rowid, NEW.merchant, NEW.category, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, merchant, category, description)
+    VALUES ('delete', OLD.rowid, OLD.merchant, OLD.category, OLD.description);
+END;
 
-def get_connection():
+CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF merchant, category, description ON transactions
+    WHEN (SELECT batch FROM trigger_control) IS NOT 1 BEGIN
+    INSERT INTO transactions_fts (transactions_fts, rowid, merchant, category, description)
+    VALUES ('delete', OLD.rowid, OLD.merchant, OLD.category, OLD.description);
+    INSERT INTO transactions_fts (rowid, merchant, category, description)
+    VALUES (NEW.rowid, NEW.merchant, NEW.category, NEW.description);
+END;
+"""
+
+# 16 MiB of pending terms per flush (default 1 MiB): a bulk batch writes
+# few large segments instead of many small ones that must then be merged.
+# The option is persistent, so it is set once, when the index is created.
+FTS_HASHSIZE = "INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('hashsize', 16777216)"
+
+# Full recomputation, used once when the derived tables are first created
+# and after bulk reseeds.
+REBUILD = """
+UPDATE meta SET value = CASE key WHEN 'updated_at' THEN CAST(strftime('%s', 'now') AS INTEGER)
+                                 ELSE value + 1 END
+WHERE key IN ('data_version', 'rewrites', 'updated_at');
+
+DELETE FROM insights_summary;
+INSERT INTO insights_summary (sign, n, total)
+SELECT (amount > 0) - (amount < 0) AS s, COUNT(*), SUM(amount)
+FROM transactions GROUP BY s;
+
+DELETE FROM category_counts;
+INSERT INTO category_counts (category, n)
+SELECT IFNULL(category, ''), COUNT(*) FROM transactions GROUP BY 1;
+
+DELETE FROM merchant_counts;
+INSERT INTO merchant_counts (merchant, n)
+SELECT IFNULL(merchant, ''), COUNT(*) FROM transactions GROUP BY 1;
+
+DELETE FROM monthly_rollup;
+INSERT INTO monthly_rollup (month, category, currency, spent, income, n)
+SELECT substr(date, 1, 7), IFNULL(category, ''), IFNULL(currency, ''),
+       SUM(MIN(amount, 0)), SUM(MAX(amount, 0)), COUNT(*)
+FROM transactions GROUP BY 1, 2, 3;
+
+DELETE FROM daily_rollup;
+INSERT INTO daily_rollup (date, currency, spent, income, n_spent, n_income, n)
+SELECT date, IFNULL(currency, ''), SUM(MIN(amount, 0)), SUM(MAX(amount, 0)),
+       SUM(amount < 0), SUM(amount > 0), COUNT(*)
+FROM transactions GROUP BY 1, 2;
+
+INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');
+"""
+
+# Tables filled by REBUILD and triggers that keep them current: if any is
+# missing, the derived state can be stale and is recomputed.
+DERIVED_TABLES = ("insights_summary", "category_counts", "merchant_counts", "monthly_rollup", "daily_rollup",
+                  "transactions_fts")
+TRIGGERS = tuple(re.findall(r"CREATE TRIGGER IF NOT EXISTS (\w+)", SCHEMA))
+
+
+def _exists(conn, kind: str, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)
+    ).fetchone()
+    return row is not None
+
+
+def _table_exists(conn, name: str) -> bool:
+    return _exists(conn, "table", name)
+
+
+def _stored(sql: str) -> str:
+    """A CREATE ... IF NOT EXISTS statement as sqlite_master keeps it."""
+    return sql.replace(" IF NOT EXISTS", "", 1).rstrip(";")
+
+
+def _migrate_legacy(conn):
+    """Move an untyped, key-less `transactions` table (pandas.to_sql) to TABLE."""
+    conn.executescript(f"""
+        ALTER TABLE transactions RENAME TO transactions_legacy;
+        {TABLE}
+        INSERT OR REPLACE INTO transactions ({", ".join(COLUMNS)})
+        SELECT {", ".join(COLUMNS)} FROM transactions_legacy WHERE id IS NOT NULL;
+        DROP TABLE transactions_legacy;
+    """)
+
+
+def ensure_schema(conn):
+    """Create (or migrate) the transactions table and its derived structures."""
+    legacy = _table_exists(conn, "transactions") and not any(
+        row[5] for row in conn.execute("PRAGMA table_info(transactions)")
+    )
+    if legacy:
+        _migrate_legacy(conn)
+    # Version triggers from before `meta.updated_at` existed: recreate them
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+        "AND name LIKE 'trg_version_%' AND sql NOT LIKE '%updated_at%'"
+    ).fetchall():
+        conn.execute(f'DROP TRIGGER "{name}"')
+    # category_counts from before NULL was stored as '': rebuilt with its triggers
+    if _table_exists(conn, "category_counts") and not any(
+        row[1] == "category" and row[3] for row in conn.execute("PRAGMA table_info(category_counts)")
+    ):
+        conn.execute("DROP TABLE category_counts")
+        for name in ("trg_summary_insert", "trg_summary_delete", "trg_summary_update"):
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    fresh = (
+        legacy
+        or not all(_table_exists(conn, name) for name in DERIVED_TABLES)
+        or not all(_exists(conn, "trigger", name) for name in TRIGGERS)
+    )
+    # Triggers whose definition changed without touching the tables (ungated
+    # ones from before trigger_control, version triggers from before
+    # `rewrites`): swapped in place in one transaction, so no concurrent
+    # write misses them and no rebuild is needed
+    outdated = [name for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'transactions'"
+    ).fetchall() if name in TRANSACTION_TRIGGERS and sql != _stored(TRANSACTION_TRIGGERS[name])]
+    if outdated:
+        conn.executescript("BEGIN IMMEDIATE;" + TRIGGER_CONTROL + "".join(
+            f'DROP TRIGGER "{name}"; {TRANSACTION_TRIGGERS[name]}' for name in outdated) + "COMMIT;")
+    fts_created = not _table_exists(conn, "transactions_fts")
+    conn.executescript(SCHEMA)
+    if fts_created:
+        conn.execute(FTS_HASHSIZE)
+    if fresh:
+        rebuild_derived(conn)
+
+
+def data_version(conn) -> int:
+    """Counter bumped by every insert/update/delete on `transactions`."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return row[0] if row else 0
+
+
+def rewrite_count(conn) -> int:
+    """Rows of `transactions` updated or deleted so far (REBUILD counts too): unchanged = append-only."""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'rewrites'").fetchone()
+    return row[0] if row else 0
+
+
+def data_key(conn) -> tuple[str, int]:
+    """(tenant, data_version): what results memoized per data version must be keyed on."""
+    return current_tenant.get(), data_version(conn)
+
+
+def data_stamp(conn) -> tuple[int, int]:
+    """(data_version, updated_at unix seconds) in one query."""
+    rows = dict(conn.execute(
+        "SELECT key, value FROM meta WHERE key IN ('data_version', 'updated_at')").fetchall())
+    return rows.get("data_version", 0), rows.get("updated_at", 0)
+
+
+@contextmanager
+def gc_paused():
+    """For fetchall() of millions of rows: the tuples would otherwise trigger repeated full GC passes."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def drop_maintenance(conn):
     """
-    Opens a connection to the SQLite database (creates the file if it doesn’t exist).
-    Returns:
-        sqlite3.Connection: an active connection object
+    Drop the triggers and secondary indexes on `transactions` before a bulk
+    load; ensure_schema() recreates them (and rebuilds) afterwards.
     """
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # allows returning dict-like rows, how to give back data
-    return conn
-print("fatto")
\ No newline at end of file
+    rows = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE tbl_name = 'transactions' "
+        "AND type IN ('trigger', 'index') AND name NOT LIKE 'sqlite_autoindex%'"
+    ).fetchall()
+    for kind, name in rows:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    conn.commit()
+
+
+def rebuild_derived(conn):
+    """Recompute every derived structure from the full transactions table."""
+    conn.executescript(REBUILD)
+
+
+# ----------------------------------------------------------
+# BATCH WRITES
+# ----------------------------------------------------------
+# Set-based counterpart of the row triggers, for large upserts (Ingest.py).
+# Per row, the triggers cost ~10x the insert itself; for a batch, the old
+# and new versions of the affected rows are staged in temp tables, their
+# delta is grouped once by date x currency x category (batch_groups) and
+# each derived structure is adjusted from it with one statement. The row
+# triggers are switched off with trigger_control.batch, set and reset
+# inside the same transaction (no DDL, so prepared statements stay valid),
+# and the version is bumped once.
+TRANSACTION_TRIGGERS = {
+    name: sql
+    for sql, name in re.findall(r"(CREATE TRIGGER IF NOT EXISTS (\w+) .*?\nEND;)", SCHEMA, re.S)
+    if re.search(r" ON transactions\s", sql)
+}
+
+_COLS = ", ".join(COLUMNS)
+
+BATCH_SETUP = (
+    "CREATE TEMP TABLE IF NOT EXISTS batch_new (id TEXT, date TEXT, description TEXT, "
+    "amount REAL, currency TEXT, merchant TEXT, category TEXT, city TEXT, country TEXT)",
+    f"CREATE TEMP TABLE IF NOT EXISTS batch_old (rid INTEGER PRIMARY KEY, {_COLS})",
+    # -1 for the replaced version of a row, +1 for the version written
+    "CREATE TEMP VIEW IF NOT EXISTS batch_delta AS "
+    "SELECT date, amount, currency, category, merchant, -1 AS w FROM batch_old "
+    "UNION ALL SELECT date, amount, currency, category, merchant, 1 FROM batch_new",
+    # the delta grouped once by date x currency x category; every rollup is read from it
+    "CREATE TEMP TABLE IF NOT EXISTS batch_groups (date TEXT, currency TEXT, category TEXT, "
+    "spent REAL, income REAL, n_spent INTEGER, n_income INTEGER, n INTEGER)",
+    "DELETE FROM batch_new",
+    "DELETE FROM batch_old",
+    "DELETE FROM batch_groups",
+)
+
+BATCH_STAGE = f"INSERT INTO batch_new ({_COLS}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+BATCH_OLD = (
+    f"INSERT INTO batch_old (rid, {_COLS}) "
+    f"SELECT t.rowid, {', '.join('t.' + c for c in COLUMNS)} FROM batch_new n JOIN transactions t ON t.id = n.id"
+)
+
+BATCH_WRITE = {
+    "update": (
+        f"INSERT INTO transactions ({_COLS}) SELECT {_COLS} FROM batch_new WHERE true "
+        "ON CONFLICT(id) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "id")
+    ),
+    # existing ids were already removed from batch_new (and batch_old emptied)
+    "ignore": f"INSERT INTO transactions ({_COLS}) SELECT {_COLS} FROM batch_new",
+}
+
+BATCH_MAINTAIN = (
+    """INSERT INTO transactions_fts (transactions_fts, rowid, merchant, category, description)
+       SELECT 'delete', rid, merchant, category, description FROM batch_old""",
+    """INSERT INTO transactions_fts (rowid, merchant, category, description)
+       SELECT t.rowid, t.merchant, t.category, t.description
+       FROM batch_new n JOIN transactions t ON t.id = n.id ORDER BY t.rowid""",
+    """INSERT INTO batch_groups (date, currency, category, spent, income, n_spent, n_income, n)
+       SELECT date, IFNULL(currency, ''), IFNULL(category, ''), SUM(w * MIN(amount, 0)),
+              SUM(w * MAX(amount, 0)), SUM(w * (amount < 0)), SUM(w * (amount > 0)), SUM(w)
+       FROM batch_delta GROUP BY 1, 2, 3""",
+    """INSERT INTO insights_summary (sign, n, total)
+       SELECT * FROM (
+           SELECT -1, SUM(n_spent) AS n, SUM(spent) AS total FROM batch_groups
+           UNION ALL SELECT 1, SUM(n_income), SUM(income) FROM batch_groups
+           UNION ALL SELECT 0, SUM(n - n_spent - n_income), 0 FROM batch_groups
+       ) WHERE n <> 0 OR total <> 0
+       ON CONFLICT(sign) DO UPDATE SET n = n + excluded.n, total = total + excluded.total""",
+    """INSERT INTO category_counts (category, n)
+       SELECT category, SUM(n) FROM batch_groups WHERE true
+       GROUP BY 1 HAVING SUM(n) <> 0
+       ON CONFLICT(category) DO UPDATE SET n = n + excluded.n""",
+    """INSERT INTO merchant_counts (merchant, n)
+       SELECT IFNULL(merchant, ''), SUM(w) FROM batch_delta WHERE true
+       GROUP BY 1 HAVING SUM(w) <> 0
+       ON CONFLICT(merchant) DO UPDATE SET n = n + excluded.n""",
+    """INSERT INTO monthly_rollup (month, category, currency, spent, income, n)
+       SELECT substr(date, 1, 7), category, currency, SUM(spent), SUM(income), SUM(n)
+       FROM batch_groups WHERE true GROUP BY 1, 2, 3
+       ON CONFLICT(month, category, currency) DO UPDATE SET
+           spent = spent + excluded.spent, income = income + excluded.income, n = n + excluded.n""",
+    """INSERT INTO daily_rollup (date, currency, spent, income, n_spent, n_income, n)
+       SELECT date, currency, SUM(spent), SUM(income), SUM(n_spent), SUM(n_income), SUM(n)
+       FROM batch_groups WHERE true GROUP BY 1, 2
+       ON CONFLICT(date, currency) DO UPDATE SET
+           spent = spent + excluded.spent, income = income + excluded.income,
+           n_spent = n_spent + excluded.n_spent, n_income = n_income + excluded.n_income,
+           n = n + excluded.n""",
+    """UPDATE meta SET value = CASE key WHEN 'data_version' THEN value + 1
+                                        WHEN 'rewrites' THEN value + (SELECT COUNT(*) FROM batch_old)
+                                        ELSE CAST(strftime('%s', 'now') AS INTEGER) END
+       WHERE key IN ('data_version', 'rewrites', 'updated_at')""",
+)
+
+
+def write_batch(conn, rows: list, on_conflict: str = "update") -> dict:
+    """
+    Upsert `rows` (tuples in COLUMNS order, unique ids) with every derived
+    structure maintained set-wise. Must run inside the caller's transaction
+    (pool.write()); on_conflict is 'update' (replace existing ids) or
+    'ignore' (keep them). Returns inserted / updated / ignored counts.
+    """
+    if on_conflict not in BATCH_WRITE:
+        raise ValueError(f"on_conflict must be one of {', '.join(BATCH_WRITE)}")
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    for sql in BATCH_SETUP:
+        conn.execute(sql)
+    conn.executemany(BATCH_STAGE, rows)
+    conn.execute(BATCH_OLD)
+    existing = conn.execute("SELECT COUNT(*) FROM batch_old").fetchone()[0]
+    if on_conflict == "ignore" and existing:
+        conn.execute("DELETE FROM batch_new WHERE id IN (SELECT id FROM batch_old)")
+        conn.execute("DELETE FROM batch_old")
+    written = conn.execute("SELECT COUNT(*) FROM batch_new").fetchone()[0]
+    if written:
+        conn.execute("UPDATE trigger_control SET batch = 1")
+        try:
+            conn.execute(BATCH_WRITE[on_conflict])
+            for sql in BATCH_MAINTAIN:
+                conn.execute(sql)
+        finally:
+            # also on failure: a caller that commits anyway keeps working triggers
+            conn.execute("UPDATE trigger_control SET batch = 0")
+    updated = existing if on_conflict == "update" else 0
+    return {
+        "inserted": written - updated,
+        "updated": updated,
+        "ignored": existing if on_conflict == "ignore" else 0,
+    }
+
+
+# ----------------------------------------------------------
+# QUERY OBSERVERS
+# ----------------------------------------------------------
+# Callables (sql, params, seconds, rows) notified by every pooled connection:
+# once per execute (rows=None) and once per fetch call (rows=rows returned).
+# Rows read by iterating a cursor directly are not counted.
+_query_observers = []
+
+
+def add_query_observer(fn):
+    _query_observers.append(fn)
+
+
+def _notify(sql, params, seconds, rows):
+    for fn in _query_observers:
+        fn(sql, params, seconds, rows)
+
+
+class ObservedCursor(sqlite3.Cursor):
+    _sql = None
+    _params = ()
+
+    def execute(self, sql, params=()):
+        if not _query_observers:
+            return super().execute(sql, params)
+        self._sql, self._params = sql, params
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _notify(sql, params, time.perf_counter() - start, None)
+
+    def executemany(self, sql, seq_of_params):
+        if not _query_observers:
+            return super().executemany(sql, seq_of_params)
+        self._sql, self._params = sql, ()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            _notify(sql, (), time.perf_counter() - start, None)
+
+    def _fetch(self, method, *args):
+        if not _query_observers or self._sql is None:
+            return method(*args)
+        start = time.perf_counter()
+        rows = method(*args)
+        _notify(self._sql, self._params, time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchone(self):
+        if not _query_observers or self._sql is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        _notify(self._sql, self._params, time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class ObservedConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute() shortcuts) report to the observers."""
+
+    def cursor(self, factory=ObservedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+
+class ConnectionPool:
+    """Bounded pool of read-only connections plus a single writer connection."""
+
+    def __init__(self, path: Path = DB_PATH, size: int = READ_POOL_SIZE):
+        self.path = Path(path)
+        self.size = size
+        self._idle = queue.LifoQueue()  # LIFO: hottest (most cached) connection first
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self._created = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+
+    # ------------------------------------------------------
+    # LIFECYCLE
+    # ------------------------------------------------------
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    def open(self):
+        """Open the writer connection (creating the DB file if needed) and switch to WAL."""
+        with self._lock:
+            if self._writer is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=WRITE_TIMEOUT, check_same_thread=False,
+                                   factory=ObservedConnection)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._tune(conn)
+            ensure_schema(conn)
+            self._writer = conn
+
+    def close(self):
+        """Close every pooled connection; the pool can be reopened afterwards."""
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def close_if_idle(self) -> bool:
+        """Close unless a connection is checked out (shard eviction); True if closed."""
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                if self._created != self._idle.qsize():
+                    return False
+            self.close()
+            return True
+        finally:
+            self._write_lock.release()
+
+    # ------------------------------------------------------
+    # CONNECTIONS
+    # ------------------------------------------------------
+    @staticmethod
+    def _tune(conn):
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+    def _connect_reader(self):
+        uri = f"{self.path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=ObservedConnection)
+        conn.execute("PRAGMA query_only=ON")
+        self._tune(conn)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect_reader()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=READ_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"No read connection available after {READ_TIMEOUT}s")
+        with self._lock:
+            self._waits += 1
+            self._wait_time += time.perf_counter() - start
+        return conn
+
+    def prefill(self, n: int):
+        """Open up to `n` reader connections ahead of traffic (startup warmup)."""
+        if not self.is_open:
+            self.open()
+        with self._lock:
+            missing = max(0, min(n, self.size) - self._created)
+            self._created += missing
+        for _ in range(missing):
+            try:
+                self._idle.put(self._connect_reader())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    @contextmanager
+    def read(self):
+        """Borrow a read-only connection for the duration of the block."""
+        if not self.is_open:
+            self.open()
+        conn = self._acquire()
+        with self._lock:
+            self._checkouts += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def write(self):
+        """Run the block on the single writer connection inside one transaction."""
+        if not self.is_open:
+            self.open()
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    # ------------------------------------------------------
+    # STATS
+    # ------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                "path": str(self.path),
+                "open": self.is_open,
+                "max_readers": self.size,
+                "readers_created": self._created,
+                "readers_idle": idle,
+                "readers_in_use": self._created - idle,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "avg_wait_ms": round(1000 * self._wait_time / self._waits, 3) if self._waits else 0.0,
+                "writer_busy": self._write_lock.locked(),
+            }
+
+
+# ----------------------------------------------------------
+# TENANTS
+# ----------------------------------------------------------
+TENANT_ID = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+
+# Tenant of the current request (contextvars follow run_in_threadpool)
+current_tenant = ContextVar("finnlp_tenant", default=DEFAULT_TENANT)
+
+
+class UnknownTenant(LookupError):
+    """No shard exists for the tenant and auto-creation is off."""
+
+
+class ShardRouter:
+    """
+    Tenant → ConnectionPool on the tenant's own file, so tenants never share
+    a writer lock, a page cache or a data version. Pools are opened on first
+    use; beyond `max_open`, the least recently used idle ones are closed.
+    """
+
+    def __init__(self, default_path: Path = DB_PATH, directory: Path = TENANT_DIR,
+                 max_open: int = MAX_OPEN_SHARDS, autocreate: bool = TENANT_AUTOCREATE):
+        self.default_path = Path(default_path)
+        self.directory = Path(directory)
+        self.max_open = max_open
+        self.autocreate = autocreate
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self._closed_waits = 0
+
+    def path_for(self, tenant: str) -> Path:
+        if tenant == DEFAULT_TENANT:
+            return self.default_path
+        if not TENANT_ID.fullmatch(tenant):
+            raise ValueError(f"Invalid tenant id '{tenant}'")
+        return self.directory / f"{tenant}.db"
+
+    def exists(self, tenant: str) -> bool:
+        return tenant == DEFAULT_TENANT or tenant in self._pools or self.path_for(tenant).exists()
+
+    def get(self, tenant: str | None = None, create: bool = False) -> ConnectionPool:
+        """Pool of `tenant` (default: the current one); UnknownTenant if it has no shard."""
+        tenant = tenant or current_tenant.get()
+        with self._lock:
+            shard = self._pools.get(tenant)
+            if shard is not None:
+                self._pools.move_to_end(tenant)
+                return shard
+        if not (create or self.autocreate or self.exists(tenant)):
+            raise UnknownTenant(f"Unknown tenant '{tenant}'")
+        with self._lock:
+            shard = self._pools.get(tenant)
+            if shard is None:
+                size = READ_POOL_SIZE if tenant == DEFAULT_TENANT else TENANT_READ_POOL_SIZE
+                shard = self._pools[tenant] = ConnectionPool(self.path_for(tenant), size)
+                self._evict()
+            self._pools.move_to_end(tenant)
+        if create:
+            shard.open()
+        return shard
+
+    def _evict(self):
+        # caller holds the lock; busy pools are skipped and retried on the next open
+        for tenant in list(self._pools):
+            if len(self._pools) <= self.max_open:
+                return
+            shard = self._pools[tenant]
+            waits = shard.stats()["waits"]
+            if shard.close_if_idle():
+                self._closed_waits += waits
+                del self._pools[tenant]
+
+    def tenants(self) -> list[str]:
+        """Every tenant with a shard on disk."""
+        on_disk = [p.stem for p in self.directory.glob("*.db") if TENANT_ID.fullmatch(p.stem)]
+        return [DEFAULT_TENANT] + sorted(on_disk)
+
+    def close(self):
+        with self._lock:
+            for shard in self._pools.values():
+                shard.close()
+            self._pools.clear()
+
+    def stats(self) -> dict:
+        """Reader counts summed over the open shards."""
+        with self._lock:
+            shards = {t: p.stats() for t, p in self._pools.items()}
+        total = {k: sum(s[k] for s in shards.values())
+                 for k in ("max_readers", "readers_created", "readers_idle", "readers_in_use", "waits")}
+        total["waits"] += self._closed_waits
+        return {"shards_open": len(shards), "max_open": self.max_open, **total,
+                "writers_busy": sum(s["writer_busy"] for s in shards.values())}
+
+
+class TenantPool:
+    """ConnectionPool interface that resolves the current tenant's shard on every call."""
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    @property
+    def shard(self) -> ConnectionPool:
+        return self.router.get()
+
+    @property
+    def path(self) -> Path:
+        return self.shard.path
+
+    @property
+    def is_open(self) -> bool:
+        return self.shard.is_open
+
+    def open(self):
+        self.shard.open()
+
+    def prefill(self, n: int):
+        self.shard.prefill(n)
+
+    def read(self):
+        return self.shard.read()
+
+    def write(self):
+        return self.shard.write()
+
+    def stats(self) -> dict:
+        return {"tenant": current_tenant.get(), **self.shard.stats()}
+
+    def close(self):
+        """Close every shard."""
+        self.router.close()
+
+
+# Shared router and tenant-aware pool used by the API
+router = ShardRouter()
+pool = TenantPool(router)
+
+
+if __name__ == "__main__":
+    pool.open()
+    print(f"✅ Database ready → {pool.path}")
+    print(pool.stats())
+    pool.close()
@@ -2,22 +2,20 @@ import random
 import uuid
 import datetime
 import csv
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 from faker import Faker
 
+from Classifier import CATEGORIES  # same merchant dictionary used to label raw descriptions
+
 fake = Faker("en_GB")  # puoi usare "it_IT" per nomi italiani
 
-CATEGORIES = {
-    "Food": ["McDonald's", "Subway", "Starbucks", "Pizza Express", "Just Eat"],
-    "Groceries": ["Tesco", "Sainsbury's", "Lidl", "Aldi", "Waitrose"],
-    "Transport": ["Uber", "Trainline", "Shell", "BP Petrol", "Transport for London"],
-    "Shopping": ["Amazon", "Zara", "H&M", "IKEA", "Apple Store"],
-    "Entertainment": ["Netflix", "Spotify", "Cineworld", "PlayStation Store"],
-    "Utilities": ["British Gas", "Thames Water", "EE Mobile", "Octopus Energy"],
-    "Health": ["Boots Pharmacy", "NHS Prescription", "PureGym", "Vision Express"],
-    "Travel": ["Ryanair", "Booking.com", "Airbnb", "EasyJet"],
-    "Income": ["Salary ACME Ltd", "Freelance Payment", "Tax Refund"],
-    "Other": ["PayPal", "TransferWise", "Bank Fee"],
-}
+CURRENCIES = ["EUR", "GBP", "USD"]
 
 def generate_transaction():
     category = random.choice(list(CATEGORIES.keys()))
@@ -53,5 +51,169 @@ def generate_dataset(n=1000, filename = "Data/synthetic_transactions.csv"
         writer.writerows(rows)
     print(f"✅ Generated {n} synthetic transactions → {filename}")
 
+# ----------------------------------------------------------
+# VECTORIZED MODE (benchmark-scale datasets)
+# ----------------------------------------------------------
+# Same columns and distributions as generate_transaction(), drawn with NumPy
+# in blocks. Faker is only used to pre-sample pools of cities/countries.
+# Chunk i always uses SeedSequence(seed, spawn_key=(i,)), so the output is
+# identical whatever the number of workers.
+PLACE_POOL_SIZE = 5000
+_CAT_NAMES = np.array(list(CATEGORIES.keys()), dtype=object)
+_MERCHANTS = np.array([m for ms in CATEGORIES.values() for m in ms], dtype=object)
+_M_COUNT = np.array([len(ms) for ms in CATEGORIES.values()])
+_M_OFFSET = np.concatenate([[0], np.cumsum(_M_COUNT)[:-1]])
+_INCOME = list(CATEGORIES).index("Income")
+
+_pools = {}  # filled in each worker by _init_worker
+
+def sample_place_pools(seed=42, size=PLACE_POOL_SIZE):
+    """Pre-sample (cities, countries) with Faker once; rows then index into them."""
+    f = Faker("en_GB")
+    f.seed_instance(seed)
+    cities = np.array([f.city() for _ in range(size)], dtype=object)
+    countries = np.array([f.country() for _ in range(size)], dtype=object)
+    return cities, countries
+
+def _init_worker(cities, countries):
+    _pools["cities"], _pools["countries"] = cities, countries
+
+def _uuid4_block(rng, n):
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    h = raw.tobytes().hex()
+    return [
+        f"{h[i:i+8]}-{h[i+8:i+12]}-{h[i+12:i+16]}-{h[i+16:i+20]}-{h[i+20:i+32]}"
+        for i in range(0, 32 * n, 32)
+    ]
+
+def generate_block(n, seed=42, chunk_index=0, end_date=None):
+    """Generate `n` rows as a DataFrame, deterministic for (seed, chunk_index, end_date)."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    end_date = np.datetime64(end_date or datetime.date.today(), "D")
+    cities, countries = _pools["cities"], _pools["countries"]
+
+    cat = rng.integers(0, len(_CAT_NAMES), n)
+    merchant = _MERCHANTS[_M_OFFSET[cat] + (rng.random(n) * _M_COUNT[cat]).astype(np.int64)]
+    amount = np.round(rng.uniform(5.0, 300.0, n), 2)
+    amount[cat != _INCOME] *= -1  # negative = expense
+    dates = end_date - rng.integers(0, 366, n).astype("timedelta64[D]")
+    city = cities[rng.integers(0, len(cities), n)]
+
+    merchant_s = pd.Series(merchant)
+    city_s = pd.Series(city)
+    return pd.DataFrame({
+        "id": _uuid4_block(rng, n),
+        "date": np.datetime_as_string(dates, unit="D"),
+        "description": merchant_s + " " + city_s,
+        "amount": amount,
+        "currency": np.array(CURRENCIES, dtype=object)[rng.integers(0, len(CURRENCIES), n)],
+        "merchant": merchant_s,
+        "category": _CAT_NAMES[cat],
+        "city": city_s,
+        "country": countries[rng.integers(0, len(countries), n)],
+    })
+
+def _generate_chunk(args):
+    return generate_block(*args)
+
+class _ChunkWriter:
+    """Appends DataFrame chunks to a CSV or Parquet file (chosen by suffix)."""
+
+    def __init__(self, filename):
+        self.path = Path(filename)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.parquet = self.path.suffix == ".parquet"
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def generate_dataset_fast(n=1_000_000, filename="Data/synthetic_transactions.csv",
+                          chunk_size=250_000, workers=None, seed=42):
+    """
+    Vectorized, multi-process variant of generate_dataset for 10M+ rows.
+    Chunks are generated in a process pool and written in order as they
+    complete; at most 2 chunks per worker are in flight, so memory is bounded.
+    """
+    workers = workers or os.cpu_count() or 1
+    end_date = datetime.date.today()
+    cities, countries = sample_place_pools(seed)
+    tasks = [
+        (min(chunk_size, n - start), seed, i, end_date)
+        for i, start in enumerate(range(0, n, chunk_size))
+    ]
+    writer = _ChunkWriter(filename)
+    try:
+        if workers == 1:
+            _init_worker(cities, countries)
+            for task in tasks:
+                writer.write(_generate_chunk(task))
+        else:
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(cities, countries)) as ex:
+                window = 2 * workers
+                pending = [ex.submit(_generate_chunk, t) for t in tasks[:window]]
+                for i in range(len(tasks)):
+                    writer.write(pending.pop(0).result())
+                    if i + window < len(tasks):
+                        pending.append(ex.submit(_generate_chunk, tasks[i + window]))
+    finally:
+        writer.close()
+    print(f"✅ Generated {n} synthetic transactions ({len(tasks)} chunks, {workers} workers) → {filename}")
+
+# Approximate EUR value of one unit, the starting point of the synthetic walk
+FX_START = {"GBP": 1.17, "USD": 0.92}
+
+def generate_fx_rates(filename="Data/fx_rates.csv", days=400, end_date=None, seed=42):
+    """
+    Synthetic daily FX rates (EUR per unit) for the non-EUR CURRENCIES:
+    a log-normal random walk, ~0.4% daily volatility, business days only.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = end_date or datetime.date.today()
+    dates = pd.bdate_range(end=end_date, periods=days)
+    frames = []
+    for currency, start in FX_START.items():
+        walk = start * np.exp(np.cumsum(rng.normal(0, 0.004, len(dates))))
+        frames.append(pd.DataFrame({
+            "date": dates.strftime("%Y-%m-%d"), "currency": currency, "rate": walk.round(6),
+        }))
+    pd.concat(frames).to_csv(filename, index=False)
+    print(f"✅ Generated {days} days of FX rates for {', '.join(FX_START)} → {filename}")
+
 if __name__ == "__main__":
-    generate_dataset(1000)
+    parser = argparse.ArgumentParser(description="Generate synthetic transactions")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--out", default="Data/synthetic_transactions.csv",
+                        help="output file (.csv or .parquet)")
+    parser.add_argument("--fast", action="store_true", help="vectorized multi-process mode")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    parser.add_argument("--fx-out", default=None,
+                        help="also write synthetic daily FX rates to this CSV")
+    parser.add_argument("--fx-only", action="store_true", help="write only the FX rates")
+    args = parser.parse_args()
+    if args.fx_out or args.fx_only:
+        generate_fx_rates(args.fx_out or "Data/fx_rates.csv")
+    if args.fx_only:
+        raise SystemExit(0)
+    if args.fast:
+        generate_dataset_fast(args.rows, args.out, args.chunk_size, args.workers)
+    else:
+        generate_dataset(args.rows, args.out)
@@ -0,0 +1,84 @@
+"""
+Export.py
+---------
+Keyset pagination and streaming export of the transactions table.
+
+Both walk the (date, id) index, so page N costs the same as page 1 and an
+export never holds more than one chunk of rows in memory.
+"""
+
+import base64
+import csv
+import io
+import json
+
+from Database import COLUMNS, pool
+from Formats import JSON_ROW
+
+ORDER = "ORDER BY date, id"
+
+
+def encode_cursor(date, tx_id) -> str:
+    raw = json.dumps([date, tx_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Raises ValueError on anything that is not a cursor we issued."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, tx_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    # valid JSON of another shape (e.g. [[], []]) would fail later, inside SQLite
+    if not (isinstance(date, str) and isinstance(tx_id, str)):
+        raise ValueError("Invalid cursor: date and id must be strings")
+    return date, tx_id
+
+
+def fetch_page(cursor: str | None, limit: int) -> dict:
+    """Return {"items": [...], "next_cursor": str | None} after `cursor`."""
+    params = []
+    where = ""
+    if cursor:
+        where = "WHERE (date, id) > (?, ?)"
+        params += decode_cursor(cursor)
+    query = f"SELECT {', '.join(COLUMNS)} FROM transactions {where} {ORDER} LIMIT ?"
+    with pool.read() as conn:
+        rows = conn.execute(query, (*params, limit + 1)).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [dict(zip(COLUMNS, row)) for row in rows]
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if more else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _ndjson_chunks(cur, chunk_size):
+    while rows := cur.fetchmany(chunk_size):
+        yield "".join(row[0] + "\n" for row in rows)
+
+
+def _csv_chunks(cur, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    while rows := cur.fetchmany(chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def stream_rows(fmt: str = "ndjson", chunk_size: int = 5000):
+    """
+    Generator of NDJSON or CSV text chunks over the whole table.
+    The read connection (and its WAL snapshot) is held until the stream ends.
+    """
+    select = JSON_ROW if fmt == "ndjson" else ", ".join(COLUMNS)
+    encode = _ndjson_chunks if fmt == "ndjson" else _csv_chunks
+    with pool.read() as conn:
+        cur = conn.execute(f"SELECT {select} FROM transactions {ORDER}")
+        try:
+            yield from encode(cur, chunk_size)
+        finally:
+            cur.close()
@@ -0,0 +1,156 @@
+"""
+FX.py
+-----
+Currency normalization for totals and breakdowns.
+
+Rates live in `fx_rates` (value of 1 unit of a currency in EUR, per date)
+and are loaded from a local CSV with columns date,currency,rate. Loading
+bumps the data version, so every cache keyed on it is invalidated.
+
+Conversion is vectorized: transactions are first grouped by
+(date, currency[, key]), a few thousand rows instead of millions; without a
+key (the /insights totals, time series) the groups are read from
+`daily_rollup`, which the write triggers keep current, so no write makes
+them rescan `transactions`. The groups are matched to the latest rate on or
+before their date with pandas.merge_asof and multiplied by
+rate(currency) / rate(target). The converted frame is memoized per tenant,
+data version and target currency.
+
+Currencies without any dated rate fall back to DEFAULT_RATES. Anything
+still unknown is left out of the totals and reported in `missing_rates`.
+"""
+
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from Database import ConnectionPool, data_key, pool as default_pool
+
+BASE = "EUR"
+FX_PATH = Path(
+    os.environ.get("FINNLP_FX_PATH", Path(__file__).resolve().parent.parent / "Data" / "fx_rates.csv")
+)
+# Used only when a currency has no row in fx_rates
+DEFAULT_RATES = {"EUR": 1.0, "GBP": 1.17, "USD": 0.92}
+GROUP_KEYS = ("category", "merchant", "currency", "city", "country")
+CACHE_ENTRIES = 32
+
+UPSERT = (
+    "INSERT INTO fx_rates (currency, date, rate) VALUES (?, ?, ?) "
+    "ON CONFLICT(currency, date) DO UPDATE SET rate = excluded.rate"
+)
+
+
+def load_rates(source=FX_PATH, db_pool: ConnectionPool = default_pool) -> int:
+    """Upsert a date,currency,rate CSV into fx_rates. Returns the number of rows."""
+    path = Path(source)
+    if not path.exists():
+        raise FileNotFoundError(f"❌ FX rates file not found: {path}")
+    df = pd.read_csv(path, usecols=["date", "currency", "rate"], dtype={"date": str, "currency": str})
+    df = df.dropna()
+    df["currency"] = df["currency"].str.upper()
+    rows = list(df[["currency", "date", "rate"]].itertuples(index=False, name=None))
+    with db_pool.write() as conn:
+        conn.executemany(UPSERT, rows)
+    return len(rows)
+
+
+# ----------------------------------------------------------
+# CONVERSION
+# ----------------------------------------------------------
+def _rates(conn) -> pd.DataFrame:
+    """All rates as (_d, currency, rate) sorted by date; DEFAULT_RATES dated at the start of time."""
+    rates = pd.read_sql_query("SELECT currency, date, rate FROM fx_rates", conn)
+    rates["_d"] = pd.to_datetime(rates.pop("date"), format="%Y-%m-%d")
+    known = set(rates["currency"])
+    fallback = pd.DataFrame(
+        [(c, r, pd.Timestamp.min) for c, r in DEFAULT_RATES.items() if c not in known],
+        columns=["currency", "rate", "_d"],
+    )
+    rates = pd.concat([rates, fallback], ignore_index=True)
+    rates["currency"] = rates["currency"].astype(str)
+    rates["_d"] = rates["_d"].astype("datetime64[ns]")
+    return rates.sort_values("_d")[["_d", "currency", "rate"]]
+
+
+def _as_of(frame: pd.DataFrame, right: pd.DataFrame, column: str) -> pd.Series:
+    """Rate of frame[column] on each frame date: latest on/before it, else the first after it."""
+    left = pd.DataFrame({
+        "_d": pd.to_datetime(frame["date"], format="%Y-%m-%d").astype("datetime64[ns]"),
+        "currency": frame[column].astype(str),
+    }).reset_index().sort_values("_d")
+    back = pd.merge_asof(left, right, on="_d", by="currency", direction="backward")
+    ahead = pd.merge_asof(left, right, on="_d", by="currency", direction="forward")
+    rate = back["rate"].fillna(ahead["rate"])
+    return pd.Series(rate.to_numpy(), index=back["index"]).sort_index()
+
+
+# the rollup stores a NULL currency as ''
+DAILY = ("SELECT date, NULLIF(currency, '') AS currency, NULL AS key, spent, income, n_spent, n_income, n "
+         "FROM daily_rollup WHERE n > 0")
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _converted(version: tuple, by: str | None, target: str) -> pd.DataFrame:
+    if by is None:
+        sql = DAILY
+    else:
+        sql = (f"SELECT date, currency, {by} AS key, "
+               "SUM(MIN(amount, 0)) AS spent, SUM(MAX(amount, 0)) AS income, "
+               "SUM(amount < 0) AS n_spent, SUM(amount > 0) AS n_income, COUNT(*) AS n "
+               "FROM transactions GROUP BY date, currency, key")
+    with default_pool.read() as conn:
+        frame = pd.read_sql_query(sql, conn)
+        rates = _rates(conn)
+    frame["target"] = target
+    factor = _as_of(frame, rates, "currency") / _as_of(frame, rates, "target")
+    frame["spent"] *= factor
+    frame["income"] *= factor
+    frame["converted"] = factor.notna()
+    return frame
+
+
+def converted(by: str | None = None, target: str = BASE) -> pd.DataFrame:
+    """
+    Per (date, currency, key) group: spent / income in `target`, counts, and a
+    `converted` flag (False when no rate is known for the currency).
+    """
+    if by is not None and by not in GROUP_KEYS:
+        raise ValueError(f"Cannot group by '{by}'")
+    target = target.upper()
+    if target not in currencies():
+        raise ValueError(f"No FX rates for target currency '{target}'")
+    with default_pool.read() as conn:
+        version = data_key(conn)
+    return _converted(version, by, target)
+
+
+def factors(codes: list, date: str, target: str = BASE) -> pd.Series:
+    """Multiplier from each currency to `target` as of `date` (NaN when no rate is known)."""
+    target = target.upper()
+    if target not in currencies():
+        raise ValueError(f"No FX rates for target currency '{target}'")
+    frame = pd.DataFrame({"date": date, "currency": list(codes), "target": target})
+    with default_pool.read() as conn:
+        rates = _rates(conn)
+    return _as_of(frame, rates, "currency") / _as_of(frame, rates, "target")
+
+
+def missing_rates(frame: pd.DataFrame) -> list[str]:
+    return sorted(frame.loc[~frame["converted"], "currency"].dropna().unique().tolist())
+
+
+def currencies() -> list[str]:
+    """Currencies that can be used as a conversion target."""
+    with default_pool.read() as conn:
+        rows = conn.execute("SELECT DISTINCT currency FROM fx_rates").fetchall()
+    return sorted({r[0] for r in rows} | set(DEFAULT_RATES))
+
+
+if __name__ == "__main__":
+    import sys
+
+    n = load_rates(sys.argv[1] if len(sys.argv) > 1 else FX_PATH)
+    print(f"✅ Loaded {n} FX rates")
@@ -0,0 +1,151 @@
+"""
+Forecast.py
+-----------
+Monthly spend forecast per category and currency, from monthly_rollup only
+(the month x category x currency table kept current by the write triggers
+and Database.write_batch), so raw transactions are never rescanned.
+
+Two lightweight models per (category, currency) series:
+- seasonal naive:          next value = same month one year earlier
+                           (needs SEASON + 1 complete months)
+- exponential smoothing:   simple (level only), alpha picked from ALPHAS by
+                           the smallest one-step-ahead squared error
+The model with the lower one-step-ahead mean absolute error over the last
+SEASON months is used. The month of the latest transaction counts as
+incomplete unless that date is the month's last day: it is forecast like
+the following ones and its spend so far is reported as `to_date`. A first
+month that does not start on the 1st is left out.
+
+Fitted models are memoized on the series' month values, so a write refits
+only the series whose buckets it changed. Amounts are as stored, per
+currency (no FX conversion).
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from Database import data_key, pool
+
+SEASON = 12
+ALPHAS = np.linspace(0.05, 0.95, 19)
+MAX_MONTHS = 24
+CACHE_ENTRIES = 1024
+
+
+def _version() -> tuple[str, int]:
+    with pool.read() as conn:
+        return data_key(conn)
+
+
+def _shift(month: str, k: int) -> str:
+    return str(np.datetime64(month, "M") + k)
+
+
+# ----------------------------------------------------------
+# ROLLUP
+# ----------------------------------------------------------
+@lru_cache(maxsize=4)
+def _rollup(version: tuple) -> tuple[pd.DataFrame, str | None, str | None]:
+    """(month x series spend matrix, last complete month, incomplete month or None)."""
+    with pool.read() as conn:
+        frame = pd.read_sql_query(
+            "SELECT month, category, currency, -spent AS spend FROM monthly_rollup WHERE n > 0", conn)
+        earliest, latest = conn.execute("SELECT MIN(date), MAX(date) FROM transactions").fetchone()
+    if frame.empty or latest is None:
+        return pd.DataFrame(), None, None
+    partial = None if pd.Timestamp(latest).is_month_end else latest[:7]
+    # a first month that starts mid-way would read as a drop in spend
+    first = earliest[:7] if earliest.endswith("-01") or earliest[:7] == latest[:7] else _shift(earliest[:7], 1)
+    months = [str(m) for m in np.arange(np.datetime64(first, "M"), np.datetime64(latest[:7], "M") + 1)]
+    matrix = frame.pivot_table(index="month", columns=["category", "currency"], values="spend",
+                               aggfunc="sum", dropna=False)
+    matrix = matrix.reindex(months).fillna(0.0)
+    # only series with spend are forecast
+    matrix = matrix.loc[:, (matrix > 0).any()]
+    last = _shift(partial, -1) if partial else latest[:7]
+    return matrix, last, partial
+
+
+# ----------------------------------------------------------
+# MODELS
+# ----------------------------------------------------------
+def _smoothing(y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """One-step-ahead predictions of simple exponential smoothing for every alpha: (alphas x months)."""
+    level = np.full(len(ALPHAS), y[0])
+    predictions = np.empty((len(ALPHAS), len(y)))
+    for t, value in enumerate(y):
+        predictions[:, t] = level
+        level = level + ALPHAS * (value - level)
+    return predictions, level
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _fit(values: tuple) -> dict:
+    """Chosen model for one series of complete months (oldest first)."""
+    y = np.asarray(values, dtype=float)
+    if len(y) < 2:
+        return {"model": "naive", "next": np.full(SEASON, y[-1] if len(y) else 0.0), "mae": None}
+    predictions, levels = _smoothing(y)
+    errors = predictions[:, 1:] - y[1:]
+    best = int(np.argmin((errors ** 2).sum(axis=1)))
+    window = min(SEASON, len(y) - 1)
+    fit = {
+        "model": "exponential_smoothing", "alpha": round(float(ALPHAS[best]), 2),
+        "next": np.full(SEASON, levels[best]), "mae": float(np.abs(errors[best, -window:]).mean()),
+    }
+    if len(y) > SEASON:
+        seasonal_errors = y[SEASON:] - y[:-SEASON]
+        window = min(SEASON, len(seasonal_errors))
+        seasonal_mae = float(np.abs(seasonal_errors[-window:]).mean())
+        if seasonal_mae < np.abs(errors[best, -window:]).mean():
+            fit = {"model": "seasonal_naive", "next": y[-SEASON:], "mae": seasonal_mae}
+    return fit
+
+
+# ----------------------------------------------------------
+# FORECAST
+# ----------------------------------------------------------
+def forecast(months: int = 3, category: str | None = None, currency: str | None = None) -> dict:
+    """Projected spend for the next `months` months, per (category, currency) and per currency."""
+    matrix, last, partial = _rollup(_version())
+    ahead = [_shift(last, k) for k in range(1, months + 1)] if last else []
+    items, totals = [], {}
+    for (cat, cur), column in matrix.items():
+        # the rollup stores NULL keys as ''
+        cat, cur = cat or None, cur or None
+        if category and (cat or "").lower() != category.lower():
+            continue
+        if currency and cur != currency:
+            continue
+        history = column.loc[:last]
+        fit = _fit(tuple(np.round(history.to_numpy(), 2)))
+        # seasonal naive repeats the last SEASON months; smoothing is flat
+        values = np.maximum(np.resize(fit["next"], months), 0.0)
+        item = {
+            "category": cat, "currency": cur, "model": fit["model"],
+            "mae": None if fit["mae"] is None else round(fit["mae"], 2),
+            "history": [{"month": m, "spent": round(v, 2)} for m, v in history.iloc[-SEASON:].items()],
+            "forecast": [{"month": m, "spent": round(float(v), 2)} for m, v in zip(ahead, values)],
+        }
+        if "alpha" in fit:
+            item["alpha"] = fit["alpha"]
+        if partial:
+            item["to_date"] = round(float(column.loc[partial]), 2)
+        items.append(item)
+        per_month = totals.setdefault(cur, np.zeros(months))
+        per_month += values
+    items.sort(key=lambda i: -sum(f["spent"] for f in i["forecast"]))
+    return {
+        "months": ahead,
+        "last_complete_month": last,
+        "items": items,
+        "totals": [{"currency": cur, "forecast": [{"month": m, "spent": round(float(v), 2)}
+                                                  for m, v in zip(ahead, values)]}
+                   for cur, values in sorted(totals.items(), key=lambda kv: str(kv[0]))],
+    }
+
+
+def cache_info() -> dict:
+    return {"rollup": _rollup.cache_info()._asdict(), "models": _fit.cache_info()._asdict()}
@@ -0,0 +1,61 @@
+"""
+Formats.py
+----------
+Response encodings for the row-returning transaction routes.
+
+- application/json (default): SQLite assembles the JSON array itself with
+  json_group_array/json_object, so no per-row Python dicts are built
+- application/vnd.apache.arrow.stream: Arrow IPC stream built column by
+  column from the cursor, one record batch per fetch chunk
+"""
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from Database import COLUMNS, pool
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for the Arrow format
+    pa = None
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+JSON_MIME = "application/json"
+BATCH_ROWS = 10_000
+
+JSON_ROW = "json_object(" + ", ".join(f"'{c}', {c}" for c in COLUMNS) + ")"
+
+
+def wants_arrow(accept: str | None) -> bool:
+    return bool(accept) and ARROW_MIME in accept
+
+
+def _arrow_schema():
+    return pa.schema([(c, pa.float64() if c == "amount" else pa.string()) for c in COLUMNS])
+
+
+def arrow_bytes(cur) -> bytes:
+    """Drain a cursor over COLUMNS into an Arrow IPC stream."""
+    schema = _arrow_schema()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        while rows := cur.fetchmany(BATCH_ROWS):
+            columns = list(zip(*rows))
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+    return sink.getvalue().to_pybytes()
+
+
+def rows_response(where: str, params: tuple, accept: str | None) -> Response:
+    """Run `SELECT COLUMNS FROM transactions WHERE ...` and encode it as negotiated."""
+    inner = f"SELECT {', '.join(COLUMNS)} FROM transactions WHERE {where}"
+    if wants_arrow(accept):
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow format requires pyarrow on the server.")
+        with pool.read() as conn:
+            body = arrow_bytes(conn.execute(inner, params))
+        return Response(content=body, media_type=ARROW_MIME)
+
+    with pool.read() as conn:
+        (body,) = conn.execute(f"SELECT json_group_array({JSON_ROW}) FROM ({inner})", params).fetchone()
+    return Response(content=body, media_type=JSON_MIME)
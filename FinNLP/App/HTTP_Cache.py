@@ -0,0 +1,96 @@
+"""
+HTTP_Cache.py
+-------------
+Conditional GET for the read routes (pure ASGI middleware).
+
+Every response from a matching GET carries validators derived from the
+database's data version:
+
+    ETag:          W/"<data_version>-<hash of tenant, path, query and Accept>"
+    Last-Modified: meta.updated_at (time of the last write)
+    Cache-Control: no-cache  (clients may store, but must revalidate)
+
+A request whose If-None-Match (or, without one, If-Modified-Since) still
+matches gets an empty 304 before the route runs, so no query is executed
+and no body is encoded. The version is read before the route runs: a write
+in between only makes the ETag older than the body, never newer, so a
+client can never keep stale data under a current ETag.
+"""
+
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from Database import DEFAULT_TENANT, current_tenant, data_stamp, pool
+
+CACHED_PREFIXES = ("/transactions", "/insights", "/stats/histogram", "/stats/timeseries",
+                   "/stats/breakdown", "/fx/currencies")
+
+
+def current_stamp() -> tuple[int, int]:
+    with pool.read() as conn:
+        return data_stamp(conn)
+
+
+def make_etag(version: int, path: str, query: bytes, accept: str, tenant: str = DEFAULT_TENANT) -> str:
+    # each tenant has its own version counter: the tenant must be part of the variant
+    variant = hashlib.blake2b(f"{tenant}|{path}?{query.decode('latin-1')}|{accept}".encode(), digest_size=6)
+    return f'W/"{version}-{variant.hexdigest()}"'
+
+
+def _not_modified(headers: Headers, etag: str, updated_at: int) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # weak comparison: W/ prefixes are ignored on both sides
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return updated_at <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app, stamp=current_stamp, prefixes: tuple = CACHED_PREFIXES):
+        self.app = app
+        self.stamp = stamp
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] not in ("GET", "HEAD")
+                or not scope["path"].startswith(self.prefixes)):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        version, updated_at = await run_in_threadpool(self.stamp)
+        validators = {
+            "etag": make_etag(version, scope["path"], scope["query_string"], headers.get("accept", ""),
+                              current_tenant.get()),
+            "last-modified": formatdate(updated_at, usegmt=True),
+            "cache-control": "no-cache",
+            "vary": "Accept, X-Tenant-ID",
+        }
+
+        if _not_modified(headers, validators["etag"], updated_at):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(k.encode(), v.encode()) for k, v in validators.items()],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                response_headers = MutableHeaders(scope=message)
+                for k, v in validators.items():
+                    response_headers[k] = v
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
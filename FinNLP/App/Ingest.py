@@ -0,0 +1,275 @@
+"""
+Ingest.py
+---------
+Bulk transaction ingest behind POST /transactions/bulk.
+
+- the request body (NDJSON, or CSV with a header line) is read as a stream
+  and cut at line breaks into batches of BATCH_ROWS lines
+- each batch is parsed and validated with vectorized pandas checks; invalid
+  rows are skipped and the first MAX_ERRORS are reported with their line
+- rows are deduplicated by `id` (last occurrence wins, or first with
+  on_conflict=ignore) and written by Database.write_batch in one
+  transaction per batch on the pool's single writer, which maintains
+  summaries, rollup, FTS index and data version set-wise
+- rows without merchant / category get them from Classifier (merchant
+  dictionary + fallbacks on the description); lines it cannot label are
+  counted as `unmatched`
+- parsing the next batch overlaps with writing the current one
+
+CSV values must not contain line breaks (quoted multi-line fields are not
+supported): batches are split on raw newlines.
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from Classifier import classifier
+from Database import COLUMNS, ConnectionPool, data_version, pool as default_pool, write_batch
+
+BATCH_ROWS = int(os.environ.get("FINNLP_INGEST_BATCH_ROWS", 50_000))
+MAX_ERRORS = 20
+REQUIRED = ("id", "date", "amount")
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+
+class IngestError(ValueError):
+    """The upload cannot be read at all (bad header, missing columns)."""
+
+
+def detect_format(content_type: str | None) -> str | None:
+    """'csv' / 'ndjson' from the Content-Type header, None if unknown."""
+    if not content_type:
+        return None
+    return FORMATS.get(content_type.split(";")[0].strip().lower())
+
+
+# ----------------------------------------------------------
+# STREAM
+# ----------------------------------------------------------
+async def split_lines(chunks, size: int = BATCH_ROWS):
+    """Yield (number of the first line, list of raw lines) with at most `size` lines each."""
+    pending = b""
+    lines = []
+    first = 1
+    async for chunk in chunks:
+        parts = (pending + chunk).split(b"\n")
+        pending = parts.pop()
+        lines.extend(parts)
+        while len(lines) >= size:
+            yield first, lines[:size]
+            first += size
+            del lines[:size]
+    if pending:
+        lines.append(pending)
+    if lines:
+        yield first, lines
+
+
+# ----------------------------------------------------------
+# PARSE
+# ----------------------------------------------------------
+class Errors:
+    """Rejected-row counter that keeps the first MAX_ERRORS messages."""
+
+    def __init__(self):
+        self.count = 0
+        self.listed = []
+
+    def add(self, line: int, field: str | None, message: str):
+        self.count += 1
+        if len(self.listed) < MAX_ERRORS:
+            self.listed.append({"line": line, "field": field, "error": message})
+
+    @property
+    def full(self) -> bool:
+        return len(self.listed) >= MAX_ERRORS
+
+
+def parse_ndjson(lines: list, first: int, errors: Errors) -> tuple[pd.DataFrame, np.ndarray]:
+    """One JSON object per line → (frame, line number of each row)."""
+    records, numbers = [], []
+    for n, line in enumerate(lines, first):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            errors.add(n, None, "invalid JSON")
+            continue
+        if not isinstance(record, dict):
+            errors.add(n, None, "expected a JSON object")
+            continue
+        records.append(record)
+        numbers.append(n)
+    return pd.DataFrame.from_records(records), np.asarray(numbers, dtype=np.int64)
+
+
+def parse_csv(lines: list, first: int, header: bytes, errors: Errors) -> tuple[pd.DataFrame, np.ndarray]:
+    """CSV lines (without header) → (frame, line number of each row)."""
+    kept = [(n, line) for n, line in enumerate(lines, first) if line.strip()]
+    while kept:
+        body = header + b"\n" + b"\n".join(line for _, line in kept)
+        try:
+            frame = pd.read_csv(io.BytesIO(body), dtype=str, keep_default_na=False, na_values=[""])
+            return frame, np.asarray([n for n, _ in kept], dtype=np.int64)
+        except pd.errors.ParserError as e:
+            # "Expected 9 fields in line 12, saw 10": drop that line and parse again
+            m = re.search(r"line (\d+)", str(e))
+            index = int(m.group(1)) - 2 if m else -1
+            if not 0 <= index < len(kept) or errors.full:
+                for n, _ in kept:
+                    errors.add(n, None, "unparsable CSV")
+                break
+            errors.add(kept[index][0], None, str(e).strip())
+            del kept[index]
+    return pd.DataFrame(columns=list(COLUMNS)), np.empty(0, dtype=np.int64)
+
+
+def check_header(header: bytes):
+    names = {name.strip().strip('"') for name in header.decode("utf-8", "replace").strip().split(",")}
+    missing = [c for c in REQUIRED if c not in names]
+    if missing:
+        raise IngestError(f"CSV header is missing required columns: {', '.join(missing)}")
+
+
+# ----------------------------------------------------------
+# VALIDATE
+# ----------------------------------------------------------
+def _text(series: pd.Series) -> pd.Series:
+    """Any column → nullable strings, stripped, '' → NA."""
+    text = series.astype("string").str.strip()
+    return text.mask(text == "")
+
+
+def validate(frame: pd.DataFrame, numbers: np.ndarray, errors: Errors) -> pd.DataFrame:
+    """Normalize COLUMNS and drop invalid rows, appending their errors to `errors`."""
+    out = pd.DataFrame(index=frame.index)
+    for c in COLUMNS:
+        if c == "amount":
+            continue
+        out[c] = _text(frame[c]) if c in frame else pd.Series(pd.NA, index=frame.index, dtype="string")
+    raw_amount = frame["amount"] if "amount" in frame else pd.Series(np.nan, index=frame.index)
+    out["amount"] = pd.to_numeric(raw_amount, errors="coerce").astype("float64")
+    out["currency"] = out["currency"].str.upper()
+
+    checks = (
+        ("id", out["id"].notna(), "missing id"),
+        ("date", out["date"].str.fullmatch(r"\d{4}-\d{2}-\d{2}").fillna(False).astype(bool)
+         & pd.to_datetime(out["date"], format="%Y-%m-%d", errors="coerce").notna(),
+         "expected a YYYY-MM-DD date"),
+        ("amount", np.isfinite(out["amount"].to_numpy()), "expected a finite number"),
+        ("currency", (out["currency"].isna() | out["currency"].str.fullmatch(r"[A-Z]{3}"))
+         .fillna(False).astype(bool), "expected a 3-letter currency code"),
+    )
+    checks = [(field, np.asarray(ok, dtype=bool), message) for field, ok, message in checks]
+    valid = np.logical_and.reduce([ok for _, ok, _ in checks])
+    bad = np.flatnonzero(~valid)
+    listed = bad[:MAX_ERRORS - len(errors.listed)]
+    for i in listed:
+        field, _, message = next(check for check in checks if not check[1][i])
+        errors.add(int(numbers[i]), field, message)
+    errors.count += len(bad) - len(listed)
+    return out[valid][list(COLUMNS)]
+
+
+def prepare(fmt: str, lines: list, first: int, header: bytes | None,
+            on_conflict: str, errors: Errors) -> dict:
+    """Parse + validate + dedupe one batch. Returns the rows to write and the batch counters."""
+    if fmt == "csv":
+        frame, numbers = parse_csv(lines, first, header, errors)
+    else:
+        frame, numbers = parse_ndjson(lines, first, errors)
+    clean = validate(frame, numbers, errors) if len(frame) else pd.DataFrame(columns=list(COLUMNS))
+    unique = clean.drop_duplicates("id", keep="last" if on_conflict == "update" else "first")
+    # id order keeps the primary-key inserts local
+    unique = unique.sort_values("id")
+    labels = classifier.fill(unique)
+    # column-wise: NA → None per column, then one zip (no object-frame copy)
+    columns = [unique[c].to_numpy(dtype=object, na_value=None) for c in COLUMNS if c != "amount"]
+    columns.insert(COLUMNS.index("amount"), unique["amount"].tolist())
+    return {
+        "rows": list(zip(*columns)),
+        "records": sum(1 for line in lines if line.strip()),
+        "duplicates": len(clean) - len(unique),
+        **labels,
+    }
+
+
+# ----------------------------------------------------------
+# WRITE
+# ----------------------------------------------------------
+def _write(db_pool: ConnectionPool, rows: list, on_conflict: str) -> dict:
+    with db_pool.write() as conn:
+        return write_batch(conn, rows, on_conflict)
+
+
+def _version(db_pool: ConnectionPool) -> int:
+    with db_pool.read() as conn:
+        return data_version(conn)
+
+
+async def ingest(chunks, fmt: str, on_conflict: str = "update",
+                 db_pool: ConnectionPool = default_pool) -> dict:
+    """
+    Stream `chunks` (async iterable of bytes) into the transactions table.
+    Raises IngestError before anything is written if the upload is unusable.
+    """
+    report = {"format": fmt, "on_conflict": on_conflict, "batches": 0, "records": 0,
+              "inserted": 0, "updated": 0, "ignored": 0, "duplicates": 0, "classified": 0, "unmatched": 0}
+    errors = Errors()
+    start = time.perf_counter()
+    header = None
+    writing = None
+
+    async def collect(task):
+        for key, value in (await task).items():
+            report[key] += value
+
+    try:
+        async for first, lines in split_lines(chunks):
+            if fmt == "csv" and header is None:
+                while lines and not lines[0].strip():
+                    lines.pop(0)
+                    first += 1
+                if not lines:
+                    continue
+                header = lines.pop(0)
+                first += 1
+                check_header(header)
+            batch = await run_in_threadpool(prepare, fmt, lines, first, header, on_conflict, errors)
+            report["records"] += batch["records"]
+            for key in ("duplicates", "classified", "unmatched"):
+                report[key] += batch[key]
+            if writing is not None:
+                await collect(writing)
+                writing = None
+            if batch["rows"]:
+                report["batches"] += 1
+                writing = asyncio.ensure_future(run_in_threadpool(_write, db_pool, batch["rows"], on_conflict))
+    finally:
+        if writing is not None:
+            await collect(writing)
+
+    seconds = time.perf_counter() - start
+    written = report["inserted"] + report["updated"]
+    report["data_version"] = await run_in_threadpool(_version, db_pool)
+    report["rejected"] = errors.count
+    report["errors"] = sorted(errors.listed, key=lambda e: e["line"])
+    report["seconds"] = round(seconds, 3)
+    report["rows_per_sec"] = round(written / seconds) if seconds else None
+    return report
@@ -0,0 +1,267 @@
+"""
+Jobs.py
+-------
+Background jobs for slow AI work (report + PDF generation).
+
+Jobs are rows in a small SQLite file, so status and results (report text
+and PDF bytes) survive restarts and are visible to every worker process.
+A bounded pool of asyncio workers runs them. Each JobManager start takes a
+new owner token (pid + random id, so a reused pid - PID 1 in a container -
+never passes for its predecessor) and keeps a heartbeat for it in the
+`owners` table. Unfinished jobs whose owner token has no live heartbeat
+(removed on a clean stop, older than LEASE after a crash) are claimed
+(compare-and-set on the owner) by one live process, at startup and every
+RECOVER_INTERVAL seconds, so with several uvicorn workers a job is never
+run twice. API keys are kept in memory only: a
+claimed job is re-queued with OPENAI_API_KEY if it is set, otherwise
+marked failed so the client can resubmit. A job also records the tenant
+that submitted it: it runs against that tenant's shard and is only
+visible to that tenant.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from starlette.concurrency import run_in_threadpool
+
+from Database import DEFAULT_TENANT, current_tenant
+
+JOBS_PATH = Path(
+    os.environ.get("FINNLP_JOBS_PATH", Path(__file__).resolve().parent.parent / "Data" / "jobs.db")
+)
+WORKERS = int(os.environ.get("FINNLP_JOB_WORKERS", 4))
+MAX_QUEUE = 1000
+RECOVER_INTERVAL = 30.0
+LEASE = 3 * RECOVER_INTERVAL        # heartbeat age after which an owner is presumed dead
+
+DDL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,              -- queued | running | done | failed
+    params TEXT NOT NULL,
+    result TEXT,
+    pdf BLOB,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,                        -- token of the JobManager running it
+    tenant TEXT NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS owners (
+    token TEXT PRIMARY KEY,            -- "<pid>:<uuid>", new on every start
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+def render_pdf(title: str, text: str) -> bytes:
+    """Plain A4 PDF: title plus the text wrapped at ~95 characters."""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(50, 800, title)
+    pdf.setFont("Helvetica", 11)
+    y = 775
+    for paragraph in text.split("\n"):
+        for line in textwrap.wrap(paragraph, 95) or [""]:
+            pdf.drawString(50, y, line)
+            y -= 14
+            if y < 50:
+                pdf.showPage()
+                pdf.setFont("Helvetica", 11)
+                y = 800
+    pdf.save()
+    return buffer.getvalue()
+
+
+class JobManager:
+    def __init__(self, path: Path = JOBS_PATH, workers: int = WORKERS):
+        self.path = Path(path)
+        self.workers = workers
+        self._handlers = {}      # kind -> async fn(params, api_key) -> (text, pdf bytes | None)
+        self._keys = {}          # job id -> api key (memory only)
+        self._queue = None
+        self._tasks = []
+        self._conn = None
+        self._lock = threading.Lock()
+        self.token = None
+
+    def register(self, kind: str, handler):
+        self._handlers[kind] = handler
+
+    # ------------------------------------------------------
+    # STORAGE
+    # ------------------------------------------------------
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(DDL)
+            columns = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "tenant" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        return self._conn
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            db = self._db()
+            rows = db.execute(sql, params).fetchall()
+            db.commit()
+            return rows
+
+    def _set(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def _heartbeat(self):
+        now = time.time()
+        self._execute("INSERT OR REPLACE INTO owners (token, heartbeat) VALUES (?, ?)", (self.token, now))
+        self._execute("DELETE FROM owners WHERE heartbeat < ?", (now - LEASE,))
+
+    def _claim(self, job_id: str, owner: str | None) -> bool:
+        """Take over an orphaned job; False if another process got there first."""
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE jobs SET owner = ?, updated_at = ? WHERE id = ? AND owner IS ? "
+                "AND status IN ('queued', 'running')",
+                (self.token, time.time(), job_id, owner),
+            )
+            db.commit()
+            return cur.rowcount == 1
+
+    def get(self, job_id: str, with_pdf: bool = False, tenant: str | None = None) -> dict | None:
+        """The job, or None if it does not exist (or belongs to another `tenant`)."""
+        cols = "id, kind, status, params, result, error, created_at, updated_at, tenant, pdf IS NOT NULL"
+        if with_pdf:
+            cols += ", pdf"
+        rows = self._execute(f"SELECT {cols} FROM jobs WHERE id = ?", (job_id,))
+        if not rows or (tenant is not None and rows[0][8] != tenant):
+            return None
+        r = rows[0]
+        job = {
+            "job_id": r[0], "kind": r[1], "status": r[2], "params": json.loads(r[3]),
+            "result": r[4], "error": r[5], "created_at": r[6], "updated_at": r[7],
+            "tenant": r[8], "has_pdf": bool(r[9]),
+        }
+        if with_pdf:
+            job["pdf"] = r[10]
+        return job
+
+    # ------------------------------------------------------
+    # LIFECYCLE
+    # ------------------------------------------------------
+    async def start(self):
+        self._queue = asyncio.Queue(MAX_QUEUE)
+        self.token = f"{os.getpid()}:{uuid.uuid4().hex}"
+        await run_in_threadpool(self._heartbeat)
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def _recover(self):
+        """Claim unfinished jobs whose owner has no live heartbeat."""
+        env_key = os.environ.get("OPENAI_API_KEY")
+        # pid-era owners (integers) never match a token: they are claimed too
+        pending = await run_in_threadpool(
+            self._execute,
+            "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running') "
+            "AND (owner IS NULL OR owner NOT IN (SELECT token FROM owners WHERE heartbeat >= ?)) "
+            "ORDER BY created_at", (time.time() - LEASE,))
+        for job_id, owner in pending:
+            if not await run_in_threadpool(self._claim, job_id, owner):
+                continue
+            if env_key and not self._queue.full():
+                self._keys[job_id] = env_key
+                await run_in_threadpool(self._set, job_id, status="queued")
+                self._queue.put_nowait(job_id)
+            else:
+                await run_in_threadpool(self._set, job_id, status="failed",
+                                        error="Interrupted by a server restart, please resubmit.")
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(RECOVER_INTERVAL)
+            try:
+                await run_in_threadpool(self._heartbeat)
+                await self._recover()
+            except sqlite3.Error:
+                pass  # busy jobs DB: next sweep
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            if self._conn is not None:
+                # unfinished jobs of this run are orphaned right away, not after LEASE
+                self._conn.execute("DELETE FROM owners WHERE token = ?", (self.token,))
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    async def submit(self, kind: str, params: dict, api_key: str | None) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if self._queue.full():
+            raise RuntimeError("Job queue is full, try again later.")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await run_in_threadpool(
+            self._execute,
+            "INSERT INTO jobs (id, kind, status, params, created_at, updated_at, owner, tenant) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (job_id, kind, json.dumps(params), now, now, self.token, current_tenant.get()),
+        )
+        self._keys[job_id] = api_key
+        self._queue.put_nowait(job_id)
+        return {"job_id": job_id, "status": "queued"}
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await run_in_threadpool(self.get, job_id)
+                if job is None:
+                    continue
+                await run_in_threadpool(self._set, job_id, status="running")
+                handler = self._handlers[job["kind"]]
+                current_tenant.set(job["tenant"] or DEFAULT_TENANT)
+                text, pdf = await handler(job["params"], self._keys.get(job_id))
+                await run_in_threadpool(self._set, job_id, status="done", result=text, pdf=pdf)
+            except asyncio.CancelledError:
+                raise  # left as 'running' → picked up again after restart
+            except Exception as e:
+                await run_in_threadpool(self._set, job_id, status="failed", error=str(e))
+            finally:
+                self._keys.pop(job_id, None)
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        rows = self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "queued_in_memory": self._queue.qsize() if self._queue else 0,
+            "by_status": dict(rows),
+        }
+
+
+# Shared job manager used by the API
+job_manager = JobManager()
@@ -0,0 +1,169 @@
+"""
+LLM_Cache.py
+------------
+Two-tier cache for chat-completion responses.
+
+Key = sha256(model + tenant + data version + normalized prompt), so an
+answer is only reused for the same tenant while its `transactions` are
+unchanged. Tier 1 is an in-process LRU, tier 2 a small SQLite file shared
+across workers and restarts. Both tiers expire entries after a TTL and
+evict the least recently used beyond a size limit; a tenant's entries
+stamped with an older data version are purged as soon as a newer version
+of that tenant is seen.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from Database import DEFAULT_TENANT
+
+CACHE_PATH = Path(
+    os.environ.get("FINNLP_LLM_CACHE_PATH", Path(__file__).resolve().parent.parent / "Data" / "llm_cache.db")
+)
+MEMORY_ENTRIES = 256
+DISK_ENTRIES = 10_000
+TTL_SECONDS = 24 * 3600
+
+DDL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    data_version INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    tenant TEXT NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_hit ON llm_cache (last_hit);
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class LLMCache:
+    def __init__(self, path: Path = CACHE_PATH, memory_entries: int = MEMORY_ENTRIES,
+                 disk_entries: int = DISK_ENTRIES, ttl: float = TTL_SECONDS):
+        self.path = Path(path)
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (response, created_at, data_version, tenant)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._versions = {}           # tenant -> latest data version seen
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _db(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(DDL)
+            if "tenant" not in {r[1] for r in self._conn.execute("PRAGMA table_info(llm_cache)")}:
+                self._conn.execute("ALTER TABLE llm_cache ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def make_key(model: str, prompt: str, data_version: int, tenant: str = DEFAULT_TENANT) -> str:
+        raw = f"{model}\x00{tenant}\x00{data_version}\x00{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _observe_version(self, data_version: int, tenant: str):
+        # Caller holds the lock. A new data version makes the tenant's older entries stale.
+        if self._versions.get(tenant) == data_version:
+            return
+        self._versions[tenant] = data_version
+        self._memory = OrderedDict((k, v) for k, v in self._memory.items()
+                                   if v[3] != tenant or v[2] == data_version)
+        db = self._db()
+        db.execute("DELETE FROM llm_cache WHERE tenant = ? AND data_version != ?", (tenant, data_version))
+        db.commit()
+
+    def get(self, model: str, prompt: str, data_version: int, tenant: str = DEFAULT_TENANT) -> str | None:
+        key = self.make_key(model, prompt, data_version, tenant)
+        now = time.time()
+        with self._lock:
+            self._observe_version(data_version, tenant)
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            db = self._db()
+            row = db.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] < self.ttl:
+                db.execute("UPDATE llm_cache SET last_hit = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._remember(key, (row[0], row[1], data_version, tenant))
+                self.hits["disk"] += 1
+                return row[0]
+            if row:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, model: str, prompt: str, data_version: int, response: str, tenant: str = DEFAULT_TENANT):
+        key = self.make_key(model, prompt, data_version, tenant)
+        now = time.time()
+        with self._lock:
+            self._observe_version(data_version, tenant)
+            self._remember(key, (response, now, data_version, tenant))
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, model, data_version, response, created_at, last_hit, tenant) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, data_version, response, now, now, tenant),
+            )
+            db.execute(
+                "DELETE FROM llm_cache WHERE created_at < ? OR key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?)",
+                (now - self.ttl, self.disk_entries),
+            )
+            db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits["memory"] + self.hits["disk"]
+            total = hits + self.misses
+            disk = self._db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk,
+                "data_version": self._versions.get(DEFAULT_TENANT),
+                "tenants": len(self._versions),
+            }
+
+
+# Shared cache used by the API
+llm_cache = LLMCache()
@@ -8,12 +8,32 @@ Runs the entire FinNLP project in one command.
 import os
 import time
 import subprocess
+import sys
 from pathlib import Path
 
+import requests
+
 # Define paths
 BASE_DIR = Path(__file__).resolve().parent
 APP_DIR = BASE_DIR
 DATA_DIR = BASE_DIR.parent / "Data"
+API_URL = "http://127.0.0.1:8000"
+READY_TIMEOUT = 120  # secondi: il primo avvio su un DB grande scalda le cache
+
+
+def wait_until_ready(process, url=f"{API_URL}/readyz", timeout=READY_TIMEOUT):
+    """Poll /readyz until it answers 200; False if the server exits or times out."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    return False
 
 print("🚀 FinNLP DEMO LAUNCHER")
 print("------------------------")
@@ -23,15 +43,20 @@ csv_path = DATA_DIR / "synthetic_transactions.csv"
 print(csv_path)
 if not csv_path.exists():
     print("📄 Generating synthetic dataset...")
-    subprocess.run(["python", "Dataset_Generator.py"], cwd=APP_DIR)
+    subprocess.run([sys.executable, "Dataset_Generator.py"], cwd=APP_DIR)
 else:
     print("✅ Synthetic dataset already exists.")
 
+fx_path = DATA_DIR / "fx_rates.csv"
+if not fx_path.exists():
+    print("💱 Generating synthetic FX rates...")
+    subprocess.run([sys.executable, "Dataset_Generator.py", "--fx-only", "--fx-out", str(fx_path)], cwd=APP_DIR)
+
 # Step 2 — Build / seed database
 db_path = DATA_DIR / "finllm.db"
 if not db_path.exists():
     print("🧱 Building SQLite database...")
-    subprocess.run(["python", "Database.py"], cwd=APP_DIR)
+    subprocess.run([sys.executable, "Database.py"], cwd=APP_DIR)
 else:
     print("✅ Database already exists.")
 
@@ -39,23 +64,27 @@ else:
 print("👁️  Visualizing dataset")
 time.sleep(1)
 try:
-    subprocess.run(["python", "Seed_Visual.py"], cwd=APP_DIR)
+    subprocess.run([sys.executable, "Seed_Visual.py"], cwd=APP_DIR)
 except Exception:
     print("⚠️ Visualization skipped (optional).")
 
 
 # Step 4 — Start API server
 print("🌐 Starting FastAPI backend...")
-api_process = subprocess.Popen(["python", "Run_Server.py"], cwd=APP_DIR)
+api_process = subprocess.Popen([sys.executable, "Run_Server.py"], cwd=APP_DIR)
 
-# Step 5 — Wait a few seconds for server to be ready
+# Step 5 — Wait until the API reports ready (DB open, caches warm)
 print("⌛ Waiting for API to initialize...")
-time.sleep(3)
+if not wait_until_ready(api_process):
+    print("❌ API did not become ready (see the server output above).")
+    api_process.terminate()
+    raise SystemExit(1)
+print("✅ API ready.")
 
 # Step 6 — Start Streamlit dashboard
 print("📊 Launching Streamlit dashboard...")
 try:
-    subprocess.run(["streamlit", "run", "Dashboard.py"], cwd=APP_DIR)
+    subprocess.run([sys.executable, "-m", "streamlit", "run", "Dashboard.py"], cwd=APP_DIR)
 except KeyboardInterrupt:
     print("🛑 Shutting down demo...")
 finally:
@@ -4,43 +4,92 @@ Main.py
 FinNLP API — Financial Data and AI Report Generator
 """
 
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import HTMLResponse
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, HTTPException, Header, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from pathlib import Path
 import pandas as pd
-import sqlite3
 
-# ⚠️ Usa SOLO questa import della libreria OpenAI (niente "import openai")
-from openai import OpenAI
+from Database import UnknownTenant, current_tenant, data_key, pool, router
+from HTTP_Cache import ConditionalGetMiddleware, current_stamp
+from Metrics import MetricsMiddleware
+from Tenants import TenantMiddleware
+import Metrics
+from Search import build_filter
+from Export import fetch_page, stream_rows
+from Formats import rows_response
+from LLM_Cache import llm_cache
+from Query_Planner import try_answer, vocabulary
+from Context_Builder import build_context
+from Jobs import job_manager, render_pdf
+import Stats
+import FX
+import Ingest
+from Classifier import classifier
+from Anomalies import THRESHOLD, current_detector
+import Recurring
+import Forecast
+from starlette.concurrency import run_in_threadpool
+import json
+
+# ⚠️ Il client OpenAI (async, condiviso) vive SOLO in AI_Client.py
+from AI_Client import ai_client
 
 # ----------------------------------------------------------
 # APP & CORS
 # ----------------------------------------------------------
-app = FastAPI(title="FinNLP API", version="1.1", description="Financial data API + AI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool.open()  # writer + WAL subito, i lettori si aprono on demand
+    job_manager.register("report", run_report_job)
+    await job_manager.start()
+    # Warmup in background: /healthz risponde subito, /readyz solo a cache pronte
+    app.state.ready = False
+    warmup_task = asyncio.create_task(warmup(app))
+    yield
+    warmup_task.cancel()
+    await job_manager.stop()
+    await ai_client.aclose()
+    pool.close()  # tutti gli shard aperti
+    llm_cache.close()
+
+app = FastAPI(title="FinNLP API", version="1.1", description="Financial data API + AI", lifespan=lifespan)
+# ETag / Last-Modified + 304 sulle route di lettura (/transactions*, /insights, /stats/*);
+# aggiunto prima di CORS, così anche i 304 passano dal CORS middleware
+app.add_middleware(ConditionalGetMiddleware)
+# X-Tenant-ID → shard del tenant per tutta la richiesta (ETag inclusi, quindi fuori da ConditionalGet)
+app.add_middleware(TenantMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # semplifica per la demo (Streamlit localhost)
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
+# Più esterno di tutti: latenza per route (inclusi 304 e CORS), SQL per richiesta, slow log
+app.add_middleware(MetricsMiddleware)
 
 # ----------------------------------------------------------
 # DB
 # ----------------------------------------------------------
-DB_PATH = Path(__file__).resolve().parent.parent / "Data" / "finllm.db"
-
 def get_transactions(limit=100):
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(f"SELECT * FROM transactions LIMIT {limit}", conn)
-    conn.close()
-    return df
+    with pool.read() as conn:
+        return pd.read_sql_query("SELECT * FROM transactions LIMIT ?", conn, params=(limit,))
+
+def current_data_key():
+    with pool.read() as conn:
+        return data_key(conn)
 
 # ----------------------------------------------------------
 # MODELS
 # ----------------------------------------------------------
+MODEL = "gpt-4o-mini"
+
 class ReportRequest(BaseModel):
     limit: int = 200
     api_key: str | None = None
@@ -52,26 +101,69 @@ class QuestionRequest(BaseModel):
 # ----------------------------------------------------------
 # INSIGHTS (funzione interna + endpoint semplificato)
 # ----------------------------------------------------------
-def compute_insights():
-    df = get_transactions(1000)
-    total_income = df[df["amount"] > 0]["amount"].sum()
-    total_spent = df[df["amount"] < 0]["amount"].sum()
-    avg_expense = df[df["amount"] < 0]["amount"].mean()
-    top_category = df["category"].value_counts().idxmax()
+def compute_insights(target: str = FX.BASE):
+    """
+    Totals converted to `target` with the as-of FX rates (FX.converted over
+    the trigger-maintained daily_rollup, cached per data version); top
+    category from the trigger-maintained counts.
+    """
+    frame = FX.converted(None, target)
+    with pool.read() as conn:
+        row = conn.execute(
+            "SELECT category FROM category_counts WHERE n > 0 AND category <> '' "
+            "ORDER BY n DESC, category LIMIT 1"
+        ).fetchone()
+    ok = frame[frame["converted"]]
+    total_income = ok["income"].sum()
+    total_spent = ok["spent"].sum()
+    n_expense = ok["n_spent"].sum()
+    total_transactions = frame["n"].sum()
+    avg_expense = total_spent / n_expense if n_expense else 0.0
+    top_category = row[0] if row else None
+    target = target.upper()
     summary = (
         f"Your top spending category is {top_category}. "
-        f"You spent an average of {abs(avg_expense):.2f} € per transaction. "
-        f"Total spent: {abs(total_spent):.2f} €, total income: {total_income:.2f} €."
+        f"You spent an average of {abs(avg_expense):.2f} {target} per transaction. "
+        f"Total spent: {abs(total_spent):.2f} {target}, total income: {total_income:.2f} {target}."
     )
     return {
-        "total_transactions": int(len(df)),
+        "currency": target,
+        "total_transactions": int(total_transactions),
         "total_income": round(float(total_income), 2),
         "total_spent": round(float(total_spent), 2),
         "average_expense": round(float(avg_expense), 2),
         "top_category": str(top_category),
+        "missing_rates": FX.missing_rates(frame),
         "summary": summary
     }
 
+# ----------------------------------------------------------
+# WARMUP (pool + cache per data version, prima del primo utente)
+# ----------------------------------------------------------
+WARM_READERS = int(os.environ.get("FINNLP_WARM_READERS", 4))
+logger = logging.getLogger("finnlp")
+
+def prime_caches():
+    """Open a few readers and fill the caches the Dashboard hits first."""
+    pool.prefill(WARM_READERS)
+    compute_insights()  # FX.converted(None, BASE)
+    Stats.histogram()
+    Stats.timeseries()
+    Stats.breakdown()
+    vocabulary()
+
+async def warmup(app: FastAPI):
+    try:
+        await run_in_threadpool(prime_caches)
+    except Exception:
+        # le cache sono un'ottimizzazione: /readyz verifica comunque il DB
+        logger.exception("Warmup failed")
+    app.state.ready = True
+
+def check_db():
+    with pool.read() as conn:
+        conn.execute("SELECT 1").fetchone()
+
 # ----------------------------------------------------------
 # ROUTES BASE
 # ----------------------------------------------------------
@@ -79,10 +171,53 @@ def compute_insights():
 def root():
     return {"message": "FinNLP API is running!"}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving (no DB access)."""
+    return {"status": "ok", "pid": os.getpid()}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 503 until warmup has finished and the database answers."""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    try:
+        await run_in_threadpool(check_db)
+    except Exception as e:
+        return JSONResponse({"status": "unavailable", "detail": str(e)}, status_code=503)
+    return {"status": "ready", "pid": os.getpid()}
+
 @app.get("/transactions")
-def list_transactions(limit: int = Query(10, ge=1, le=200)):
-    df = get_transactions(limit)
-    return df.to_dict(orient="records")
+def list_transactions(
+    limit: int = Query(10, ge=1, le=200),
+    accept: str | None = Header(None)
+):
+    """JSON by default, Arrow IPC with `Accept: application/vnd.apache.arrow.stream`."""
+    return rows_response("1=1 LIMIT ?", (limit,), accept)
+
+@app.get("/transactions/page")
+def page_transactions(
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    """Keyset pagination on (date, id): constant cost per page."""
+    try:
+        return fetch_page(cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/transactions/export")
+def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    chunk_size: int = Query(5000, ge=100, le=100_000)
+):
+    """Stream the full table as NDJSON or CSV in constant memory."""
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        stream_rows(format, chunk_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"},
+    )
 
 @app.get("/transactions/view", response_class=HTMLResponse)
 def view_transactions(limit: int = Query(10, ge=1, le=200)):
@@ -94,72 +229,308 @@ def view_transactions(limit: int = Query(10, ge=1, le=200)):
 def filter_transactions(
     category: str | None = Query(None),
     merchant: str | None = Query(None),
-    limit: int = Query(50, ge=1, le=500)
+    q: str | None = Query(None, description="Substring search in the description"),
+    mode: str = Query("substring", pattern="^(substring|exact|prefix)$"),
+    limit: int = Query(50, ge=1, le=500),
+    accept: str | None = Header(None)
+):
+    where, params = build_filter(
+        {"category": category, "merchant": merchant, "description": q}, mode
+    )
+    return rows_response(f"{where} LIMIT ?", (*params, limit), accept)
+
+@app.post("/transactions/bulk")
+async def bulk_transactions(
+    request: Request,
+    on_conflict: str = Query("update", pattern="^(update|ignore)$"),
+    format: str | None = Query(None, pattern="^(ndjson|csv)$", description="Default: from Content-Type")
 ):
-    conn = sqlite3.connect(DB_PATH)
-    query = "SELECT * FROM transactions WHERE 1=1"
-    if category:
-        query += f" AND category LIKE '%{category}%'"
-    if merchant:
-        query += f" AND merchant LIKE '%{merchant}%'"
-    query += f" LIMIT {limit}"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df.to_dict(orient="records")
+    """Streamed NDJSON / CSV upload, validated and written in batches (see Ingest.py)."""
+    fmt = format or Ingest.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson (or ?format=).")
+    try:
+        return await Ingest.ingest(request.stream(), fmt, on_conflict)
+    except Ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/insights")
-def insights():
-    return compute_insights()
+def insights(target: str = Query(FX.BASE, description="Currency totals are converted to")):
+    try:
+        return compute_insights(target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/insights/anomalies")
+def insights_anomalies(
+    kind: str = Query("amount", pattern="^(amount|frequency)$"),
+    by: str = Query("all", pattern="^(all|merchant|category)$"),
+    min_score: float = Query(THRESHOLD, ge=THRESHOLD),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    """Unusual expenses (kind=amount) or weekly bursts (kind=frequency), highest score first."""
+    return current_detector().page(kind, by, min_score, offset, limit)
+
+@app.get("/insights/recurring")
+def insights_recurring(
+    as_of: str | None = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$",
+                              description="Reference date (default: latest transaction)"),
+    horizon: int = Query(30, ge=1, le=366, description="Days of upcoming charges"),
+    target: str = Query(FX.BASE, description="Currency of the monthly totals"),
+    min_confidence: float = Query(Recurring.MIN_CONFIDENCE, ge=Recurring.MIN_CONFIDENCE, le=1)
+):
+    """Subscriptions, bills and salaries: upcoming charges and monthly committed cost."""
+    try:
+        return Recurring.recurring(as_of, horizon, target, min_confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/insights/forecast")
+def insights_forecast(
+    months: int = Query(3, ge=1, le=Forecast.MAX_MONTHS),
+    category: str | None = Query(None),
+    currency: str | None = Query(None)
+):
+    """Projected monthly spend per category and currency (from monthly_rollup)."""
+    return Forecast.forecast(months, category, currency)
 
 # ----------------------------------------------------------
-# AI ENDPOINTS (USANO LA CHIAVE INVIATA DAL FRONTEND)
+# STATS (dati per i grafici, calcolati su tutta la tabella)
 # ----------------------------------------------------------
-@app.post("/ai/report")
-def ai_report(req: ReportRequest):
-    """Generate a natural-language report based on financial insights."""
-    if not req.api_key or not req.api_key.startswith("sk-"):
-        raise HTTPException(status_code=400, detail="Missing or invalid OpenAI API key in request.")
+@app.get("/stats/histogram")
+def stats_histogram(
+    bins: int = Query(30, ge=1, le=200),
+    sign: str = Query("all", pattern="^(all|expense|income)$"),
+    currency: str | None = Query(None)
+):
+    return Stats.histogram(bins, sign, currency)
 
-    df = get_transactions(req.limit)
-    stats = compute_insights()
+@app.get("/stats/timeseries")
+def stats_timeseries(
+    bucket: str = Query("month", pattern="^(day|week|month)$"),
+    currency: str | None = Query(None),
+    category: str | None = Query(None),
+    target: str | None = Query(None, description="Convert amounts to this currency")
+):
+    try:
+        return Stats.timeseries(bucket, currency, category, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/stats/breakdown")
+def stats_breakdown(
+    by: str = Query("category", pattern="^(category|merchant|currency|city|country)$"),
+    sign: str = Query("expense", pattern="^(all|expense|income)$"),
+    limit: int = Query(20, ge=1, le=500),
+    currency: str | None = Query(None),
+    target: str | None = Query(None, description="Convert amounts to this currency")
+):
+    try:
+        return Stats.breakdown(by, sign, limit, currency, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/fx/currencies")
+def fx_currencies():
+    """Currencies accepted as `target`."""
+    return {"base": FX.BASE, "currencies": FX.currencies()}
+
+@app.get("/stats/cache")
+def stats_cache():
+    return {**Stats.cache_info(), "forecast": Forecast.cache_info(), "classifier": classifier.stats()}
+
+@app.get("/version")
+def version():
+    """Data version and last write time: cheap key for client-side caches."""
+    version, updated_at = current_stamp()
+    return {"data_version": version, "updated_at": updated_at}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: route/SQL/LLM latency, threadpool, pool and cache gauges."""
+    cache_stats = await run_in_threadpool(llm_cache.stats)
+    return Response(Metrics.render(ai_client.stats(), cache_stats),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/db/pool")
+def db_pool_stats():
+    """Connection pool usage of the current tenant's shard, plus totals over the open shards."""
+    return {**pool.stats(), "shards": router.stats()}
+
+@app.exception_handler(UnknownTenant)
+async def unknown_tenant(request: Request, exc: UnknownTenant):
+    # shard rimosso mentre il server gira
+    return JSONResponse({"detail": str(exc)}, status_code=404)
+
+# ----------------------------------------------------------
+# AI ENDPOINTS (USANO LA CHIAVE INVIATA DAL FRONTEND)
+# ----------------------------------------------------------
+async def cached_completion(api_key: str, prompt: str) -> tuple[str, bool]:
+    """Return (text, cached). Identical prompts on unchanged data skip the API call."""
+    tenant, version = await run_in_threadpool(current_data_key)
+    hit = await run_in_threadpool(llm_cache.get, MODEL, prompt, version, tenant)
+    if hit is not None:
+        return hit, True
+    text = await ai_client.complete(api_key, prompt, MODEL)
+    await run_in_threadpool(llm_cache.put, MODEL, prompt, version, text, tenant)
+    return text, False
 
-    prompt = (
-        "Write a clear, concise financial report based on these stats and transactions.\n"
-        f"Stats: {stats}\n"
-        f"Transactions (sample): {df.head(10).to_dict(orient='records')}\n"
+def build_report_prompt(limit: int) -> str:
+    context = build_context(max_rows=min(limit, 50))
+    return (
+        "Write a clear, concise financial report based on these figures "
+        "(amounts are in their original currency; negative = expense).\n"
+        f"{context}\n"
         "The report should sound like a financial summary, around 150 words."
     )
 
+def build_question_prompt(question: str) -> str:
+    context = build_context(question, max_rows=30)
+    return (
+        "Figures computed over the full transaction dataset "
+        "(amounts in original currency; negative = expense):\n"
+        f"{context}\n"
+        f"Answer the following question briefly and accurately:\n{question}"
+    )
+
+def check_api_key(api_key: str | None):
+    if not api_key or not api_key.startswith("sk-"):
+        raise HTTPException(status_code=400, detail="Missing or invalid OpenAI API key in request.")
+
+def sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+async def stream_completion(api_key: str, prompt: str):
+    """
+    SSE stream of completion deltas: `data: {"delta": ...}` events, then
+    `event: done` (or `event: error`). Cached answers are sent as one delta.
+    """
+    tenant, version = await run_in_threadpool(current_data_key)
+    hit = await run_in_threadpool(llm_cache.get, MODEL, prompt, version, tenant)
+    if hit is not None:
+        yield sse({"delta": hit})
+        yield sse({"cached": True}, event="done")
+        return
+    parts = []
     try:
-        client = OpenAI(api_key=req.api_key)  # ← nessun client globale
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return {"report": response.choices[0].message.content.strip()}
+        async for delta in ai_client.stream(api_key, prompt, MODEL):
+            parts.append(delta)
+            yield sse({"delta": delta})
+    except Exception as e:
+        yield sse({"detail": f"AI generation failed: {e}"}, event="error")
+        return
+    text = "".join(parts).strip()
+    await run_in_threadpool(llm_cache.put, MODEL, prompt, version, text, tenant)
+    yield sse({"cached": False}, event="done")
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.post("/ai/report")
+async def ai_report(req: ReportRequest):
+    """Generate a natural-language report based on financial insights."""
+    check_api_key(req.api_key)
+    prompt = await run_in_threadpool(build_report_prompt, req.limit)
+
+    try:
+        report, cached = await cached_completion(req.api_key, prompt)
+        return {"report": report, "cached": cached}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI report generation failed: {e}")
 
+@app.post("/ai/report/stream")
+async def ai_report_stream(req: ReportRequest):
+    """Same as /ai/report, streamed token by token as server-sent events."""
+    check_api_key(req.api_key)
+    prompt = await run_in_threadpool(build_report_prompt, req.limit)
+    return StreamingResponse(stream_completion(req.api_key, prompt),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/ai/question")
-def ai_question(req: QuestionRequest):
-    """Answer natural language questions about financial data."""
-    if not req.api_key or not req.api_key.startswith("sk-"):
-        raise HTTPException(status_code=400, detail="Missing or invalid OpenAI API key in request.")
+async def ai_question(req: QuestionRequest):
+    """
+    Answer natural language questions about financial data.
+    Aggregate questions (sum/avg/count/top-N) are answered locally with SQL;
+    only the others reach the LLM.
+    """
     if not req.question:
         raise HTTPException(status_code=400, detail="Missing question in request.")
+    local = await run_in_threadpool(try_answer, req.question)
+    if local:
+        return {"answer": local["answer"], "cached": False, "source": "sql",
+                "figures": local["figures"]}
 
-    df = get_transactions(200)
-    prompt = (
-        f"Based on this transaction dataset: {df.to_dict(orient='records')[:30]},\n"
-        f"answer the following question briefly and accurately:\n{req.question}"
-    )
+    check_api_key(req.api_key)
+    prompt = await run_in_threadpool(build_question_prompt, req.question)
 
     try:
-        client = OpenAI(api_key=req.api_key)  # ← nessun client globale
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return {"answer": response.choices[0].message.content.strip()}
+        answer, cached = await cached_completion(req.api_key, prompt)
+        return {"answer": answer, "cached": cached, "source": "llm"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI question failed: {e}")
+
+async def local_answer_events(answer: str):
+    yield sse({"delta": answer})
+    yield sse({"cached": False, "source": "sql"}, event="done")
+
+@app.post("/ai/question/stream")
+async def ai_question_stream(req: QuestionRequest):
+    """Same as /ai/question, streamed token by token as server-sent events."""
+    if not req.question:
+        raise HTTPException(status_code=400, detail="Missing question in request.")
+    local = await run_in_threadpool(try_answer, req.question)
+    if local:
+        return StreamingResponse(local_answer_events(local["answer"]),
+                                 media_type="text/event-stream", headers=SSE_HEADERS)
+
+    check_api_key(req.api_key)
+    prompt = await run_in_threadpool(build_question_prompt, req.question)
+    return StreamingResponse(stream_completion(req.api_key, prompt),
+                             media_type="text/event-stream", headers=SSE_HEADERS)
+
+# ----------------------------------------------------------
+# BACKGROUND JOBS (report + PDF generati lato server)
+# ----------------------------------------------------------
+async def run_report_job(params: dict, api_key: str | None):
+    check_api_key(api_key)
+    prompt = await run_in_threadpool(build_report_prompt, params["limit"])
+    report, _ = await cached_completion(api_key, prompt)
+    pdf = await run_in_threadpool(render_pdf, "FinNLP AI Financial Report", report)
+    return report, pdf
+
+@app.post("/jobs/report", status_code=202)
+async def submit_report_job(req: ReportRequest):
+    """Queue an AI report + PDF; poll /jobs/{job_id}, then GET /jobs/{job_id}/pdf."""
+    check_api_key(req.api_key)
+    try:
+        return await job_manager.submit("report", {"limit": req.limit}, req.api_key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = job_manager.get(job_id, tenant=current_tenant.get())
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/jobs/{job_id}/pdf")
+def job_pdf(job_id: str):
+    job = job_manager.get(job_id, with_pdf=True, tenant=current_tenant.get())
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] != "done" or not job["pdf"]:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, no PDF yet.")
+    return Response(content=job["pdf"], media_type="application/pdf",
+                    headers={"Content-Disposition": "attachment; filename=FinNLP_Report.pdf"})
+
+@app.get("/ai/cache")
+def ai_cache_stats():
+    """LLM response cache hit/miss counters and sizes."""
+    return llm_cache.stats()
+
+@app.get("/ai/client")
+def ai_client_stats():
+    """Upstream LLM calls: concurrency, queue time, coalescing, token usage."""
+    return ai_client.stats()
@@ -0,0 +1,248 @@
+"""
+Metrics.py
+----------
+Prometheus metrics for the API, rendered in the text exposition format at
+/metrics without extra dependencies.
+
+- finnlp_http_request_duration_seconds  per route template / method / status
+- finnlp_sql_query_duration_seconds     per statement type (select, insert, ...)
+- finnlp_sql_rows_total                 rows returned by fetch calls
+- finnlp_llm_call_duration_seconds      upstream LLM calls (complete / stream)
+- gauges and counters read at scrape time from the DB pool, the AnyIO
+  threadpool limiter, the LLM client and the LLM cache
+
+Slow-request log (opt-in): with FINNLP_SLOW_REQUEST_MS set, requests slower
+than that many milliseconds are logged to the `finnlp.slow` logger with
+their slowest SQL statements and each one's EXPLAIN QUERY PLAN.
+"""
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from Database import add_query_observer, pool, router
+
+SLOW_REQUEST_MS = float(os.environ.get("FINNLP_SLOW_REQUEST_MS", 0))  # 0 → off
+SLOW_QUERIES_LOGGED = 5
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+log = logging.getLogger("finnlp.slow")
+
+
+# ----------------------------------------------------------
+# PRIMITIVES
+# ----------------------------------------------------------
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labels, buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    le = _labels(self.labelnames + ("le",), labels + (bound,))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                inf = _labels(self.labelnames + ("le",), labels + ("+Inf",))
+                lines.append(f"{self.name}_bucket{inf} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+def _gauge(name: str, help: str, values: dict, label: str | None = None, kind: str = "gauge") -> list[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for key, value in values.items():
+        lines.append(f"{name}{_labels((label,), (key,)) if label else ''} {float(value or 0)}")
+    return lines
+
+
+# ----------------------------------------------------------
+# METRICS
+# ----------------------------------------------------------
+HTTP_LATENCY = Histogram("finnlp_http_request_duration_seconds", "HTTP request latency.",
+                         ("method", "route", "status"))
+SQL_LATENCY = Histogram("finnlp_sql_query_duration_seconds", "SQL execute time (to the first row).",
+                        ("statement",))
+SQL_FETCH_SECONDS = Counter("finnlp_sql_fetch_seconds_total", "Time spent fetching SQL result rows.")
+SQL_ROWS = Counter("finnlp_sql_rows_total", "Rows returned by SQL fetch calls.", ("statement",))
+LLM_LATENCY = Histogram("finnlp_llm_call_duration_seconds", "Upstream LLM call latency.", ("kind",))
+
+_request_queries = contextvars.ContextVar("finnlp_request_queries", default=None)
+
+
+def _statement(sql: str) -> str:
+    m = re.match(r"\s*(\w+)", sql)
+    return m.group(1).lower() if m else "other"
+
+
+def _observe_query(sql, params, seconds, rows):
+    kind = _statement(sql)
+    if rows is None:
+        SQL_LATENCY.observe(seconds, kind)
+    else:
+        SQL_FETCH_SECONDS.inc(seconds)
+        SQL_ROWS.inc(rows, kind)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.append((sql, params, seconds, rows))
+
+
+add_query_observer(_observe_query)
+
+
+# ----------------------------------------------------------
+# MIDDLEWARE
+# ----------------------------------------------------------
+def _explain(sql: str, params) -> list[str]:
+    with pool.read() as conn:
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def _log_slow(method: str, path: str, seconds: float, queries: list):
+    # execute + fetch time per statement, slowest first
+    totals = {}
+    for sql, params, q_seconds, _ in queries:
+        key = (sql, repr(params))
+        entry = totals.setdefault(key, [sql, params, 0.0])
+        entry[2] += q_seconds
+    slowest = sorted(totals.values(), key=lambda e: e[2], reverse=True)[:SLOW_QUERIES_LOGGED]
+    lines = [f"{method} {path} took {seconds * 1000:.1f} ms, {len(queries)} SQL calls"]
+    for sql, params, q_seconds in slowest:
+        lines.append(f"  {q_seconds * 1000:.1f} ms  {' '.join(sql.split())[:300]}")
+        if _statement(sql) in ("select", "with"):
+            try:
+                lines += [f"      plan: {step}" for step in _explain(sql, params)]
+            except Exception as e:
+                lines.append(f"      plan unavailable: {e}")
+    log.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        queries = [] if self.slow_ms else None
+        token = _request_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _request_queries.reset(token)
+            route = scope.get("route")
+            # route template, not the raw path, keeps label cardinality bounded
+            HTTP_LATENCY.observe(seconds, scope["method"], getattr(route, "path", "unmatched"), status)
+            if queries is not None and seconds * 1000 >= self.slow_ms:
+                await run_in_threadpool(_log_slow, scope["method"], scope["path"], seconds, queries)
+
+
+# ----------------------------------------------------------
+# EXPOSITION
+# ----------------------------------------------------------
+def _threadpool() -> dict:
+    import anyio.to_thread
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    return {"total": limiter.total_tokens, "borrowed": stats.borrowed_tokens,
+            "waiting": stats.tasks_waiting}
+
+
+def render(ai_stats: dict, cache_stats: dict) -> str:
+    """Prometheus text format; call from the event loop (reads the AnyIO limiter)."""
+    lines = []
+    for metric in (HTTP_LATENCY, SQL_LATENCY, SQL_FETCH_SECONDS, SQL_ROWS, LLM_LATENCY):
+        lines += metric.render()
+
+    tp = _threadpool()
+    lines += _gauge("finnlp_threadpool_tokens", "AnyIO worker threads: limit and in use.",
+                    {"total": tp["total"], "borrowed": tp["borrowed"]}, "state")
+    lines += _gauge("finnlp_threadpool_waiting", "Tasks waiting for a worker thread.", {None: tp["waiting"]})
+
+    db = router.stats()
+    lines += _gauge("finnlp_db_shards_open", "Tenant shards with an open connection pool.",
+                    {None: db["shards_open"]})
+    lines += _gauge("finnlp_db_readers", "Read connections by state, summed over the open shards.",
+                    {"created": db["readers_created"], "idle": db["readers_idle"],
+                     "in_use": db["readers_in_use"], "max": db["max_readers"]}, "state")
+    lines += _gauge("finnlp_db_read_waits_total", "Checkouts that had to wait for a reader.",
+                    {None: db["waits"]}, kind="counter")
+
+    lines += _gauge("finnlp_llm_requests_total", "LLM client requests by outcome.",
+                    {k: ai_stats[k] for k in ("requests", "upstream_calls", "coalesced", "errors")},
+                    "outcome", kind="counter")
+    lines += _gauge("finnlp_llm_tokens_total", "Tokens used by upstream LLM calls.",
+                    {"prompt": ai_stats["prompt_tokens"], "completion": ai_stats["completion_tokens"]},
+                    "type", kind="counter")
+    lines += _gauge("finnlp_llm_in_flight", "LLM calls waiting for or holding a slot.",
+                    {"waiting": ai_stats["waiting"], "active": ai_stats["active"]}, "state")
+
+    lines += _gauge("finnlp_llm_cache_lookups_total", "LLM response cache lookups by result.",
+                    {"memory_hit": cache_stats["memory_hits"], "disk_hit": cache_stats["disk_hits"],
+                     "miss": cache_stats["misses"]}, "result", kind="counter")
+    lines += _gauge("finnlp_llm_cache_hit_ratio", "LLM response cache hit rate.",
+                    {None: cache_stats["hit_rate"]})
+    return "\n".join(lines) + "\n"
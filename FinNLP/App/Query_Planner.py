@@ -0,0 +1,311 @@
+"""
+Query_Planner.py
+----------------
+Deterministic parser for aggregate questions, answered with SQL over the
+whole table instead of the LLM.
+
+    "How much did I spend on Food last month?"     → SUM, expense, category
+    "Average Uber payment in GBP"                  → AVG, merchant, currency
+    "How many transactions in March 2025?"         → COUNT, date range
+    "How many merchants did I pay this year?"      → COUNT DISTINCT merchant
+    "Top 5 merchants by spending this year"        → TOP-N, group by merchant
+    "Which category has the most transactions?"    → TOP-N by count
+
+parse() returns None for anything it does not understand, including
+questions that name several categories or merchants, compare things or
+count anything but transactions, merchants and categories; those
+questions go to the LLM.
+"""
+
+import calendar
+import datetime
+import re
+from dataclasses import dataclass
+
+from Database import data_key, pool
+
+MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_name) if m}
+MONTHS.update({m.lower(): i for i, m in enumerate(calendar.month_abbr) if m})
+CURRENCIES = {
+    "eur": "EUR", "euro": "EUR", "euros": "EUR", "€": "EUR",
+    "gbp": "GBP", "pound": "GBP", "pounds": "GBP", "sterling": "GBP", "£": "GBP",
+    "usd": "USD", "dollar": "USD", "dollars": "USD", "$": "USD",
+}
+
+# Questions that need judgement, not arithmetic
+OPEN_ENDED = re.compile(
+    r"\b(why|should|advice|advise|recommend|suggest|tips?|improve|save money|"
+    r"compare|trend|predict|forecast|explain|summar)", re.I)
+COUNT = re.compile(r"\b(how many|number of|count)\b", re.I)
+AVG = re.compile(r"\b(average|avg|mean|typical)\b", re.I)
+TOP = re.compile(r"\b(top|biggest|largest|highest|most)\b(?:\s+(\d+))?", re.I)
+SUM = re.compile(r"\b(how much|total|sum|spend|spent|spending|earn|earned|income|paid|pay)\b", re.I)
+INCOME = re.compile(r"\b(earn|earned|income|receive|received|made|salary)\b", re.I)
+EXPENSE = re.compile(r"\b(spend|spent|spending|pay|paid|cost|expenses?|purchases?)\b", re.I)
+GROUP = re.compile(r"\b(merchants?|shops?|stores?|categor(?:y|ies))\b", re.I)
+COMPARE = re.compile(r"\b(than|versus|vs|against|difference|each)\b", re.I)
+BY_COUNT = re.compile(r"\b(transactions?|payments?|purchases?|count|number of|how many|often|frequent(?:ly)?)\b", re.I)
+# What "how many ..." counts: the noun after it, or before "count"
+COUNT_TARGET = re.compile(
+    r"\b(?:how many|number of|count(?:\s+of)?)\s+(?:(?:different|distinct|unique|my|the)\s+)*(\w+)|\b(\w+) count\b", re.I)
+COUNT_TARGETS = {
+    **dict.fromkeys(("transaction", "transactions", "payment", "payments", "purchase", "purchases",
+                     "charge", "charges", "expense", "expenses", "times"), None),
+    **dict.fromkeys(("merchant", "merchants", "shop", "shops", "store", "stores"), "merchant"),
+    **dict.fromkeys(("category", "categories"), "category"),
+}
+BY_AMOUNT = re.compile(r"\b(how much|amount|spend|spent|spending|money|earn|earned)\b", re.I)
+
+
+@dataclass
+class Plan:
+    metric: str                       # sum | avg | count | top
+    sign: str | None = None           # expense | income | None (all)
+    category: str | None = None
+    merchant: str | None = None
+    currency: str | None = None
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None   # exclusive
+    group_by: str | None = None       # category | merchant (top only)
+    distinct: str | None = None       # category | merchant: count those, not transactions (count only)
+    rank_by: str = "amount"           # amount | count (top only)
+    top_n: int = 5
+
+
+# ----------------------------------------------------------
+# VOCABULARY (categories/merchants present in the DB)
+# ----------------------------------------------------------
+_vocab = {}  # tenant -> {"version", "categories", "merchants"}
+
+
+def vocabulary() -> dict:
+    """Distinct categories and merchants, reloaded only when the tenant's data version changes."""
+    with pool.read() as conn:
+        tenant, version = data_key(conn)
+        vocab = _vocab.get(tenant)
+        if vocab is None or vocab["version"] != version:
+            vocab = _vocab[tenant] = {
+                "version": version,
+                "categories": [r[0] for r in conn.execute(
+                    "SELECT category FROM category_counts WHERE n > 0 AND category <> ''")],
+                "merchants": [r[0] for r in conn.execute(
+                    "SELECT merchant FROM merchant_counts WHERE n > 0 AND merchant <> ''")],
+            }
+    return vocab
+
+
+def _find_terms(question: str, *vocabularies: list[str]) -> list[list[str]]:
+    """
+    Terms of each vocabulary named in the question, longest first across all
+    of them: a matched span is blanked out, so "Transport for London" (a
+    merchant) does not also match the category "Transport".
+    """
+    low = question.lower()
+    tagged = sorted(((term, i) for i, terms in enumerate(vocabularies) for term in terms),
+                    key=lambda t: len(t[0]), reverse=True)
+    found = [[] for _ in vocabularies]
+    for term, i in tagged:
+        pattern = rf"(?<!\w){re.escape(term.lower())}(?!\w)"
+        if re.search(pattern, low):
+            found[i].append(term)
+            low = re.sub(pattern, " ", low)
+    return found
+
+
+# ----------------------------------------------------------
+# DATES
+# ----------------------------------------------------------
+def _month_range(year: int, month: int):
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + (month == 12), month % 12 + 1, 1)
+    return start, end
+
+
+def parse_dates(question: str, today: datetime.date | None = None):
+    """Return (date_from, date_to_exclusive) or (None, None)."""
+    today = today or datetime.date.today()
+    q = question.lower()
+
+    m = re.search(r"between (\d{4}-\d{2}-\d{2}) and (\d{4}-\d{2}-\d{2})", q)
+    if m:
+        end = datetime.date.fromisoformat(m.group(2)) + datetime.timedelta(days=1)
+        return datetime.date.fromisoformat(m.group(1)), end
+    m = re.search(r"since (\d{4}-\d{2}-\d{2})", q)
+    if m:
+        return datetime.date.fromisoformat(m.group(1)), None
+    m = re.search(r"(?:last|past) (\d+) (day|week|month)s?", q)
+    if m:
+        days = int(m.group(1)) * {"day": 1, "week": 7, "month": 30}[m.group(2)]
+        return today - datetime.timedelta(days=days), None
+    if "this month" in q:
+        return _month_range(today.year, today.month)[0], None
+    if "last month" in q:
+        prev = today.replace(day=1) - datetime.timedelta(days=1)
+        return _month_range(prev.year, prev.month)
+    if "this year" in q:
+        return datetime.date(today.year, 1, 1), None
+    if "last year" in q:
+        return datetime.date(today.year - 1, 1, 1), datetime.date(today.year, 1, 1)
+    month_names = "|".join(sorted(MONTHS, key=len, reverse=True))
+    m = re.search(rf"\b({month_names})\b(?:\s+(\d{{4}}))?", q)
+    # "may" is also a verb: only a month with a year or after "in"/"during"
+    if m and (m.group(1) != "may" or m.group(2) or re.search(r"\b(?:in|during) may\b", q)):
+        month = MONTHS[m.group(1)]
+        # Without a year: the most recent such month
+        year = int(m.group(2)) if m.group(2) else today.year - (month > today.month)
+        return _month_range(year, month)
+    m = re.search(r"\b(?:in|during) (\d{4})\b", q)
+    if m:
+        year = int(m.group(1))
+        return datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+    return None, None
+
+
+# ----------------------------------------------------------
+# PARSE
+# ----------------------------------------------------------
+def parse(question: str, today: datetime.date | None = None) -> Plan | None:
+    if not question or OPEN_ENDED.search(question) or COMPARE.search(question):
+        return None
+    vocab = vocabulary()
+
+    top = TOP.search(question)
+    if top and GROUP.search(question):
+        if AVG.search(question):
+            return None  # "average of the top merchants": not a single figure
+        metric = "top"
+    elif COUNT.search(question):
+        metric = "count"
+        target = COUNT_TARGET.search(question)
+        word = target and (target.group(1) or target.group(2)).lower()
+        if word not in COUNT_TARGETS:
+            return None  # "how many coffees / cities": not something a COUNT here answers
+    elif AVG.search(question):
+        metric = "avg"
+    elif SUM.search(question):
+        metric = "sum"
+    else:
+        return None
+
+    categories, merchants = _find_terms(question, vocab["categories"], vocab["merchants"])
+    if len(categories) > 1 or len(merchants) > 1:
+        return None  # "Food and Groceries": one sum would answer only part of it
+    plan = Plan(metric=metric)
+    if metric == "count":
+        plan.distinct = COUNT_TARGETS[word]
+    plan.category = categories[0] if categories else None
+    plan.merchant = merchants[0] if merchants else None
+    if metric == "top" and BY_COUNT.search(question) and not BY_AMOUNT.search(question):
+        plan.rank_by = "count"
+    tokens = re.findall(r"[€£$]|\w+", question.lower())
+    plan.currency = next((CURRENCIES[t] for t in tokens if t in CURRENCIES), None)
+    plan.date_from, plan.date_to = parse_dates(question, today)
+
+    if INCOME.search(question) or plan.category == "Income":
+        plan.sign = "income"
+    elif EXPENSE.search(question) or metric in ("sum", "avg") or (metric == "top" and plan.rank_by == "amount"):
+        plan.sign = "expense"
+
+    if metric == "top":
+        plan.group_by = "merchant" if re.search(r"merchant|shop|store", question, re.I) else "category"
+        if top.group(2):
+            plan.top_n = max(1, min(int(top.group(2)), 50))
+    return plan
+
+
+# ----------------------------------------------------------
+# COMPILE & RUN
+# ----------------------------------------------------------
+def compile_plan(plan: Plan) -> tuple[str, list]:
+    where, params = [], []
+    if plan.sign == "expense":
+        where.append("amount < 0")
+    elif plan.sign == "income":
+        where.append("amount > 0")
+    for column in ("category", "merchant"):
+        value = getattr(plan, column)
+        if value:
+            where.append(f"{column} = ? COLLATE NOCASE")
+            params.append(value)
+    if plan.currency:
+        where.append("currency = ?")
+        params.append(plan.currency)
+    if plan.date_from:
+        where.append("date >= ?")
+        params.append(plan.date_from.isoformat())
+    if plan.date_to:
+        where.append("date < ?")
+        params.append(plan.date_to.isoformat())
+    clause = " AND ".join(where) or "1=1"
+
+    if plan.metric == "top":
+        order = "COUNT(*) DESC, ABS(SUM(amount)) DESC" if plan.rank_by == "count" else "ABS(SUM(amount)) DESC"
+        sql = (f"SELECT {plan.group_by}, SUM(amount) AS total, COUNT(*) AS n FROM transactions "
+               f"WHERE {clause} AND {plan.group_by} IS NOT NULL GROUP BY {plan.group_by} "
+               f"ORDER BY {order} LIMIT ?")
+        return sql, params + [plan.top_n]
+    if plan.distinct:
+        return f"SELECT COUNT(DISTINCT {plan.distinct} COLLATE NOCASE) FROM transactions WHERE {clause}", params
+    return f"SELECT SUM(amount), AVG(amount), COUNT(*) FROM transactions WHERE {clause}", params
+
+
+def _describe(plan: Plan) -> str:
+    parts = []
+    if plan.category:
+        parts.append(f"on {plan.category}")
+    if plan.merchant:
+        parts.append(f"at {plan.merchant}")
+    if plan.currency:
+        parts.append(f"in {plan.currency}")
+    if plan.date_from and plan.date_to:
+        last = plan.date_to - datetime.timedelta(days=1)
+        parts.append(f"from {plan.date_from} to {last}")
+    elif plan.date_from:
+        parts.append(f"since {plan.date_from}")
+    return " ".join(parts)
+
+
+def run_plan(plan: Plan) -> dict:
+    """Execute the plan; returns the answer text plus the raw figures and SQL."""
+    sql, params = compile_plan(plan)
+    with pool.read() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    scope = _describe(plan)
+    unit = "" if plan.currency else " (all currencies, unconverted)"
+    verb = "received" if plan.sign == "income" else "spent" if plan.sign == "expense" else "moved"
+
+    if plan.metric == "top":
+        figures = [{plan.group_by: r[0], "total": round(abs(r[1]), 2), "transactions": r[2]} for r in rows]
+        lines = [f"{i}. {f[plan.group_by]}: {f['total']:,.2f} ({f['transactions']} transactions)"
+                 for i, f in enumerate(figures, 1)]
+        label = {"category": "categories", "merchant": "merchants"}[plan.group_by]
+        ranking = "number of transactions" if plan.rank_by == "count" else f"amount {verb}"
+        head = f"Top {len(figures)} {label} by {ranking} {scope}".strip()
+        answer = head + f"{unit}:\n" + "\n".join(lines) if figures else "No matching transactions."
+        return {"answer": answer, "figures": figures, "sql": sql, "params": params}
+
+    if plan.distinct:
+        label = {"category": "categories", "merchant": "merchants"}[plan.distinct]
+        n = rows[0][0]
+        answer = f"Your transactions {scope} span {n:,} {label}." if n else f"No matching transactions {scope}."
+        return {"answer": re.sub(r"\s+", " ", answer).replace(" .", "."), "figures": {label: n},
+                "sql": sql, "params": params}
+
+    total, avg, n = rows[0]
+    figures = {"total": round(abs(total or 0), 2), "average": round(abs(avg or 0), 2), "transactions": n}
+    if n == 0:
+        answer = f"No matching transactions {scope}.".replace("  ", " ")
+    elif plan.metric == "count":
+        answer = f"You have {n:,} transactions {scope}.".replace(" .", ".")
+    elif plan.metric == "avg":
+        answer = f"On average you {verb} {figures['average']:,.2f} per transaction {scope}{unit} ({n:,} transactions)."
+    else:
+        answer = f"You {verb} {figures['total']:,.2f} {scope}{unit} across {n:,} transactions."
+    return {"answer": re.sub(r"\s+", " ", answer).replace(" .", "."), "figures": figures,
+            "sql": sql, "params": params}
+
+
+def try_answer(question: str) -> dict | None:
+    """Answer locally if the question parses, else None (→ LLM)."""
+    plan = parse(question)
+    return run_plan(plan) if plan else None
@@ -0,0 +1,246 @@
+"""
+Recurring.py
+------------
+Subscriptions, bills and salaries: series of transactions from the same
+merchant, for a similar amount, at a regular interval.
+
+- rows are grouped by (merchant, currency, sign, amount band); bands are
+  log-scale, BAND_RATIO wide, and evaluated at two offsets half a band apart
+  so a stable amount is never split by a band edge
+- per group (numpy, no Python loop over rows) the median interval between
+  charge days picks the period (weekly / monthly / annual, see PERIODS)
+- confidence = regularity (share of intervals within the period's
+  tolerance) x support (intervals seen, up to the period's full support)
+  x amount stability (1 for a fixed price, 0.5 once it varies by CV_LIMIT)
+- series of the two offsets that cover the same amounts are reduced to the
+  most confident one
+
+Detection runs once per data version (lru_cache). Upcoming charges and the
+monthly committed cost are derived from the detected series for the
+requested `as_of` date: a series is active while its last charge is less
+than STALE_PERIODS periods old.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import FX
+from Database import data_key, gc_paused, pool
+
+BAND_RATIO = 1.5                # amounts within one band differ by less than 50%
+MIN_CONFIDENCE = 0.5
+CV_LIMIT = 0.2                  # amount variation at which stability bottoms out
+STALE_PERIODS = 1.5
+CACHE_ENTRIES = 4
+
+# name: (days, tolerance in days, minimum occurrences, intervals for full support, charges per month)
+PERIODS = {
+    "weekly": (7.0, 1.0, 4, 6, 365.25 / 7 / 12),
+    "monthly": (30.44, 3.0, 3, 4, 1.0),
+    "annual": (365.25, 10.0, 2, 2, 1 / 12),
+}
+STEP = {"weekly": pd.DateOffset(weeks=1), "monthly": pd.DateOffset(months=1),
+        "annual": pd.DateOffset(years=1)}
+
+SELECT = ("SELECT merchant, category, currency, date, amount FROM transactions "
+          "WHERE merchant IS NOT NULL AND amount <> 0")
+
+
+def _version() -> tuple[str, int]:
+    with pool.read() as conn:
+        return data_key(conn)
+
+
+# ----------------------------------------------------------
+# DETECTION
+# ----------------------------------------------------------
+def _group_median(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Median of `values` per group id (NaN for empty groups)."""
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    median = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    median[has] = (values[lo] + values[hi]) / 2
+    return median
+
+
+def _candidates(frame: pd.DataFrame, offset: float) -> pd.DataFrame:
+    """Periodic groups for one band offset, one row each."""
+    amount = frame["amount"].to_numpy()
+    size = np.abs(amount)
+    band = np.floor(np.log(size) / math.log(BAND_RATIO) + offset).astype(np.int64)
+    # (merchant, currency, sign, band) → one int64 key
+    key = frame["pair"].to_numpy() * 2 + (amount > 0)
+    group = key * (band.max() - band.min() + 1) + (band - band.min())
+    day = frame["day"].to_numpy()
+
+    # one charge per group and day, groups contiguous and in date order
+    rows = np.lexsort((day, group))
+    group, day = group[rows], day[rows]
+    keep = np.r_[True, (group[1:] != group[:-1]) | (day[1:] != day[:-1])]
+    rows, group, day = rows[keep], group[keep], day[keep]
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    ends = np.r_[starts[1:], len(group)] - 1
+    n_groups = len(starts)
+    group = np.repeat(np.arange(n_groups), np.diff(np.r_[starts, len(group)]))
+    occurrences = ends - starts + 1
+
+    same = group[1:] == group[:-1]
+    interval = np.diff(day)[same].astype(np.float64)
+    interval_group = group[1:][same]
+    median = _group_median(interval, interval_group, n_groups)
+
+    charged = size[rows]
+    mean = np.bincount(group, charged, minlength=n_groups) / occurrences
+    variance = np.bincount(group, charged * charged, minlength=n_groups) / occurrences - mean * mean
+    cv = np.sqrt(np.maximum(variance, 0)) / mean
+    stability = 1 - 0.5 * np.clip(cv / CV_LIMIT, 0, 1)
+
+    found = []
+    for name, (days, tolerance, min_count, full, per_month) in PERIODS.items():
+        hits = np.bincount(interval_group, np.abs(interval - days) <= tolerance, minlength=n_groups)
+        regularity = hits / np.maximum(occurrences - 1, 1)
+        support = np.minimum((occurrences - 1) / full, 1)
+        confidence = regularity * support * stability
+        ids = np.flatnonzero((np.abs(median - days) <= tolerance) & (occurrences >= min_count)
+                             & (confidence >= MIN_CONFIDENCE))
+        if not len(ids):
+            continue
+        first, last = rows[starts[ids]], rows[ends[ids]]
+        found.append(pd.DataFrame({
+            "merchant": frame["merchant"].to_numpy()[first],
+            "category": frame["category"].to_numpy()[last],
+            "currency": frame["currency"].to_numpy()[first],
+            "amount": np.sign(amount[first]) * mean[ids],
+            "low": np.minimum.reduceat(charged, starts)[ids],
+            "high": np.maximum.reduceat(charged, starts)[ids],
+            "period": name,
+            "interval_days": median[ids],
+            "occurrences": occurrences[ids],
+            "first": frame["date"].to_numpy()[first],
+            "last": frame["date"].to_numpy()[last],
+            "confidence": confidence[ids],
+            "per_month": per_month,
+        }))
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame()
+
+
+def _distinct(series: pd.DataFrame) -> pd.DataFrame:
+    """Drop series whose amounts overlap a more confident one of the same merchant / currency / sign."""
+    series = series.sort_values(["confidence", "occurrences"], ascending=False, ignore_index=True)
+    taken, keep = {}, []
+    for i, row in enumerate(series.itertuples()):
+        key = (row.merchant, row.currency, row.amount > 0)
+        ranges = taken.setdefault(key, [])
+        if any(row.low <= high and low <= row.high for low, high in ranges):
+            continue
+        ranges.append((row.low, row.high))
+        keep.append(i)
+    return series.iloc[keep].reset_index(drop=True)
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _detect(version: tuple) -> pd.DataFrame:
+    with pool.read() as conn, gc_paused():
+        rows = conn.execute(SELECT).fetchall()
+        columns = list(zip(*rows)) or [()] * 5
+        del rows
+        frame = pd.DataFrame({
+            "merchant": np.array(columns[0], dtype=object), "category": np.array(columns[1], dtype=object),
+            "currency": np.array(columns[2], dtype=object), "date": np.array(columns[3], dtype=object),
+            "amount": np.fromiter(columns[4], dtype=np.float64, count=len(columns[4])),
+        })
+    frame["day"] = frame["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    frame["pair"] = frame.groupby(["merchant", "currency"], sort=False, dropna=False).ngroup()
+    parts = [_candidates(frame, offset) for offset in (0.0, 0.5)] if len(frame) else []
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame(columns=["merchant", "category", "currency", "amount", "low", "high", "period",
+                                     "interval_days", "occurrences", "first", "last", "confidence",
+                                     "per_month"])
+    return _distinct(pd.concat(parts, ignore_index=True))
+
+
+def detect() -> pd.DataFrame:
+    """All recurring series of the current data version, most confident first."""
+    return _detect(_version())
+
+
+# ----------------------------------------------------------
+# UPCOMING CHARGES
+# ----------------------------------------------------------
+def _latest_date() -> str | None:
+    with pool.read() as conn:
+        return conn.execute("SELECT MAX(date) FROM transactions").fetchone()[0]
+
+
+def _schedule(last: pd.Timestamp, period: str, as_of: pd.Timestamp, until: pd.Timestamp) -> list:
+    """Expected charge dates after `last` that fall in [as_of, until]."""
+    dates, k = [], 1
+    while True:
+        due = last + STEP[period] * k
+        if due > until:
+            return dates
+        if due >= as_of:
+            dates.append(due)
+        k += 1
+
+
+def recurring(as_of: str | None = None, horizon: int = 30, target: str = FX.BASE,
+              min_confidence: float = MIN_CONFIDENCE) -> dict:
+    """
+    Recurring series, their expected charges in the next `horizon` days after
+    `as_of` (default: the latest transaction date) and the monthly committed
+    cost / recurring income of the active ones, converted to `target`.
+    """
+    target = target.upper()
+    as_of = as_of or _latest_date() or pd.Timestamp.today().strftime("%Y-%m-%d")
+    start = pd.Timestamp(as_of)
+    until = start + pd.Timedelta(days=horizon)
+    series = detect()
+    series = series[series["confidence"] >= min_confidence].copy()
+
+    days = np.array([PERIODS[p][0] for p in series["period"]])
+    age = (start - pd.to_datetime(series["last"], format="%Y-%m-%d")).dt.days.to_numpy()
+    series["active"] = age < STALE_PERIODS * days
+    factor = FX.factors(series["currency"].astype(str), as_of, target).to_numpy(dtype=float)
+    monthly = series["amount"].to_numpy() * series["per_month"].to_numpy() * factor
+    active = series["active"].to_numpy() & ~np.isnan(factor)
+
+    upcoming = []
+    for row in series[series["active"]].itertuples():
+        for due in _schedule(pd.Timestamp(row.last), row.period, start, until):
+            upcoming.append({
+                "date": due.strftime("%Y-%m-%d"), "merchant": row.merchant, "category": row.category,
+                "amount": round(row.amount, 2), "currency": row.currency, "period": row.period,
+                "confidence": round(row.confidence, 2),
+            })
+    upcoming.sort(key=lambda u: (u["date"], u["merchant"]))
+
+    items = [
+        {
+            "merchant": row.merchant, "category": row.category, "currency": row.currency,
+            "amount": round(row.amount, 2), "period": row.period,
+            "interval_days": round(row.interval_days, 1), "occurrences": int(row.occurrences),
+            "first": row.first, "last": row.last, "confidence": round(row.confidence, 2),
+            "active": bool(row.active),
+        }
+        for row in series.itertuples()
+    ]
+    return {
+        "as_of": start.strftime("%Y-%m-%d"),
+        "horizon_days": horizon,
+        "currency": target,
+        "monthly_committed": round(float(-monthly[active & (monthly < 0)].sum()), 2),
+        "monthly_income": round(float(monthly[active & (monthly > 0)].sum()), 2),
+        "missing_rates": sorted({c for c in series["currency"].to_numpy()[np.isnan(factor)] if c}),
+        "upcoming": upcoming,
+        "series": items,
+    }
@@ -1,33 +1,85 @@
+"""
+Run_Server.py
+-------------
+Avvio del backend FastAPI.
+
+    python Run_Server.py                      # sviluppo: 1 processo con --reload
+    python Run_Server.py --prod               # produzione: un worker per core
+    python Run_Server.py --prod --workers 4 --host 0.0.0.0 --port 8000
+
+In produzione uvicorn fa da supervisore dei worker:
+- kill -HUP <pid>   riavvio graceful, un worker alla volta (il nuovo entra in
+                    servizio prima che il vecchio venga fermato)
+- kill -TTIN / -TTOU <pid>   un worker in più / in meno
+- kill -TERM <pid>  arresto: le richieste in corso hanno GRACEFUL_TIMEOUT secondi
+
+Ogni worker apre il proprio pool SQLite e scalda le cache in background;
+/healthz risponde subito, /readyz solo quando il worker è pronto.
+"""
+
+import argparse
 import os
+import socket
 import subprocess
+import sys
 from pathlib import Path
 
-port = 8000
-
 # Percorso alla cartella corrente (App/)
 APP_DIR = Path(__file__).resolve().parent
-PYTHON_PATH = "/opt/miniconda3/bin/python"  # il tuo interprete Conda
-
-print(f"🌐 Starting FastAPI server on port {port}...")
-
-# 1️⃣ Libera la porta se è già occupata
-result = subprocess.run(["lsof", "-ti", f":{port}"], capture_output=True, text=True)
-if result.stdout.strip():
-    pids = result.stdout.strip().split("\n")
-    for pid in pids:
-        os.system(f"kill -9 {pid}")
-    print(f"✅ Freed port {port} (killed process {', '.join(pids)})")
-else:
-    print(f"ℹ️  Port {port} was already free.")
-
-# 2️⃣ Avvia uvicorn nella stessa cartella del file
-try:
-    subprocess.run(
-        [PYTHON_PATH, "-m", "uvicorn", "Main:app", "--reload", "--port", str(port)],
-        cwd=APP_DIR,  # 👈 Esegui uvicorn dentro App/
-        check=True
-    )
-except KeyboardInterrupt:
-    print("\n🛑 Server stopped manually.")
-except Exception as e:
-    print(f"❌ Failed to start server: {e}")
+GRACEFUL_TIMEOUT = 30  # secondi per chiudere le richieste in corso
+
+
+def port_in_use(host: str, port: int) -> bool:
+    probe = "127.0.0.1" if host in ("0.0.0.0", "") else host
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(0.5)
+        return s.connect_ex((probe, port)) == 0
+
+
+def uvicorn_command(host: str, port: int, prod: bool, workers: int) -> list:
+    cmd = [sys.executable, "-m", "uvicorn", "Main:app", "--host", host, "--port", str(port)]
+    if prod:
+        cmd += ["--workers", str(workers), "--timeout-graceful-shutdown", str(GRACEFUL_TIMEOUT),
+                "--no-access-log"]
+    else:
+        cmd += ["--reload"]
+    return cmd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start the FinNLP API")
+    parser.add_argument("--prod", action="store_true", help="multi-worker, no reload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes in --prod mode (default: CPU cores)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    # 1️⃣ Porta occupata → non uccidiamo nessuno, lo segnaliamo e usciamo
+    if port_in_use(args.host, args.port):
+        print(f"❌ Port {args.port} is already in use. Stop the other server "
+              f"(e.g. `lsof -ti :{args.port}`) or pick another --port.")
+        sys.exit(1)
+
+    cmd = uvicorn_command(args.host, args.port, args.prod, args.workers)
+    mode = f"{args.workers} workers" if args.prod else "dev, --reload"
+    print(f"🌐 Starting FastAPI server on {args.host}:{args.port} ({mode})...")
+
+    # 2️⃣ Produzione: uvicorn prende il posto di questo processo (stesso pid),
+    #    così i segnali HUP/TERM arrivano direttamente al supervisore
+    if args.prod:
+        print(f"ℹ️  Graceful restart: kill -HUP {os.getpid()}")
+        os.chdir(APP_DIR)
+        os.execv(sys.executable, cmd)
+
+    # 3️⃣ Sviluppo: uvicorn nella cartella App/ con autoreload
+    try:
+        subprocess.run(cmd, cwd=APP_DIR, check=True)
+    except KeyboardInterrupt:
+        print("\n🛑 Server stopped manually.")
+    except Exception as e:
+        print(f"❌ Failed to start server: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Search.py
+---------
+Builds parameterized WHERE clauses for /transactions/filter.
+
+- substring: trigram FTS5 index (`transactions_fts`), falls back to an
+  escaped LIKE for terms shorter than 3 characters (no trigram to match)
+- exact:     `col = ? COLLATE NOCASE` on the B-tree indexes
+- prefix:    NOCASE range scan on the same B-tree indexes
+"""
+
+MODES = ("substring", "exact", "prefix")
+TRIGRAM = 3
+
+
+def _fts_phrase(column: str, term: str) -> str:
+    # Column filter + quoted phrase: with the trigram tokenizer a phrase
+    # matches anywhere inside the column value.
+    return f'{column} : "{term.replace(chr(34), chr(34) * 2)}"'
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix_bounds(term: str) -> tuple[str, str]:
+    # NOCASE folds ASCII to lower case, so compare against lower-cased bounds
+    low = term.lower()
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
+
+
+def build_filter(fields: dict, mode: str = "substring") -> tuple[str, list]:
+    """
+    Turn {column: term} into a (where_sql, params) pair.
+    `description` is always searched by substring; `mode` applies to the others.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {MODES}")
+
+    clauses, params, fts = [], [], []
+    for column, term in fields.items():
+        if not term:
+            continue
+        col_mode = "substring" if column == "description" else mode
+        if col_mode == "exact":
+            clauses.append(f"{column} = ? COLLATE NOCASE")
+            params.append(term)
+        elif col_mode == "prefix":
+            low, high = _prefix_bounds(term)
+            clauses.append(f"{column} >= ? COLLATE NOCASE AND {column} < ? COLLATE NOCASE")
+            params += [low, high]
+        elif len(term) >= TRIGRAM:
+            fts.append(_fts_phrase(column, term))
+        else:
+            clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(f"%{_like_escape(term)}%")
+
+    if fts:
+        clauses.insert(0, "rowid IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?)")
+        params.insert(0, " AND ".join(fts))
+    where = " AND ".join(clauses) if clauses else "1=1"
+    return where, params
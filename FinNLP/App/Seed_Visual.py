@@ -2,43 +2,39 @@
 seed.py
 -------
 Reads the synthetic_transactions.csv file
-and loads it into a local SQLite database (finllm.db)
+and loads it into a local SQLite database (finllm.db) via Bulk_Loader
 """
 
-import sqlite3
 import pandas as pd
 from pathlib import Path
 
+from Bulk_Loader import bulk_load
+from Database import DB_PATH
+from FX import FX_PATH, load_rates
+
 # Base directories
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR.parent / "Data"
 
-# Paths to the CSV and database
+# Path to the CSV (the database path comes from Database.DB_PATH)
 CSV_PATH = DATA_DIR / "synthetic_transactions.csv"
-DB_PATH = DATA_DIR / "finllm.db"
 
 
-def seed_database():
-    """Load data from CSV into SQLite database."""
+def seed_database(resume=True):
+    """Load data from CSV into SQLite database (chunked upsert by id, resumable)."""
     # Check if the CSV file exists
     if not CSV_PATH.exists():
         raise FileNotFoundError(f"❌ CSV file not found: {CSV_PATH}")
 
     print("📥 Loading CSV data...")
-    df = pd.read_csv(CSV_PATH)
-    print(f"✅ Loaded {len(df)} transactions.")
-
-    # Ensure the database folder exists
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    # Connect (create DB if missing)
-    conn = sqlite3.connect(DB_PATH)
-
-    # Write to a table named 'transactions'
-    df.to_sql("transactions", conn, if_exists="replace", index=False)
-    conn.close()
-
-    print(f"✅ Database seeded successfully → {DB_PATH}")
+    stats = bulk_load(CSV_PATH, resume=resume)
+    print(f"✅ Database seeded successfully → {DB_PATH} ({stats['rows']} rows)")
+
+    if FX_PATH.exists():
+        print(f"💱 Loaded {load_rates(FX_PATH)} FX rates from {FX_PATH.name}")
+    else:
+        print("ℹ️  No FX rates file: conversions use the default rates.")
+    return stats
 
 
 def visualize():
@@ -0,0 +1,202 @@
+"""
+Stats.py
+--------
+Chart data computed over the whole table, so the Dashboard downloads a few
+hundred bytes per chart instead of raw rows.
+
+- histogram():  fixed-width amount bins, counted with one GROUP BY
+- timeseries(): spent / income / count per day, week or month
+- breakdown():  totals per category, merchant, currency, city or country
+
+Every result is memoized with the tenant and data version as part of the
+key, so it is computed once per change to that tenant's `transactions`. Monthly series and unsigned
+per-category / per-currency totals are read from the trigger-maintained
+monthly_rollup. Amounts are summed as stored unless a `target` currency is
+given: then they are converted with the as-of FX rates (see FX.py).
+"""
+
+from functools import lru_cache
+
+import pandas as pd
+
+import FX
+from Database import data_key, pool
+
+SIGNS = {"all": "1=1", "expense": "amount < 0", "income": "amount > 0"}
+CACHE_ENTRIES = 256
+
+# Period label per bucket; weeks are labelled by their Monday
+PERIOD = {
+    "day": "date",
+    "week": "date(date, '-6 days', 'weekday 1')",
+    "month": "substr(date, 1, 7)",
+}
+
+
+def _where(sign: str, currency: str | None, category: str | None = None) -> tuple[str, list]:
+    where, params = [SIGNS[sign]], []
+    if currency:
+        where.append("currency = ?")
+        params.append(currency)
+    if category:
+        where.append("category = ? COLLATE NOCASE")
+        params.append(category)
+    return " AND ".join(where), params
+
+
+def _version() -> tuple[str, int]:
+    with pool.read() as conn:
+        return data_key(conn)
+
+
+# ----------------------------------------------------------
+# HISTOGRAM
+# ----------------------------------------------------------
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _histogram(version: tuple, bins: int, sign: str, currency: str | None) -> dict:
+    where, params = _where(sign, currency)
+    with pool.read() as conn:
+        lo, hi, n = conn.execute(
+            f"SELECT MIN(amount), MAX(amount), COUNT(*) FROM transactions WHERE {where}", params
+        ).fetchone()
+        if not n:
+            return {"bins": bins, "edges": [], "counts": [], "total": 0}
+        width = (hi - lo) / bins or 1.0
+        # bucket index, with the maximum folded into the last bin
+        rows = conn.execute(
+            f"SELECT MIN(CAST((amount - ?) / ? AS INTEGER), ?) AS b, COUNT(*) "
+            f"FROM transactions WHERE {where} GROUP BY b",
+            [lo, width, bins - 1, *params],
+        ).fetchall()
+    counts = [0] * bins
+    for b, c in rows:
+        counts[b] = c
+    edges = [round(lo + i * width, 2) for i in range(bins + 1)]
+    return {"bins": bins, "edges": edges, "counts": counts, "total": n}
+
+
+def histogram(bins: int = 30, sign: str = "all", currency: str | None = None) -> dict:
+    """`bins` equal-width amount bins: edges (bins + 1 values) and counts."""
+    return _histogram(_version(), bins, sign, currency)
+
+
+# ----------------------------------------------------------
+# TIME SERIES
+# ----------------------------------------------------------
+def _converted_series(bucket: str, currency: str | None, category: str | None, target: str) -> list:
+    frame = FX.converted("category" if category else None, target)
+    frame = frame[frame["converted"]]
+    if currency:
+        frame = frame[frame["currency"] == currency]
+    if category:
+        frame = frame[frame["key"].str.lower() == category.lower()]
+    dates = pd.to_datetime(frame["date"])
+    period = {
+        "day": frame["date"],
+        "week": (dates - pd.to_timedelta(dates.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d"),
+        "month": frame["date"].str[:7],
+    }[bucket]
+    grouped = frame.groupby(period)[["spent", "income", "n"]].sum().sort_index()
+    return list(grouped.itertuples(name=None))
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _timeseries(version: tuple, bucket: str, currency: str | None, category: str | None,
+                target: str | None) -> dict:
+    where, params = _where("all", currency, category)
+    if target:
+        result = _series(bucket, _converted_series(bucket, currency, category, target), target)
+        result["missing_rates"] = FX.missing_rates(FX.converted(None, target))
+        return result
+    with pool.read() as conn:
+        if bucket == "month":
+            rows = conn.execute(
+                "SELECT month, SUM(spent), SUM(income), SUM(n) FROM monthly_rollup "
+                f"WHERE n > 0 AND {where} GROUP BY month ORDER BY month", params
+            ).fetchall()
+        else:
+            period = PERIOD[bucket]
+            rows = conn.execute(
+                f"SELECT {period} AS p, SUM(MIN(amount, 0)), SUM(MAX(amount, 0)), COUNT(*) "
+                f"FROM transactions WHERE {where} GROUP BY p ORDER BY p", params
+            ).fetchall()
+    return _series(bucket, rows, None)
+
+
+def _series(bucket: str, rows, target: str | None) -> dict:
+    return {
+        "bucket": bucket,
+        "currency": target,
+        "points": [
+            {"period": p, "spent": round(spent, 2), "income": round(income, 2), "transactions": int(n)}
+            for p, spent, income, n in rows
+        ],
+    }
+
+
+def timeseries(bucket: str = "month", currency: str | None = None,
+               category: str | None = None, target: str | None = None) -> dict:
+    """Spent (negative), income and count per `bucket` (day | week | month)."""
+    return _timeseries(_version(), bucket, currency, category, target and target.upper())
+
+
+# ----------------------------------------------------------
+# BREAKDOWN
+# ----------------------------------------------------------
+def _converted_groups(by: str, sign: str, currency: str | None, target: str) -> list:
+    frame = FX.converted(by, target)
+    frame = frame[frame["converted"]]
+    if currency:
+        frame = frame[frame["currency"] == currency]
+    value = {"all": ["spent", "income"], "expense": ["spent"], "income": ["income"]}[sign]
+    count = {"all": "n", "expense": "n_spent", "income": "n_income"}[sign]
+    grouped = frame.groupby("key", dropna=False)[["spent", "income", count]].sum()
+    grouped = grouped[grouped[count] > 0]
+    totals = grouped[value].sum(axis=1)
+    return [(None if pd.isna(k) else k, float(t), int(n))
+            for k, t, n in zip(grouped.index, totals, grouped[count])]
+
+
+@lru_cache(maxsize=CACHE_ENTRIES)
+def _breakdown(version: tuple, by: str, sign: str, limit: int, currency: str | None,
+               target: str | None) -> dict:
+    if target:
+        rows = _converted_groups(by, sign, currency, target)
+    elif by in ("category", "currency") and sign == "all":
+        # the rollup stores NULL keys as ''
+        where, params = ("n > 0 AND currency = ?", [currency]) if currency else ("n > 0", [])
+        with pool.read() as conn:
+            rows = conn.execute(
+                f"SELECT NULLIF({by}, ''), SUM(spent + income), SUM(n) FROM monthly_rollup "
+                f"WHERE {where} GROUP BY {by}", params
+            ).fetchall()
+    else:
+        where, params = _where(sign, currency)
+        with pool.read() as conn:
+            rows = conn.execute(
+                f"SELECT {by}, SUM(amount), COUNT(*) FROM transactions WHERE {where} GROUP BY {by}",
+                params,
+            ).fetchall()
+    rows.sort(key=lambda r: abs(r[1] or 0), reverse=True)
+    items = [{"key": k, "total": round(t, 2), "transactions": n} for k, t, n in rows[:limit]]
+    rest = rows[limit:]
+    other = None
+    if rest:
+        other = {"groups": len(rest), "total": round(sum(t for _, t, _ in rest), 2),
+                 "transactions": sum(n for _, _, n in rest)}
+    result = {"by": by, "sign": sign, "currency": target, "items": items, "other": other}
+    if target:
+        result["missing_rates"] = FX.missing_rates(FX.converted(by, target))
+    return result
+
+
+def breakdown(by: str = "category", sign: str = "expense", limit: int = 20,
+              currency: str | None = None, target: str | None = None) -> dict:
+    """Totals per `by` value, largest first; the groups beyond `limit` summed into `other`."""
+    return _breakdown(_version(), by, sign, limit, currency, target and target.upper())
+
+
+def cache_info() -> dict:
+    return {name: fn.cache_info()._asdict()
+            for name, fn in (("histogram", _histogram), ("timeseries", _timeseries),
+                             ("breakdown", _breakdown))}
@@ -0,0 +1,81 @@
+"""
+Stub_LLM.py
+-----------
+Local stand-in for the OpenAI chat-completions endpoint, for tests and
+benchmarks (no API key, no cost).
+
+    uvicorn Stub_LLM:app --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python Run_Server.py
+
+STUB_LLM_DELAY_MS sets the simulated generation time.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DELAY_MS = float(os.environ.get("STUB_LLM_DELAY_MS", 200))
+
+app = FastAPI(title="FinNLP stub LLM")
+calls = {"count": 0}
+
+
+def _answer(prompt: str) -> str:
+    return f"Stub answer ({len(prompt)} prompt chars): your finances look stable."
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    calls["count"] += 1
+    prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+    text = _answer(prompt)
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, prompt, text), media_type="text/event-stream")
+    await asyncio.sleep(DELAY_MS / 1000)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        },
+    }
+
+
+async def _stream(body: dict, prompt: str, text: str):
+    # Same total delay as the non-streaming path, spread over the tokens
+    words = text.split(" ")
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get("model", "stub")}
+    for i, word in enumerate(words):
+        await asyncio.sleep(DELAY_MS / 1000 / len(words))
+        delta = {"content": word if i == 0 else " " + word}
+        chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    done = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    yield f"data: {json.dumps(done)}\n\n"
+    if body.get("stream_options", {}).get("include_usage"):
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                 "total_tokens": (len(prompt) + len(text)) // 4}
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stub/calls")
+def stub_calls():
+    return calls
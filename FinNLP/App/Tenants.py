@@ -0,0 +1,97 @@
+"""
+Tenants.py
+----------
+Tenant resolution for the API and shard management from the command line.
+
+Every request may carry `X-Tenant-ID: <tenant>` (lowercase letters, digits,
+'-' and '_'). TenantMiddleware (pure ASGI) sets Database.current_tenant for
+the request, so every pool.read() / pool.write() underneath goes to that
+tenant's shard. Without the header the default database is used. The
+header is trusted as is: put the API behind a gateway that authenticates
+users and sets it.
+
+    python Tenants.py create acme [--seed transactions.csv]
+    python Tenants.py list
+"""
+
+import json
+
+from Database import DEFAULT_TENANT, TENANT_ID, UnknownTenant, current_tenant, router
+
+HEADER = b"x-tenant-id"
+# process-level routes: answered whatever the header says
+EXEMPT_PATHS = ("/healthz", "/readyz", "/metrics")
+
+
+class TenantMiddleware:
+    def __init__(self, app, exempt: tuple = EXEMPT_PATHS):
+        self.app = app
+        self.exempt = exempt
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        raw = dict(scope["headers"]).get(HEADER)
+        tenant = raw.decode("latin-1").strip().lower() if raw else DEFAULT_TENANT
+        if tenant != DEFAULT_TENANT and not TENANT_ID.fullmatch(tenant):
+            await _error(send, 400, "Invalid X-Tenant-ID: use 1-63 lowercase letters, digits, '-' or '_'.")
+            return
+        if not (router.autocreate or router.exists(tenant)):
+            await _error(send, 404, f"Unknown tenant '{tenant}'")
+            return
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+async def _error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create(tenant: str, seed: str | None = None) -> dict:
+    """Create (or open) a tenant's shard, load the FX rates and optionally seed transactions."""
+    import FX
+    from Bulk_Loader import bulk_load
+
+    if not TENANT_ID.fullmatch(tenant):
+        raise ValueError(f"Invalid tenant id '{tenant}'")
+    shard = router.get(tenant, create=True)
+    token = current_tenant.set(tenant)
+    try:
+        rates = FX.load_rates(db_pool=shard) if FX.FX_PATH.exists() else 0
+        loaded = bulk_load(seed, db_pool=shard) if seed else None
+    finally:
+        current_tenant.reset(token)
+    return {"tenant": tenant, "path": str(shard.path), "fx_rates": rates, "seed": loaded}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage tenant shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser("create", help="create a tenant shard")
+    create_parser.add_argument("tenant")
+    create_parser.add_argument("--seed", help="CSV or Parquet file to bulk-load")
+    commands.add_parser("list", help="list tenants with a shard")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "create":
+            print(f"✅ {create(args.tenant, args.seed)}")
+        else:
+            print("\n".join(router.tenants()))
+    except (ValueError, UnknownTenant) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    finally:
+        router.close()
@@ -0,0 +1,58 @@
+"""
+Datasets.py
+-----------
+Synthetic benchmark databases, one file per size, built with the vectorized
+generator and the bulk loader. A database is rebuilt only if missing (or
+with rebuild=True), so every run of a given size reads the same data.
+"""
+
+import re
+import time
+
+from Benchmarks import DATA_DIR
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+
+
+def parse_size(label: str) -> int:
+    """'1k' → 1000, '2.5M' → 2500000, '5000' → 5000."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", label.strip())
+    if not m:
+        raise ValueError(f"Invalid size '{label}' (use e.g. 1k, 100k, 1M)")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[m.group(2).lower()]
+    return int(float(m.group(1)) * scale)
+
+
+def db_path(rows: int):
+    return DATA_DIR / f"bench_{rows}.db"
+
+
+def build(rows: int, rebuild: bool = False, seed: int = 42) -> dict:
+    """Create (or reuse) the database with `rows` transactions. Returns its path and build time."""
+    from Bulk_Loader import bulk_load
+    from Database import ConnectionPool
+    from Dataset_Generator import generate_dataset_fast
+
+    path = db_path(rows)
+    if path.exists() and not rebuild:
+        return {"rows": rows, "path": str(path), "built": False, "seconds": 0.0}
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    for stale in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+        stale.unlink(missing_ok=True)
+    try:
+        import pyarrow  # noqa: F401
+        source = DATA_DIR / f"bench_{rows}.parquet"
+    except ImportError:
+        source = DATA_DIR / f"bench_{rows}.csv"
+
+    start = time.perf_counter()
+    generate_dataset_fast(rows, str(source), chunk_size=min(rows, 250_000), seed=seed)
+    db_pool = ConnectionPool(path)
+    try:
+        bulk_load(source, db_pool=db_pool, resume=False)
+    finally:
+        db_pool.close()
+        source.unlink(missing_ok=True)
+    return {"rows": rows, "path": str(path), "built": True,
+            "seconds": round(time.perf_counter() - start, 3)}
@@ -0,0 +1,215 @@
+"""
+Load_Driver.py
+--------------
+Closed-loop load generator: `concurrency` clients each send the next request
+of a scenario as soon as their previous one completes, until `requests`
+have been sent. Latency is measured per request on the client side.
+
+Two transports:
+- asgi:   Main.app in this process via httpx.ASGITransport (no network;
+          the process must be started with the FINNLP_* env already set,
+          see run_asgi_subprocess)
+- socket: a real uvicorn server in a child process, over TCP
+"""
+
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from Benchmarks import APP_DIR, BENCH_DIR
+from Benchmarks.Report import summarize
+
+FILTER_TERMS = ("lon", "uber", "tesco", "coffee", "amazon", "net", "air", "fee")
+
+# name -> function(i) returning (method, url, json body | None)
+SCENARIOS = {
+    "transactions": lambda i: ("GET", "/transactions?limit=50", None),
+    "filter": lambda i: ("GET", f"/transactions/filter?q={FILTER_TERMS[i % len(FILTER_TERMS)]}&limit=50", None),
+    "insights": lambda i: ("GET", "/insights", None),
+    # open-ended + unique → never answered locally or from the LLM cache
+    "ai_question": lambda i: ("POST", "/ai/question",
+                              {"question": f"Why did my spending change? (bench {i})", "api_key": "sk-bench"}),
+    # same prompt every time → served from the LLM cache after the first call
+    "ai_report": lambda i: ("POST", "/ai/report", {"limit": 50, "api_key": "sk-bench"}),
+}
+
+
+# ----------------------------------------------------------
+# LOAD
+# ----------------------------------------------------------
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int,
+                       requests: int, warmup: int = 10) -> dict:
+    build = SCENARIOS[name]
+    for i in range(min(warmup, requests)):
+        method, url, body = build(-1 - i)
+        await client.request(method, url, json=body)
+
+    latencies, errors = [], 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            method, url, body = build(i)
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, url, json=body)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_all(client: httpx.AsyncClient, scenarios: list, concurrency: int, requests: int) -> dict:
+    return {name: await run_scenario(client, name, concurrency, requests) for name in scenarios}
+
+
+def _descendants(pid: int) -> list[int]:
+    """`pid` and every process below it (Linux /proc), e.g. a uvicorn supervisor and its workers."""
+    children = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # "pid (comm) state ppid ...": comm may contain spaces, split after the last ')'
+            ppid = int(stat.read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(stat.parent.name))
+    found, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        found.append(current)
+        queue.extend(children.get(current, []))
+    return found
+
+
+def _vm_hwm_kib(pid: int) -> int | None:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb(pid: int | None = None) -> float | None:
+    """
+    Peak resident set size of this process, or of `pid` plus all its
+    descendants (Linux /proc): with --workers > 1 the requests are served by
+    the supervisor's children. Per-process peaks are summed, so pages shared
+    between workers are counted once per worker (an upper bound).
+    """
+    if pid is None:
+        kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kib / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    peaks = [kib for kib in map(_vm_hwm_kib, _descendants(pid)) if kib is not None]
+    return round(sum(peaks) / 1024, 1) if peaks else None
+
+
+# ----------------------------------------------------------
+# PROCESSES
+# ----------------------------------------------------------
+def app_env(db: str, llm_url: str, workdir: str) -> dict:
+    """Environment for an API process: benchmark DB, stub LLM, throwaway caches."""
+    return {
+        **os.environ,
+        "FINNLP_DB_PATH": db,
+        "OPENAI_BASE_URL": llm_url,
+        "FINNLP_LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.db"),
+        "FINNLP_JOBS_PATH": os.path.join(workdir, "jobs.db"),
+    }
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def start_server(module: str, port: int, env: dict | None = None, workers: int = 1) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port),
+           "--log-level", "warning", "--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env or os.environ.copy())
+    wait_ready(f"http://127.0.0.1:{port}/")
+    return proc
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def run_socket(db: str, llm_url: str, scenarios: list, concurrency: int, requests: int,
+               port: int = 8765, workers: int = 1) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server("Main", port, app_env(db, llm_url, workdir), workers)
+        try:
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+            async def main():
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                             timeout=120) as client:
+                    return await run_all(client, scenarios, concurrency, requests)
+
+            results = asyncio.run(main())
+            rss = peak_rss_mb(server.pid)
+        finally:
+            stop_server(server)
+    return {"scenarios": results, "peak_rss_mb": rss, "workers": workers}
+
+
+def run_asgi_subprocess(db: str, llm_url: str, scenarios: list, concurrency: int, requests: int) -> dict:
+    """In-process run in a fresh interpreter (the app reads its config at import)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        cmd = [sys.executable, "-m", "Benchmarks.Load_Driver", "--scenarios", ",".join(scenarios),
+               "--concurrency", str(concurrency), "--requests", str(requests)]
+        out = subprocess.run(cmd, cwd=BENCH_DIR.parent, env=app_env(db, llm_url, workdir),
+                             capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+async def _asgi_main(scenarios: list, concurrency: int, requests: int) -> dict:
+    import Main
+
+    async with Main.app.router.lifespan_context(Main.app):
+        transport = httpx.ASGITransport(app=Main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            results = await run_all(client, scenarios, concurrency, requests)
+    return {"scenarios": results, "peak_rss_mb": peak_rss_mb()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="In-process (ASGI) benchmark worker")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    result = asyncio.run(_asgi_main(args.scenarios.split(","), args.concurrency, args.requests))
+    print(json.dumps(result))
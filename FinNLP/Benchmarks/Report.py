@@ -0,0 +1,92 @@
+"""
+Report.py
+---------
+Latency summaries, JSON results and regression checks between runs.
+
+A result file holds one entry per (size, mode, scenario); compare() matches
+entries by that key and flags a regression when p95 latency grows, or
+throughput drops, by more than the threshold.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+
+from Benchmarks import BENCH_DIR
+
+
+def summarize(latencies: list, seconds: float, errors: int) -> dict:
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(ms.mean()), 2) if len(ms) else 0.0,
+        "max_ms": round(float(ms.max()), 2) if len(ms) else 0.0,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write(results: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+
+
+def _entries(results: dict):
+    for run in results["runs"]:
+        for name, stats in run["scenarios"].items():
+            yield (run["rows"], run["mode"], name), stats
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10) -> list[dict]:
+    """Entries whose p95 grew, or throughput fell, by more than `threshold` (fraction)."""
+    base = dict(_entries(baseline))
+    regressions = []
+    for key, stats in _entries(current):
+        old = base.get(key)
+        if old is None:
+            continue
+        for metric, worse in (("p95_ms", stats["p95_ms"] > old["p95_ms"] * (1 + threshold)),
+                              ("throughput_rps", stats["throughput_rps"] < old["throughput_rps"] * (1 - threshold))):
+            if worse and old[metric]:
+                regressions.append({
+                    "rows": key[0], "mode": key[1], "scenario": key[2], "metric": metric,
+                    "baseline": old[metric], "current": stats[metric],
+                    "change": round(stats[metric] / old[metric] - 1, 3),
+                })
+    return regressions
+
+
+def print_table(results: dict):
+    header = f"{'rows':>10} {'mode':<7} {'scenario':<13} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for run in results["runs"]:
+        for name, s in run["scenarios"].items():
+            print(f"{run['rows']:>10,} {run['mode']:<7} {name:<13} {s['throughput_rps']:>9,.1f} "
+                  f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['errors']:>5}")
+        print(f"{'':>10} {run['mode']:<7} peak RSS: {run.get('peak_rss_mb')} MB")
@@ -0,0 +1,32 @@
+"""
+Benchmarks
+----------
+Reproducible load and latency benchmarks for the FinNLP API.
+
+    cd FinNLP
+    python -m Benchmarks --sizes 1k,100k --modes asgi,socket --concurrency 16
+    python -m Benchmarks --sizes 1M --baseline Benchmarks/results/previous.json
+
+- Datasets.py:    synthetic databases at 1k / 100k / 1M / 10M rows
+                  (Dataset_Generator → Bulk_Loader), built once and reused
+- Load_Driver.py: closed-loop load with N concurrent clients, either
+                  in-process through httpx.ASGITransport or over a real
+                  socket against a uvicorn server
+- Report.py:      throughput, p50/p95/p99, peak RSS; JSON results and a
+                  comparison against a baseline run that flags regressions
+
+AI routes are pointed at Stub_LLM.py, so runs need no API key and are
+not affected by network latency.
+"""
+
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent / "App"
+DATA_DIR = BENCH_DIR / "data"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# The app modules are imported by name (as Run_Server does from App/)
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
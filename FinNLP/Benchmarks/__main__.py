@@ -0,0 +1,89 @@
+"""
+python -m Benchmarks  (run from the FinNLP/ folder)
+
+Builds the requested database sizes, starts the stub LLM once, runs every
+scenario in each mode and writes Benchmarks/results/<timestamp>.json.
+With --baseline, regressions against that file are printed and the exit
+status is 1 if there are any.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from Benchmarks import RESULTS_DIR, Datasets
+from Benchmarks.Load_Driver import SCENARIOS, run_asgi_subprocess, run_socket, start_server, stop_server
+from Benchmarks.Report import compare, environment, print_table, write
+
+STUB_PORT = 8766
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="FinNLP API load and latency benchmarks")
+    parser.add_argument("--sizes", default="1k,100k", help="comma-separated: 1k,100k,1M,10M")
+    parser.add_argument("--modes", default="asgi,socket", help="asgi (in-process) and/or socket")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers in socket mode")
+    parser.add_argument("--llm-delay-ms", type=float, default=200, help="stub LLM generation time")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the databases")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None, help="previous result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {
+        "environment": environment(),
+        "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "datasets": [],
+        "runs": [],
+    }
+    stub = start_server("Stub_LLM", STUB_PORT,
+                        {**os.environ, "STUB_LLM_DELAY_MS": str(args.llm_delay_ms)})
+    llm_url = f"http://127.0.0.1:{STUB_PORT}/v1"
+    try:
+        for label in args.sizes.split(","):
+            rows = Datasets.parse_size(label)
+            print(f"📦 Dataset {rows:,} rows...")
+            dataset = Datasets.build(rows, rebuild=args.rebuild)
+            results["datasets"].append(dataset)
+            for mode in args.modes.split(","):
+                print(f"🏁 {rows:,} rows, {mode}, concurrency {args.concurrency}")
+                if mode == "asgi":
+                    run = run_asgi_subprocess(dataset["path"], llm_url, scenarios,
+                                              args.concurrency, args.requests)
+                elif mode == "socket":
+                    run = run_socket(dataset["path"], llm_url, scenarios, args.concurrency,
+                                     args.requests, workers=args.workers)
+                else:
+                    parser.error(f"unknown mode '{mode}'")
+                results["runs"].append({"rows": rows, "mode": mode, **run})
+    finally:
+        stop_server(stub)
+
+    out = args.out or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    print_table(results)
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        results["regressions"] = regressions
+        for r in regressions:
+            print(f"⚠️  {r['rows']:,} {r['mode']} {r['scenario']}: {r['metric']} "
+                  f"{r['baseline']} → {r['current']} ({r['change']:+.0%})")
+        if not regressions:
+            print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline.name}")
+    write(results, out)
+    print(f"📝 Results → {out}")
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
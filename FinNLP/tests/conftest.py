@@ -0,0 +1,68 @@
+"""
+conftest.py
+-----------
+Shared fixtures. Every database file lives in a temporary directory (set
+before the App modules are imported), and each test gets its own empty
+tenant shard, so data versions and the caches keyed on them never leak
+between tests.
+
+    python -m pytest -q FinNLP/tests
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.TemporaryDirectory(prefix="finnlp-tests-")
+for name, file in (("FINNLP_DB_PATH", "finllm.db"), ("FINNLP_JOBS_PATH", "jobs.db"),
+                   ("FINNLP_LLM_CACHE_PATH", "llm_cache.db"), ("FINNLP_TENANT_DIR", "tenants"),
+                   ("FINNLP_MERCHANTS_PATH", "merchants.csv")):
+    os.environ[name] = str(Path(_TMP.name) / file)
+os.environ["FINNLP_ANOMALY_WORKERS"] = "1"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "App"))
+
+from Database import COLUMNS, current_tenant, router  # noqa: E402
+
+_tenants = itertools.count()
+
+
+@pytest.fixture
+def db():
+    """Empty shard of a new tenant, made the current tenant for the test."""
+    tenant = f"test-{next(_tenants)}"
+    token = current_tenant.set(tenant)
+    shard = router.get(tenant, create=True)
+    try:
+        yield shard
+    finally:
+        current_tenant.reset(token)
+        shard.close()
+
+
+@pytest.fixture
+def client(db):
+    """TestClient over the API (lifespan included), sending the test's tenant."""
+    from fastapi.testclient import TestClient
+
+    import Main
+    with TestClient(Main.app, headers={"X-Tenant-ID": current_tenant.get()}) as client:
+        yield client
+
+
+def row(tx_id, date, amount, *, description="", currency="GBP", merchant=None, category=None,
+        city=None, country=None) -> tuple:
+    """One transaction as a tuple in COLUMNS order."""
+    values = {"id": tx_id, "date": date, "description": description, "amount": amount, "currency": currency,
+              "merchant": merchant, "category": category, "city": city, "country": country}
+    return tuple(values[c] for c in COLUMNS)
+
+
+def insert(shard, rows: list):
+    """Plain INSERTs: the row triggers maintain the derived tables."""
+    with shard.write() as conn:
+        conn.executemany(f"INSERT INTO transactions ({', '.join(COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
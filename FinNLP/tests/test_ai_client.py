@@ -0,0 +1,167 @@
+"""Coalescing, concurrency limits and cancellation of AIClient, against the in-process Stub_LLM."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import Stub_LLM
+from AI_Client import AIClient
+
+MODEL = "gpt-4o-mini"
+DELAY = 0.05
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(Stub_LLM, "DELAY_MS", DELAY * 1000)
+    monkeypatch.setitem(Stub_LLM.calls, "count", 0)
+    return Stub_LLM.calls
+
+
+def run(coro_fn, transport=None, **limits):
+    """Run coro_fn(client) on a fresh AIClient whose HTTP pool talks to Stub_LLM.app in-process."""
+    async def main():
+        client = AIClient(base_url="http://stub/v1", max_retries=0, **limits)
+        client._http = httpx.AsyncClient(transport=transport or httpx.ASGITransport(app=Stub_LLM.app))
+        try:
+            return await coro_fn(client), client.stats()
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_identical_prompts_share_one_call(stub):
+    async def ask(client):
+        return await asyncio.gather(*(client.complete("key", "same prompt", MODEL) for _ in range(5)))
+
+    answers, stats = run(ask)
+    assert len(set(answers)) == 1 and answers[0].startswith("Stub answer")
+    assert (stats["requests"], stats["upstream_calls"], stats["coalesced"]) == (5, 1, 4)
+    assert stats["in_flight"] == 0
+    assert stub["count"] == 1
+
+
+def test_different_prompts_are_not_coalesced(stub):
+    async def ask(client):
+        return await asyncio.gather(client.complete("key", "prompt one", MODEL),
+                                    client.complete("key", "prompt two", MODEL),
+                                    client.complete("key", "prompt one", "other-model"))
+
+    _, stats = run(ask)
+    assert (stats["upstream_calls"], stats["coalesced"]) == (3, 0)
+    assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+
+
+def test_per_key_limit_queues_calls(stub):
+    async def ask(client):
+        start = time.perf_counter()
+        await asyncio.gather(*(client.complete("key", f"prompt {i}", MODEL) for i in range(6)))
+        return time.perf_counter() - start
+
+    elapsed, stats = run(ask, per_key_limit=2)
+    # 6 calls, 2 at a time: at least 3 rounds of the stub delay
+    assert elapsed >= 3 * DELAY
+    assert stats["queue_time_max_ms"] >= 1000 * DELAY * 0.9
+    assert (stats["waiting"], stats["active"]) == (0, 0)
+
+
+def test_global_limit_spans_keys(stub):
+    async def ask(client):
+        start = time.perf_counter()
+        await asyncio.gather(*(client.complete(f"key {i}", f"prompt {i}", MODEL) for i in range(4)))
+        return time.perf_counter() - start
+
+    elapsed, stats = run(ask, global_limit=1)
+    assert elapsed >= 4 * DELAY
+    assert stats["clients"] == 4
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call(stub):
+    async def ask(client):
+        first = asyncio.ensure_future(client.complete("key", "prompt", MODEL))
+        second = asyncio.ensure_future(client.complete("key", "prompt", MODEL))
+        await asyncio.sleep(0)
+        first.cancel()
+        return first, await second
+
+    (first, answer), stats = run(ask)
+    assert first.cancelled()
+    assert answer.startswith("Stub answer")
+    assert (stats["upstream_calls"], stats["errors"]) == (1, 0)
+
+
+def test_upstream_errors_reach_every_caller(stub):
+    async def ask(client):
+        return await asyncio.gather(*(client.complete("key", "prompt", MODEL) for _ in range(2)),
+                                    return_exceptions=True)
+
+    def down(request):
+        raise httpx.ConnectError("down", request=request)
+
+    errors, stats = run(ask, transport=httpx.MockTransport(down))
+    assert all(isinstance(e, Exception) for e in errors)
+    assert (stats["upstream_calls"], stats["errors"]) == (1, 2)
+
+
+def test_same_prompt_of_different_keys_is_not_coalesced(stub):
+    async def ask(client):
+        return await asyncio.gather(*(client.complete(key, "same prompt", MODEL) for key in ("key a", "key b")))
+
+    _, stats = run(ask)
+    assert (stats["upstream_calls"], stats["coalesced"]) == (2, 0)
+    # no call holds a key semaphore any more
+    assert stats["keys_active"] == 0
+
+
+def test_a_bad_key_fails_alone(stub):
+    asgi = httpx.ASGITransport(app=Stub_LLM.app)
+
+    class Auth(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if request.headers["authorization"] == "Bearer bad":
+                return httpx.Response(401, json={"error": {"message": "invalid key"}})
+            return await asgi.handle_async_request(request)
+
+    async def ask(client):
+        return await asyncio.gather(client.complete("bad", "prompt", MODEL),
+                                    client.complete("good", "prompt", MODEL), return_exceptions=True)
+
+    (bad, good), stats = run(ask, transport=Auth())
+    assert isinstance(bad, Exception)
+    assert good.startswith("Stub answer")
+    assert (stats["upstream_calls"], stats["errors"]) == (2, 1)
+
+
+def test_stream_response_is_closed_when_the_caller_stops(stub):
+    asgi = httpx.ASGITransport(app=Stub_LLM.app)
+    closed = []
+
+    class Tracked(httpx.AsyncByteStream):
+        def __init__(self, stream):
+            self.stream = stream
+
+        async def __aiter__(self):
+            async for part in self.stream:
+                yield part
+
+        async def aclose(self):
+            closed.append(True)
+            await self.stream.aclose()
+
+    class Tracking(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            response = await asgi.handle_async_request(request)
+            return httpx.Response(response.status_code, headers=response.headers, stream=Tracked(response.stream))
+
+    async def ask(client):
+        deltas = client.stream("key", "a prompt of several words", MODEL)
+        first = await deltas.__anext__()
+        await deltas.aclose()
+        return first, bool(closed)
+
+    (first, closed_on_exit), stats = run(ask, transport=Tracking())
+    assert first
+    assert closed_on_exit
+    assert (stats["active"], stats["errors"]) == (0, 0)
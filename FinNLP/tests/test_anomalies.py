@@ -0,0 +1,140 @@
+"""Histogram median / MAD, robust z-scores and the incremental refresh of Detector."""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import insert, row
+
+import Anomalies
+from Database import write_batch
+from Anomalies import BINS, MIN_MAD_FRACTION, Detector, _bins, _rolling_counts, _window_stats, robust_z
+
+BIN_RATIO = math.exp(Anomalies._STEP)      # ~1.106: width of one bin, relative
+
+
+def _histogram(samples_per_month: list) -> np.ndarray:
+    hist = np.zeros((1, len(samples_per_month), BINS), np.int64)
+    for m, samples in enumerate(samples_per_month):
+        np.add.at(hist[0, m], _bins(np.asarray(samples, dtype=float)), 1)
+    return hist
+
+
+def test_robust_z():
+    assert robust_z(20.0, 10.0, 0.6745) == pytest.approx(10.0)
+    assert robust_z(10.0, 10.0, 1.0) == 0.0
+
+
+def test_window_excludes_current_month():
+    n, _, _ = _window_stats(_histogram([[5.0] * 4, [5.0] * 6, [], []]), window=2)
+    # month m sees months m-2 .. m-1 only
+    assert n[0].tolist() == [0, 4, 10, 6]
+
+
+def test_constant_amount():
+    _, median, mad = _window_stats(_histogram([[50.0] * 30, []]), window=6)
+    assert median[0, 1] == pytest.approx(50.0, rel=BIN_RATIO - 1)
+    # all deviations are 0: the MAD floor applies
+    assert mad[0, 1] == pytest.approx(MIN_MAD_FRACTION * median[0, 1])
+
+
+def test_median_and_mad_close_to_exact():
+    rng = np.random.default_rng(7)
+    months = [rng.lognormal(math.log(40), 0.5, 600) for _ in range(6)] + [[]]
+    n, median, mad = _window_stats(_histogram(months), window=6)
+    window = np.concatenate(months[:6])
+    exact_median = np.median(window)
+    exact_mad = np.median(np.abs(window - exact_median))
+    assert n[0, 6] == 3600
+    # interpolated inside the bin: well under one bin width off
+    assert median[0, 6] == pytest.approx(exact_median, rel=0.02)
+    assert mad[0, 6] == pytest.approx(exact_mad, abs=exact_median * (BIN_RATIO - 1))
+
+
+def test_rolling_counts():
+    counts = np.array([[2, 2, 2, 2, 2, 2, 2, 2, 9]])
+    median, mad = _rolling_counts(counts, window=8)
+    assert median[0, 8] == 2 and mad[0, 8] == 0
+    # week 4: four padded zeros and four 2s before it
+    assert median[0, 4] == 1.0 and mad[0, 4] == 1.0
+
+
+# ----------------------------------------------------------
+# DETECTOR
+# ----------------------------------------------------------
+def _history() -> list:
+    """Six months of 30 Tesco expenses between 18 and 22 (days 1-28, two on the 1st and 2nd)."""
+    return [row(f"h{m}-{i}", f"2025-0{m}-{i % 28 + 1:02d}", -(18.0 + i % 5), merchant="Tesco", category="Groceries")
+            for m in range(1, 7) for i in range(30)]
+
+
+def _full(db) -> Detector:
+    detector = Detector(db)
+    assert detector.refresh()["mode"] == "full"
+    return detector
+
+
+def test_outlier_is_flagged(db):
+    insert(db, _history() + [row("big", "2025-07-02", -500.0, merchant="Tesco", category="Groceries")])
+    detector = _full(db)
+    page = detector.page("amount")
+    assert [item["id"] for item in page["items"]] == ["big"]
+    item = page["items"][0]
+    assert item["amount"] == -500.0          # as stored
+    assert item["merchant_median"] == pytest.approx(-20.0, rel=BIN_RATIO - 1)
+
+
+def test_incremental_matches_full(db):
+    insert(db, _history())
+    detector = _full(db)
+    assert detector.page("amount")["total"] == 0
+    version = detector.version
+
+    insert(db, [row("big", "2025-07-02", -500.0, merchant="Tesco", category="Groceries"),
+                row("new", "2025-07-03", -20.0, merchant="Lidl", category="Groceries"),
+                row("income", "2025-07-03", 900.0, merchant="ACME", category="Income")])
+    state = detector.refresh()
+    assert (state["mode"], state["rows"]) == ("incremental", 2)
+    assert detector.version > version
+    # unchanged data version: no new pass
+    assert detector.refresh() is state
+
+    fresh = _full(db)
+    for key in Anomalies.KEYS:
+        assert list(detector.groups[key]) == list(fresh.groups[key])
+        assert np.array_equal(detector.hist[key], fresh.hist[key])
+        assert np.array_equal(detector.counts[key], fresh.counts[key])
+    pd.testing.assert_frame_equal(detector.amount.reset_index(drop=True), fresh.amount.reset_index(drop=True))
+
+
+@pytest.mark.parametrize("change", [
+    "UPDATE transactions SET amount = -30.0 WHERE id = 'h3-5'",
+    "DELETE FROM transactions WHERE id = 'h3-5'",
+    # count and total unchanged: only the rewrite counter shows these
+    "UPDATE transactions SET date = '2025-06-20' WHERE id = 'h3-5'",
+    "UPDATE transactions SET merchant = 'Lidl' WHERE id = 'h3-5'",
+    "UPDATE transactions SET category = 'Food' WHERE id = 'h3-5'",
+])
+def test_other_changes_force_a_full_pass(db, change):
+    insert(db, _history())
+    detector = _full(db)
+    with db.write() as conn:
+        conn.execute(change)
+    assert detector.refresh()["mode"] == "full"
+    fresh = _full(db)
+    for key in Anomalies.KEYS:
+        assert list(detector.groups[key]) == list(fresh.groups[key])
+        assert np.array_equal(detector.hist[key], fresh.hist[key])
+
+
+def test_batch_writes(db):
+    insert(db, _history())
+    detector = _full(db)
+    with db.write() as conn:
+        write_batch(conn, [row("new", "2025-07-03", -20.0, merchant="Tesco", category="Groceries")])
+    assert detector.refresh()["mode"] == "incremental"
+    # an upsert that replaces an existing row is a rewrite
+    with db.write() as conn:
+        write_batch(conn, [row("h3-5", "2025-03-06", -19.0, merchant="Lidl", category="Groceries")])
+    assert detector.refresh()["mode"] == "full"
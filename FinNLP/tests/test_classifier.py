@@ -0,0 +1,107 @@
+"""Aho-Corasick dictionary matching, fallbacks, memo and fill of Classifier."""
+
+import pandas as pd
+import pytest
+
+from Classifier import MerchantClassifier, normalize
+
+
+@pytest.fixture
+def classifier():
+    return MerchantClassifier()
+
+
+def _labels(classifier, descriptions) -> list:
+    frame = classifier.label(descriptions)
+    return [tuple(None if pd.isna(v) else v for v in r) for r in frame.itertuples(index=False)]
+
+
+def test_normalize():
+    texts = pd.Series(["McDonald's  LEEDS", "Café-Nero*123", "JUST-EAT.CO.UK"])
+    assert normalize(texts).tolist() == ["mcdonalds leeds", "cafe nero 123", "just eat co uk"]
+
+
+@pytest.mark.parametrize("description, expected", [
+    ("Tesco Lake Henrybury", ("Tesco", "Groceries", "dictionary")),
+    ("TESCO STORES 3021", ("Tesco", "Groceries", "dictionary")),
+    ("PAYPAL *NETFLIX", ("Netflix", "Entertainment", "dictionary")),       # longer than PayPal
+    ("JUST-EAT.CO.UK", ("Just Eat", "Food", "dictionary")),
+    ("TFL TRAVEL CH", ("Transport for London", "Transport", "dictionary")),  # alias
+    ("McDonald's Leeds", ("McDonald's", "Food", "dictionary")),
+    ("H&M Oxford St", ("H&M", "Shopping", "dictionary")),
+    ("PUREGYM LTD", ("PureGym", "Health", "dictionary")),
+    ("Pure Gym Bristol", ("PureGym", "Health", "token")),
+    ("JUSTEAT ORDER", ("Just Eat", "Food", "token")),
+    ("COSTA COFFEE 123", (None, "Food", "keyword")),
+    ("random thing", (None, None, None)),
+])
+def test_default_dictionary(classifier, description, expected):
+    assert _labels(classifier, [description]) == [expected]
+
+
+def test_missing_description(classifier):
+    assert _labels(classifier, [None, "Tesco"]) == [(None, None, None), ("Tesco", "Groceries", "dictionary")]
+
+
+def test_longest_match_then_leftmost():
+    classifier = MerchantClassifier({"Energy": ["Shell Energy"], "Fuel": ["Shell"], "A": ["Zara"], "B": ["Lidl"]},
+                                    aliases={})
+    assert _labels(classifier, ["SHELL ENERGY BILL", "SHELL PETROL 12", "ZARA LIDL", "LIDL ZARA"]) == [
+        ("Shell Energy", "Energy", "dictionary"),
+        ("Shell", "Fuel", "dictionary"),
+        ("Zara", "A", "dictionary"),
+        ("Lidl", "B", "dictionary"),
+    ]
+
+
+def test_failure_links():
+    # "north star" is a dead end before "dust": the automaton falls back to "star" and finds "star dust"
+    classifier = MerchantClassifier({"Food": ["North Star Cafe"], "Shopping": ["Star Dust"]}, aliases={})
+    assert _labels(classifier, ["north star dust", "the north star cafe"]) == [
+        ("Star Dust", "Shopping", "dictionary"),
+        ("North Star Cafe", "Food", "dictionary"),
+    ]
+
+
+def test_short_names_are_not_joined():
+    classifier = MerchantClassifier({"Utilities": ["EE"]}, aliases={}, keywords={})
+    assert _labels(classifier, ["E E", "EE TOPUP"]) == [(None, None, None), ("EE", "Utilities", "dictionary")]
+
+
+def test_memo_and_stats(classifier):
+    classifier.label(["Tesco A", "Tesco A", "Uber B"])
+    classifier.label(["Tesco A", "nothing here"])
+    stats = classifier.stats()
+    assert (stats["lines"], stats["distinct"], stats["memo_hits"]) == (5, 4, 1)
+    assert (stats["dictionary"], stats["unmatched"], stats["memo_size"]) == (4, 1, 3)
+
+
+def test_memo_starts_over_when_full():
+    classifier = MerchantClassifier(memo_entries=2)
+    classifier.label(["Tesco A", "Uber B"])
+    classifier.label(["Lidl C"])
+    assert classifier.stats()["memo_size"] == 1
+
+
+def test_fill_only_missing_values(classifier):
+    frame = pd.DataFrame({
+        "description": ["TESCO STORES 3021", "UBER TRIP", "nothing", None],
+        "merchant": [None, "Uber", None, "Netflix"],
+        "category": ["Food", None, None, None],
+    })
+    assert classifier.fill(frame) == {"classified": 3, "unmatched": 1}
+    frame = frame.astype(object).where(frame.notna(), None)
+    assert frame["merchant"].tolist() == ["Tesco", "Uber", None, "Netflix"]
+    # an existing category is kept; the merchant, when present, is what gets classified
+    assert frame["category"].tolist() == ["Food", "Transport", None, "Entertainment"]
+
+
+def test_from_csv(tmp_path):
+    path = tmp_path / "merchants.csv"
+    path.write_text("merchant,category,aliases\nCorner Shop,Groceries,CSHOP|Corner Shp\nBusCo,Transport,\n")
+    classifier = MerchantClassifier.from_csv(path)
+    assert _labels(classifier, ["CSHOP 22", "corner shp", "BUSCO 7"]) == [
+        ("Corner Shop", "Groceries", "dictionary"),
+        ("Corner Shop", "Groceries", "dictionary"),
+        ("BusCo", "Transport", "dictionary"),
+    ]
@@ -0,0 +1,88 @@
+"""Read-only pooled readers, the serialized writer and pool accounting."""
+
+import sqlite3
+import threading
+
+import pytest
+
+import Database
+from Database import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(tmp_path / "pool.db", size=2)
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    yield pool
+    pool.close()
+
+
+def test_readers_are_read_only(pool):
+    with pool.read() as conn, pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO t VALUES (1)")
+
+
+def test_readers_see_committed_writes(pool):
+    with pool.write() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pool.read() as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+
+
+def test_failed_write_is_rolled_back(pool):
+    with pytest.raises(ZeroDivisionError), pool.write() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+        1 / 0
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+
+
+def test_connections_are_reused(pool):
+    with pool.read() as first:
+        pass
+    with pool.read() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats["readers_created"], stats["readers_idle"], stats["checkouts"]) == (1, 1, 2)
+
+
+def test_pool_is_bounded(pool):
+    held = [pool._acquire() for _ in range(pool.size)]
+    borrowed = threading.Event()
+
+    def reader():
+        with pool.read():
+            borrowed.set()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    # no third connection is opened: the reader waits for one to come back
+    assert not borrowed.wait(0.2)
+    assert pool.stats()["readers_created"] == 2
+    for conn in held:
+        pool._idle.put(conn)
+    thread.join(5)
+    assert borrowed.is_set()
+    assert pool.stats()["waits"] == 1
+
+
+def test_wait_times_out(pool, monkeypatch):
+    monkeypatch.setattr(Database, "READ_TIMEOUT", 0.05)
+    held = [pool._acquire() for _ in range(pool.size)]
+    try:
+        with pytest.raises(TimeoutError), pool.read():
+            pass
+    finally:
+        for conn in held:
+            pool._idle.put(conn)
+
+
+def test_close_and_reopen(pool):
+    with pool.read():
+        pass
+    pool.close()
+    assert pool.stats()["readers_created"] == 0 and not pool.is_open
+    with pool.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+    assert pool.is_open
@@ -0,0 +1,234 @@
+"""
+Derived tables (insights_summary, category_counts, merchant_counts,
+monthly_rollup, daily_rollup, transactions_fts) hold the same data whether the row triggers
+or write_batch maintained them, and both match a full REBUILD.
+"""
+
+import sqlite3
+
+import pytest
+from conftest import row
+
+from Database import (COLUMNS, TRANSACTION_TRIGGERS, data_version, ensure_schema, rebuild_derived, rewrite_count,
+                      write_batch)
+
+SNAPSHOT = {
+    # rows left at zero by decrements are equivalent to missing rows
+    "insights_summary": "SELECT sign, n, ROUND(total, 6) FROM insights_summary WHERE n <> 0 ORDER BY 1",
+    "category_counts": "SELECT category, n FROM category_counts WHERE n <> 0 ORDER BY 1",
+    "merchant_counts": "SELECT merchant, n FROM merchant_counts WHERE n <> 0 ORDER BY 1",
+    "monthly_rollup": "SELECT month, category, currency, ROUND(spent, 6), ROUND(income, 6), n "
+                      "FROM monthly_rollup WHERE n <> 0 ORDER BY 1, 2, 3",
+    "daily_rollup": "SELECT date, currency, ROUND(spent, 6), ROUND(income, 6), n_spent, n_income, n "
+                    "FROM daily_rollup WHERE n <> 0 ORDER BY 1, 2",
+}
+FTS = "SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ? ORDER BY 1"
+TERMS = ("tesco", "coffee", "uber", "refund")
+
+ROWS = [
+    row("a", "2025-01-05", -10.0, description="Tesco Leeds", merchant="Tesco", category="Groceries"),
+    row("b", "2025-01-05", -2.5, description="Coffee", merchant="Starbucks", category="Food", currency="EUR"),
+    row("c", "2025-01-20", 1000.0, description="Salary", merchant="ACME", category="Income"),
+    row("d", "2025-02-01", -4.0, description="Unlabelled", currency=None),
+    row("e", "2025-02-01", 0.0, description="Zero", category="Food"),
+]
+# "a" changes sign, category, currency, date and text; "b" its merchant and loses its category; "f" is new
+CHANGES = [
+    row("a", "2025-02-03", 25.0, description="Tesco refund", merchant="Tesco", category="Refunds", currency="USD"),
+    row("b", "2025-01-05", -3.5, description="Coffee", merchant="Costa", category=None, currency="EUR"),
+    row("f", "2025-03-01", -7.0, description="Uber trip", merchant="Uber", category="Transport"),
+]
+
+_INSERT = f"INSERT INTO transactions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+_UPSERT = {
+    "update": _INSERT + " ON CONFLICT(id) DO UPDATE SET "
+                        + ", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "id"),
+    "ignore": _INSERT + " ON CONFLICT(id) DO NOTHING",
+}
+
+
+def _triggers(conn, rows, on_conflict):
+    conn.executemany(_UPSERT[on_conflict], rows)
+
+
+@pytest.fixture(params=["triggers", "write_batch"])
+def write(request, db):
+    """Upsert rows through the row triggers or through write_batch."""
+    fn = _triggers if request.param == "triggers" else write_batch
+
+    def run(rows, on_conflict="update"):
+        with db.write() as conn:
+            fn(conn, rows, on_conflict)
+    return run
+
+
+def snapshot(shard) -> dict:
+    with shard.read() as conn:
+        state = {name: conn.execute(sql).fetchall() for name, sql in SNAPSHOT.items()}
+        state["fts"] = {term: [r[0] for r in conn.execute(FTS, (term,))] for term in TERMS}
+    return state
+
+
+def rebuilt(shard) -> dict:
+    with shard.write() as conn:
+        rebuild_derived(conn)
+    return snapshot(shard)
+
+
+def test_insert(db, write):
+    write(ROWS)
+    state = snapshot(db)
+    assert state["insights_summary"] == [(-1, 3, -16.5), (0, 1, 0.0), (1, 1, 1000.0)]
+    # NULL category counted under ''
+    assert state["category_counts"] == [("", 1), ("Food", 2), ("Groceries", 1), ("Income", 1)]
+    assert state["merchant_counts"] == [("", 2), ("ACME", 1), ("Starbucks", 1), ("Tesco", 1)]
+    assert state["monthly_rollup"] == [
+        ("2025-01", "Food", "EUR", -2.5, 0.0, 1),
+        ("2025-01", "Groceries", "GBP", -10.0, 0.0, 1),
+        ("2025-01", "Income", "GBP", 0.0, 1000.0, 1),
+        ("2025-02", "", "", -4.0, 0.0, 1),
+        ("2025-02", "Food", "GBP", 0.0, 0.0, 1),
+    ]
+    assert state["daily_rollup"] == [
+        ("2025-01-05", "EUR", -2.5, 0.0, 1, 0, 1),
+        ("2025-01-05", "GBP", -10.0, 0.0, 1, 0, 1),
+        ("2025-01-20", "GBP", 0.0, 1000.0, 0, 1, 1),
+        ("2025-02-01", "", -4.0, 0.0, 1, 0, 1),
+        ("2025-02-01", "GBP", 0.0, 0.0, 0, 0, 1),
+    ]
+    assert state["fts"] == {"tesco": [1], "coffee": [2], "uber": [], "refund": []}
+    assert state == rebuilt(db)
+
+
+def test_update(db, write):
+    write(ROWS)
+    write(CHANGES, "update")
+    state = snapshot(db)
+    assert state["insights_summary"] == [(-1, 3, -14.5), (0, 1, 0.0), (1, 2, 1025.0)]
+    assert state["category_counts"] == [("", 2), ("Food", 1), ("Income", 1), ("Refunds", 1), ("Transport", 1)]
+    assert state["merchant_counts"] == [("", 2), ("ACME", 1), ("Costa", 1), ("Tesco", 1), ("Uber", 1)]
+    assert state["monthly_rollup"] == [
+        ("2025-01", "", "EUR", -3.5, 0.0, 1),
+        ("2025-01", "Income", "GBP", 0.0, 1000.0, 1),
+        ("2025-02", "", "", -4.0, 0.0, 1),
+        ("2025-02", "Food", "GBP", 0.0, 0.0, 1),
+        ("2025-02", "Refunds", "USD", 0.0, 25.0, 1),
+        ("2025-03", "Transport", "GBP", -7.0, 0.0, 1),
+    ]
+    assert state["daily_rollup"] == [
+        ("2025-01-05", "EUR", -3.5, 0.0, 1, 0, 1),
+        ("2025-01-20", "GBP", 0.0, 1000.0, 0, 1, 1),
+        ("2025-02-01", "", -4.0, 0.0, 1, 0, 1),
+        ("2025-02-01", "GBP", 0.0, 0.0, 0, 0, 1),
+        ("2025-02-03", "USD", 0.0, 25.0, 0, 1, 1),
+        ("2025-03-01", "GBP", -7.0, 0.0, 1, 0, 1),
+    ]
+    # an upsert keeps the rowid of the replaced row
+    assert state["fts"] == {"tesco": [1], "coffee": [2], "uber": [6], "refund": [1]}
+    assert state == rebuilt(db)
+
+
+def test_ignore(db, write):
+    write(ROWS)
+    write(CHANGES, "ignore")
+    state = snapshot(db)
+    assert state["insights_summary"] == [(-1, 4, -23.5), (0, 1, 0.0), (1, 1, 1000.0)]
+    assert state["category_counts"] == [("", 1), ("Food", 2), ("Groceries", 1), ("Income", 1), ("Transport", 1)]
+    assert state["fts"] == {"tesco": [1], "coffee": [2], "uber": [6], "refund": []}
+    assert state == rebuilt(db)
+
+
+def test_rewrite_count(db, write):
+    def rewrites():
+        with db.read() as conn:
+            return rewrite_count(conn)
+
+    write(ROWS)
+    start = rewrites()
+    # "f" appended, "a" and "b" kept
+    write(CHANGES, "ignore")
+    assert rewrites() == start
+    write(CHANGES)
+    assert rewrites() == start + 3
+    with db.write() as conn:
+        conn.execute("DELETE FROM transactions WHERE id = 'f'")
+    assert rewrites() == start + 4
+
+
+def test_delete_after_batch(db):
+    # the triggers write_batch switched off are back on once it returns
+    with db.write() as conn:
+        schema = conn.execute("PRAGMA schema_version").fetchone()
+        write_batch(conn, ROWS)
+        # no DDL: statements prepared before the batch stay valid
+        assert conn.execute("PRAGMA schema_version").fetchone() == schema
+    with db.write() as conn:
+        conn.execute("DELETE FROM transactions WHERE id IN ('a', 'd')")
+    state = snapshot(db)
+    assert state["category_counts"] == [("Food", 2), ("Income", 1)]
+    assert state["fts"]["tesco"] == []
+    assert state == rebuilt(db)
+
+
+def test_write_batch_counts_and_version(db):
+    with db.read() as conn:
+        before = data_version(conn)
+    with db.write() as conn:
+        assert write_batch(conn, ROWS) == {"inserted": 5, "updated": 0, "ignored": 0}
+    with db.write() as conn:
+        assert write_batch(conn, CHANGES, "update") == {"inserted": 1, "updated": 2, "ignored": 0}
+    with db.write() as conn:
+        assert write_batch(conn, CHANGES, "ignore") == {"inserted": 0, "updated": 0, "ignored": 3}
+    with db.read() as conn:
+        # once per batch that wrote rows
+        assert data_version(conn) == before + 2
+
+
+def test_failed_batch_leaves_the_triggers_on(db):
+    with db.write() as conn:
+        with pytest.raises(sqlite3.IntegrityError):
+            write_batch(conn, [row("x", None, -1.0)])
+        assert conn.execute("SELECT batch FROM trigger_control").fetchone() == (0,)
+
+
+def test_ungated_triggers_are_migrated(db):
+    with db.write() as conn:
+        write_batch(conn, ROWS)
+        # triggers as created before trigger_control existed
+        for name, sql in TRANSACTION_TRIGGERS.items():
+            conn.execute(f"DROP TRIGGER {name}")
+            conn.execute(sql.replace("\n    WHEN (SELECT batch FROM trigger_control) IS NOT 1", ""))
+    before = snapshot(db)
+    with db.write() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+                            "AND sql LIKE '%trigger_control%'").fetchone() == (0,)
+        version = data_version(conn)
+        ensure_schema(conn)
+        sql = [r[0] for r in conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'transactions' "
+                                          "AND type = 'trigger'")]
+        # swapped in place: no rebuild
+        assert data_version(conn) == version
+    assert len(sql) == len(TRANSACTION_TRIGGERS) and all("trigger_control" in s for s in sql)
+    assert snapshot(db) == before
+    with db.write() as conn:
+        write_batch(conn, CHANGES)
+    assert snapshot(db) == rebuilt(db)
+
+
+def test_write_batch_rejects_unknown_mode(db):
+    with db.write() as conn, pytest.raises(ValueError):
+        write_batch(conn, ROWS, "replace")
+
+
+def test_fts_hashsize_is_set_once(db):
+    def hashsize():
+        with db.read() as conn:
+            return conn.execute("SELECT v FROM transactions_fts_config WHERE k = 'hashsize'").fetchone()
+
+    assert hashsize() == (16777216,)
+    with db.write() as conn:
+        conn.execute("INSERT INTO transactions_fts (transactions_fts, rank) VALUES ('hashsize', 1048576)")
+    with db.write() as conn:
+        ensure_schema(conn)
+    # an existing index keeps its setting
+    assert hashsize() == (1048576,)
@@ -0,0 +1,78 @@
+"""Keyset pagination over (date, id) and the streamed export."""
+
+import json
+
+import pytest
+from conftest import insert, row
+
+import Export
+
+# several ids per date, inserted out of order
+ROWS = [row(f"t{i:02d}", f"2025-01-0{1 + i % 3}", -float(i + 1)) for i in (7, 3, 9, 0, 5, 1, 8, 2, 6, 4)]
+ORDERED = [r[0] for r in sorted(ROWS, key=lambda r: (r[1], r[0]))]
+
+
+def _walk(limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page = Export.fetch_page(cursor, limit)
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_roundtrip():
+    cursor = Export.encode_cursor("2025-01-02", "t04")
+    assert "=" not in cursor
+    assert Export.decode_cursor(cursor) == ("2025-01-02", "t04")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    Export.encode_cursor("2025-01-02", "t04")[:-3] + "!!",
+    "W1tdLFtdXQ",                                       # [[],[]]
+    Export.encode_cursor("2025-01-02", 4),
+])
+def test_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        Export.decode_cursor(cursor)
+
+
+def test_bad_cursor_is_a_client_error(client):
+    response = client.get("/transactions/page", params={"cursor": "W1tdLFtdXQ"})
+    assert response.status_code == 400
+
+
+def test_pages_follow_date_then_id(db):
+    insert(db, ROWS)
+    assert ORDERED[:4] == ["t00", "t03", "t06", "t09"]      # all of 2025-01-01
+    assert _walk(4) == [ORDERED[:4], ORDERED[4:8], ORDERED[8:]]
+
+
+def test_exact_multiple_has_no_empty_page(db):
+    insert(db, ROWS)
+    assert _walk(5) == [ORDERED[:5], ORDERED[5:]]
+    assert _walk(10) == [ORDERED]
+
+
+def test_rows_inserted_behind_the_cursor_are_skipped(db):
+    insert(db, ROWS)
+    first = Export.fetch_page(None, 3)
+    # sorts before the cursor, so neither repeated nor shifting later pages
+    insert(db, [row("t-early", "2024-12-31", -1.0)])
+    rest = Export.fetch_page(first["next_cursor"], 100)
+    assert [i["id"] for i in first["items"] + rest["items"]] == ORDERED
+
+
+def test_empty_table(db):
+    assert Export.fetch_page(None, 10) == {"items": [], "next_cursor": None}
+
+
+def test_stream_ndjson(db):
+    insert(db, ROWS)
+    body = "".join(Export.stream_rows("ndjson", chunk_size=3))
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["id"] for line in lines] == ORDERED
+    assert lines[0] == {"id": "t00", "date": "2025-01-01", "description": "", "amount": -1.0,
+                        "currency": "GBP", "merchant": None, "category": None, "city": None, "country": None}
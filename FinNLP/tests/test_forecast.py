@@ -0,0 +1,74 @@
+"""Model choice and seasonal-naive indexing of the monthly forecast."""
+
+import numpy as np
+import pytest
+from conftest import insert, row
+
+import Forecast
+from Forecast import SEASON, _fit
+
+PATTERN = [100.0 + 10 * m for m in range(1, 13)]        # January 110 ... December 220
+
+
+def test_seasonal_naive_repeats_the_same_month_a_year_earlier():
+    y = tuple(PATTERN * 2)
+    fit = _fit(y)
+    assert fit["model"] == "seasonal_naive"
+    assert fit["mae"] == 0.0
+    # y ends in December: the next month is y[-SEASON] (January), then February...
+    assert list(fit["next"][:3]) == [110.0, 120.0, 130.0]
+    assert list(fit["next"]) == list(y[-SEASON:])
+
+
+def test_thirteen_months_is_enough_for_seasonal():
+    y = tuple(PATTERN + [111.0])
+    fit = _fit(y)
+    # one seasonal error: |111 - 110|
+    assert (fit["model"], fit["mae"]) == ("seasonal_naive", 1.0)
+    assert fit["next"][0] == y[-SEASON] == 120.0
+
+
+def test_twelve_months_uses_smoothing():
+    fit = _fit(tuple(PATTERN))
+    assert fit["model"] == "exponential_smoothing"
+    assert 0.05 <= fit["alpha"] <= 0.95
+
+
+def test_flat_series():
+    fit = _fit((50.0,) * 20)
+    assert fit["model"] == "exponential_smoothing"
+    assert fit["mae"] == 0.0
+    assert np.allclose(fit["next"], 50.0)
+
+
+def test_short_series():
+    assert _fit((42.0,))["next"][0] == 42.0
+    assert _fit(())["mae"] is None
+
+
+def test_forecast_from_rollup(db):
+    # one Food expense per month, 2023-07 .. 2025-06 (24 complete months)
+    months = [str(m) for m in np.arange(np.datetime64("2023-07"), np.datetime64("2025-07"))]
+    rows = [row(f"f{i}", f"{m}-01", -PATTERN[int(m[5:]) - 1], category="Food") for i, m in enumerate(months)]
+    # the last month counts as complete only when the latest date is its last day
+    rows.append(row("end", "2025-06-30", 0.0, category="Other"))
+    insert(db, rows)
+
+    result = Forecast.forecast(months=3)
+    assert result["months"] == ["2025-07", "2025-08", "2025-09"]
+    assert result["last_complete_month"] == "2025-06"
+    (food,) = result["items"]
+    assert (food["category"], food["currency"], food["model"]) == ("Food", "GBP", "seasonal_naive")
+    assert [f["spent"] for f in food["forecast"]] == [170.0, 180.0, 190.0]
+    assert food["history"][0] == {"month": "2024-07", "spent": 170.0}
+    assert "to_date" not in food
+
+
+def test_partial_month_is_forecast(db):
+    insert(db, [row("a", "2025-01-01", -10.0, category="Food"), row("b", "2025-02-10", -20.0, category="Food")])
+    result = Forecast.forecast(months=2)
+    assert result["last_complete_month"] == "2025-01"
+    assert result["months"] == ["2025-02", "2025-03"]
+    (food,) = result["items"]
+    assert food["to_date"] == 20.0
+    assert food["forecast"][0]["spent"] == pytest.approx(10.0)
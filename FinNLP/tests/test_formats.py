@@ -0,0 +1,65 @@
+"""Accept-header negotiation between SQL-built JSON and Arrow IPC on the transaction routes."""
+
+import json
+
+import pytest
+from conftest import insert, row
+
+import Formats
+from Database import COLUMNS
+from Formats import ARROW_MIME
+
+pa = pytest.importorskip("pyarrow")
+
+ROWS = [
+    row("a", "2025-01-01", -12.5, description="Tesco Leeds", merchant="Tesco", category="Groceries"),
+    row("b", "2025-01-02", 1000.0, description="Salary", merchant="ACME", category="Income", city="Leeds"),
+    row("c", "2025-01-03", -3.0, description="Bus", currency=None),
+]
+
+
+@pytest.fixture(autouse=True)
+def rows(db):
+    insert(db, ROWS)
+
+
+def _arrow(response) -> pa.Table:
+    return pa.ipc.open_stream(response.content).read_all()
+
+
+def test_json_by_default(client):
+    response = client.get("/transactions", params={"limit": 2})
+    assert response.headers["content-type"] == "application/json"
+    items = json.loads(response.content)
+    assert items == [dict(zip(COLUMNS, r)) for r in ROWS[:2]]
+
+
+@pytest.mark.parametrize("accept", [ARROW_MIME, f"{ARROW_MIME}, application/json;q=0.5"])
+def test_arrow_when_asked(client, accept):
+    response = client.get("/transactions", headers={"Accept": accept})
+    assert response.headers["content-type"] == ARROW_MIME
+    table = _arrow(response)
+    assert table.schema.names == list(COLUMNS)
+    assert table.schema.field("amount").type == pa.float64()
+    # same rows, same nulls as the JSON body
+    assert table.to_pylist() == client.get("/transactions").json()
+
+
+def test_filter_negotiates_too(client):
+    params = {"merchant": "tesco"}
+    arrow = _arrow(client.get("/transactions/filter", params=params, headers={"Accept": ARROW_MIME}))
+    assert arrow.column("id").to_pylist() == ["a"]
+    assert client.get("/transactions/filter", params=params).json() == arrow.to_pylist()
+
+
+def test_empty_result(client):
+    params = {"merchant": "nobody"}
+    assert client.get("/transactions/filter", params=params).content == b"[]"
+    table = _arrow(client.get("/transactions/filter", params=params, headers={"Accept": ARROW_MIME}))
+    assert (table.num_rows, table.schema.names) == (0, list(COLUMNS))
+
+
+def test_arrow_without_pyarrow(client, monkeypatch):
+    monkeypatch.setattr(Formats, "pa", None)
+    assert client.get("/transactions", headers={"Accept": ARROW_MIME}).status_code == 406
+    assert client.get("/transactions").status_code == 200
@@ -0,0 +1,104 @@
+"""As-of FX conversion of totals and breakdowns, rate loading and the /insights totals."""
+
+import pytest
+from conftest import insert, row
+
+import FX
+import Main
+from Database import data_version
+
+RATES = """date,currency,rate
+2025-01-01,GBP,1.2
+2025-02-01,GBP,1.1
+2025-01-01,USD,0.9
+"""
+
+
+@pytest.fixture
+def rates(db, tmp_path):
+    path = tmp_path / "fx_rates.csv"
+    path.write_text(RATES)
+    assert FX.load_rates(path, db) == 3
+    yield
+    with db.write() as conn:
+        conn.execute("DELETE FROM fx_rates")
+
+
+def _totals(frame) -> tuple:
+    ok = frame[frame["converted"]]
+    return round(ok["spent"].sum(), 6), round(ok["income"].sum(), 6), int(frame["n"].sum())
+
+
+def test_latest_rate_on_or_before_the_date(db, rates):
+    insert(db, [row("a", "2025-01-15", -10.0), row("b", "2025-02-03", -10.0), row("c", "2025-01-31", 100.0)])
+    frame = FX.converted(None, "EUR")
+    by_date = {d: round(s + i, 6) for d, s, i in zip(frame["date"], frame["spent"], frame["income"])}
+    assert by_date == {"2025-01-15": -12.0, "2025-02-03": -11.0, "2025-01-31": 120.0}
+
+
+def test_before_the_first_rate_uses_the_next_one(db, rates):
+    insert(db, [row("a", "2024-12-31", -10.0)])
+    assert _totals(FX.converted(None, "EUR")) == (-12.0, 0.0, 1)
+
+
+def test_target_currency(db, rates):
+    insert(db, [row("a", "2025-01-15", -12.0, currency="EUR"), row("b", "2025-01-16", -9.0, currency="USD")])
+    # EUR → GBP divides by the GBP rate; USD → GBP goes through EUR
+    assert _totals(FX.converted(None, "GBP")) == (round(-12.0 / 1.2 - 9.0 * 0.9 / 1.2, 6), 0.0, 2)
+
+
+def test_default_rates_without_dated_ones(db):
+    insert(db, [row("a", "2025-01-15", -10.0), row("b", "2025-01-15", -10.0, currency="EUR")])
+    assert _totals(FX.converted(None, "EUR")) == (round(-10.0 * FX.DEFAULT_RATES["GBP"] - 10.0, 6), 0.0, 2)
+
+
+def test_unknown_currency_is_left_out(db, rates):
+    insert(db, [row("a", "2025-01-15", -10.0, currency="JPY"), row("b", "2025-01-15", -5.0, currency="EUR")])
+    frame = FX.converted(None, "EUR")
+    assert FX.missing_rates(frame) == ["JPY"]
+    assert _totals(frame) == (-5.0, 0.0, 2)
+
+
+def test_daily_rollup_matches_the_raw_rows(db, rates):
+    currencies = ("GBP", "EUR", "USD", None)
+    insert(db, [row(f"t{i}", f"2025-0{1 + i % 2}-{1 + i % 27:02d}", (-1) ** i * (i + 0.25),
+                    category=f"c{i % 3}", currency=currencies[i % 4]) for i in range(40)])
+    totals = _totals(FX.converted(None, "USD"))
+    assert totals == pytest.approx(_totals(FX.converted("category", "USD")))
+    assert totals[2] == 40
+
+
+def test_breakdown_key(db, rates):
+    insert(db, [row("a", "2025-01-15", -10.0, category="Food"),
+                row("b", "2025-01-15", -5.0, category="Bills", currency="EUR")])
+    frame = FX.converted("category", "EUR")
+    assert dict(zip(frame["key"], frame["spent"].round(6))) == {"Food": -12.0, "Bills": -5.0}
+
+
+def test_invalid_arguments(db):
+    with pytest.raises(ValueError):
+        FX.converted("description")
+    with pytest.raises(ValueError):
+        FX.converted(None, "XYZ")
+
+
+def test_loading_rates_invalidates_conversions(db, rates, tmp_path):
+    insert(db, [row("a", "2025-03-01", -10.0)])
+    assert _totals(FX.converted(None, "EUR"))[0] == -11.0
+    with db.read() as conn:
+        before = data_version(conn)
+    (tmp_path / "march.csv").write_text("date,currency,rate\n2025-03-01,GBP,1.3\n")
+    FX.load_rates(tmp_path / "march.csv", db)
+    with db.read() as conn:
+        assert data_version(conn) > before
+    assert _totals(FX.converted(None, "EUR"))[0] == -13.0
+
+
+def test_insights_totals(db, rates):
+    insert(db, [row("a", "2025-01-15", -10.0, category="Food"),
+                row("b", "2025-01-20", -6.0, category="Food", currency="EUR"),
+                row("c", "2025-01-31", 100.0, category="Income", currency="USD")])
+    result = Main.compute_insights("eur")
+    assert (result["currency"], result["total_transactions"], result["top_category"]) == ("EUR", 3, "Food")
+    assert (result["total_spent"], result["total_income"], result["average_expense"]) == (-18.0, 90.0, -9.0)
+    assert result["missing_rates"] == []
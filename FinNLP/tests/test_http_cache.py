@@ -0,0 +1,79 @@
+"""ETag / Last-Modified validators and 304s on the read routes."""
+
+from email.utils import formatdate
+
+import pytest
+from conftest import insert, row
+
+import Main
+
+
+@pytest.fixture(autouse=True)
+def rows(db):
+    insert(db, [row("a", "2025-01-01", -10.0, category="Food"), row("b", "2025-01-02", 50.0, category="Income")])
+
+
+def test_validators_on_read_routes(client):
+    response = client.get("/insights")
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "no-cache"
+    assert "Accept" in response.headers["vary"]
+    assert "last-modified" in response.headers
+    version = client.get("/version").json()["data_version"]
+    assert response.headers["etag"].startswith(f'W/"{version}-')
+
+
+def test_other_routes_have_no_validators(client):
+    assert "etag" not in client.get("/version").headers
+    assert "etag" not in client.get("/db/pool").headers
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    "{strong}",                     # weak comparison
+    'W/"0-other", {etag}',
+    "*",
+])
+def test_matching_etag_is_304(client, monkeypatch, if_none_match):
+    etag = client.get("/insights").headers["etag"]
+    # the route does not run for a 304
+    monkeypatch.setattr(Main, "compute_insights", lambda: pytest.fail("route ran"))
+    header = if_none_match.format(etag=etag, strong=etag.removeprefix("W/"))
+    response = client.get("/insights", headers={"If-None-Match": header})
+    assert (response.status_code, response.content) == (304, b"")
+    assert response.headers["etag"] == etag
+
+
+def test_a_write_changes_the_etag(client, db):
+    etag = client.get("/insights").headers["etag"]
+    insert(db, [row("c", "2025-01-03", -1.0)])
+    response = client.get("/insights", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["total_transactions"] == 3
+
+
+def test_etag_varies_with_path_query_and_accept(client):
+    etags = {
+        client.get("/transactions", params={"limit": 1}).headers["etag"],
+        client.get("/transactions", params={"limit": 2}).headers["etag"],
+        client.get("/transactions/filter", params={"limit": 1}).headers["etag"],
+        client.get("/transactions", params={"limit": 1}, headers={"Accept": "application/json"}).headers["etag"],
+    }
+    assert len(etags) == 4
+
+
+def test_if_modified_since(client):
+    updated_at = client.get("/version").json()["updated_at"]
+    not_modified = client.get("/insights", headers={"If-Modified-Since": formatdate(updated_at, usegmt=True)})
+    assert not_modified.status_code == 304
+    for header in (formatdate(updated_at - 60, usegmt=True), "not a date"):
+        assert client.get("/insights", headers={"If-Modified-Since": header}).status_code == 200
+
+
+def test_if_none_match_wins_over_if_modified_since(client):
+    updated_at = client.get("/version").json()["updated_at"]
+    response = client.get("/insights", headers={"If-None-Match": 'W/"0-stale"',
+                                               "If-Modified-Since": formatdate(updated_at, usegmt=True)})
+    assert response.status_code == 200
@@ -0,0 +1,149 @@
+"""Background jobs: persisted results, failures and what a restart does to unfinished jobs."""
+
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+from Jobs import LEASE, JobManager, render_pdf
+
+
+async def _report(params, api_key):
+    return f"Report for {params['limit']} rows", render_pdf("Report", "text")
+
+
+async def _fail(params, api_key):
+    raise RuntimeError("upstream down")
+
+
+async def _wait(manager, job_id, *statuses):
+    for _ in range(500):
+        job = manager.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stayed {job['status']}")
+
+
+def _manager(path, **handlers) -> JobManager:
+    manager = JobManager(path, workers=2)
+    for kind, handler in handlers.items():
+        manager.register(kind, handler)
+    return manager
+
+
+def test_result_and_pdf_are_persisted(tmp_path):
+    async def main():
+        manager = _manager(tmp_path / "jobs.db", report=_report)
+        await manager.start()
+        job_id = (await manager.submit("report", {"limit": 50}, "key"))["job_id"]
+        await _wait(manager, job_id, "done")
+        await manager.stop()
+        return job_id
+
+    job_id = asyncio.run(main())
+    # a new manager (another worker, or after a restart) reads it from the file
+    job = _manager(tmp_path / "jobs.db").get(job_id, with_pdf=True)
+    assert (job["status"], job["result"], job["params"]) == ("done", "Report for 50 rows", {"limit": 50})
+    assert job["has_pdf"] and job["pdf"].startswith(b"%PDF")
+
+
+def test_handler_error_fails_the_job(tmp_path):
+    async def main():
+        manager = _manager(tmp_path / "jobs.db", report=_fail)
+        await manager.start()
+        job_id = (await manager.submit("report", {}, "key"))["job_id"]
+        job = await _wait(manager, job_id, "done", "failed")
+        with pytest.raises(ValueError):
+            await manager.submit("unknown", {}, "key")
+        stats = manager.stats()
+        await manager.stop()
+        return job, stats
+
+    job, stats = asyncio.run(main())
+    assert (job["status"], job["error"]) == ("failed", "upstream down")
+    assert stats["by_status"] == {"failed": 1}
+
+
+async def _interrupted(path, heartbeat=None) -> str:
+    """
+    Submit a job whose handler never finishes and stop the server mid-run.
+    With `heartbeat`, its owner token is left behind with that heartbeat,
+    as a crashed (old heartbeat) or still running (fresh one) process would.
+    """
+    async def hang(params, api_key):
+        await asyncio.Event().wait()
+
+    manager = _manager(path, report=hang)
+    await manager.start()
+    job_id = (await manager.submit("report", {"limit": 1}, "key"))["job_id"]
+    await _wait(manager, job_id, "running")
+    await manager.stop()
+    if heartbeat is not None:
+        with sqlite3.connect(path) as conn:
+            conn.execute("INSERT INTO owners (token, heartbeat) VALUES (?, ?)", (manager.token, heartbeat))
+    return job_id
+
+
+@pytest.mark.parametrize("env_key, expected", [("sk-env", "done"), (None, "failed")])
+def test_unfinished_jobs_after_a_restart(tmp_path, monkeypatch, env_key, expected):
+    if env_key:
+        monkeypatch.setenv("OPENAI_API_KEY", env_key)
+    else:
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    keys = []
+
+    async def report(params, api_key):
+        keys.append(api_key)
+        return await _report(params, api_key)
+
+    async def main():
+        job_id = await _interrupted(tmp_path / "jobs.db")
+        restarted = _manager(tmp_path / "jobs.db", report=report)
+        await restarted.start()
+        job = await _wait(restarted, job_id, "done", "failed")
+        await restarted.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job["status"] == expected
+    if env_key:
+        # re-queued with the server's key: the client's key was never stored
+        assert (job["result"], keys) == ("Report for 1 rows", ["sk-env"])
+    else:
+        assert "resubmit" in job["error"]
+
+
+@pytest.mark.parametrize("age, expected", [(0, "running"), (LEASE + 1, "done")])
+def test_owner_heartbeat(tmp_path, monkeypatch, age, expected):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-env")
+
+    async def main():
+        # same pid as the owner, as after a container restart: only the heartbeat counts
+        job_id = await _interrupted(tmp_path / "jobs.db", heartbeat=time.time() - age)
+        other = _manager(tmp_path / "jobs.db", report=_report)
+        await other.start()
+        await asyncio.sleep(0.05)
+        job = other.get(job_id)
+        await other.stop()
+        return job
+
+    assert asyncio.run(main())["status"] == expected
+
+
+def test_pid_era_owner_is_claimed(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-env")
+
+    async def main():
+        job_id = await _interrupted(tmp_path / "jobs.db")
+        with sqlite3.connect(tmp_path / "jobs.db") as conn:
+            conn.execute("UPDATE jobs SET owner = ? WHERE id = ?", (os.getpid(), job_id))
+        restarted = _manager(tmp_path / "jobs.db", report=_report)
+        await restarted.start()
+        job = await _wait(restarted, job_id, "done", "failed")
+        await restarted.stop()
+        return job
+
+    assert asyncio.run(main())["status"] == "done"
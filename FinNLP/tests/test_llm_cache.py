@@ -0,0 +1,103 @@
+"""LLM response cache: both tiers, key parts, TTL / LRU eviction and data-version invalidation."""
+
+import pytest
+from conftest import insert, row
+
+from Database import data_version, rebuild_derived
+from LLM_Cache import LLMCache
+
+MODEL = "gpt-4o-mini"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db")
+    yield cache
+    cache.close()
+
+
+def test_memory_then_disk(cache):
+    assert cache.get(MODEL, "prompt", 1) is None
+    cache.put(MODEL, "prompt", 1, "answer")
+    assert cache.get(MODEL, "prompt", 1) == "answer"
+    # a new process only has the SQLite tier
+    restarted = LLMCache(cache.path)
+    assert restarted.get(MODEL, "prompt", 1) == "answer"
+    assert restarted.get(MODEL, "prompt", 1) == "answer"
+    restarted.close()
+    assert (cache.stats()["memory_hits"], cache.stats()["misses"]) == (1, 1)
+    assert (restarted.stats()["disk_hits"], restarted.stats()["memory_hits"]) == (1, 1)
+
+
+def test_prompt_is_normalized(cache):
+    cache.put(MODEL, "How much  did I\nspend?", 1, "answer")
+    assert cache.get(MODEL, "  how much did i spend? ", 1) == "answer"
+
+
+def test_model_and_version_are_part_of_the_key(cache):
+    cache.put(MODEL, "prompt", 1, "answer")
+    assert cache.get("gpt-4o", "prompt", 1) is None
+    assert cache.get(MODEL, "prompt", 2) is None
+
+
+def test_new_version_purges_older_entries(cache):
+    cache.put(MODEL, "a", 1, "old a")
+    cache.put(MODEL, "b", 1, "old b")
+    cache.put(MODEL, "a", 2, "new a")
+    stats = cache.stats()
+    assert (stats["memory_entries"], stats["disk_entries"], stats["data_version"]) == (1, 1, 2)
+    assert cache.get(MODEL, "b", 1) is None
+
+
+def test_ttl(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.db", ttl=0)
+    cache.put(MODEL, "prompt", 1, "answer")
+    assert cache.get(MODEL, "prompt", 1) is None
+    assert cache.stats()["disk_entries"] == 0
+    cache.close()
+
+
+@pytest.mark.parametrize("memory_entries, disk_entries", [(2, 100), (0, 2)], ids=["memory", "disk"])
+def test_least_recently_used_is_evicted(tmp_path, memory_entries, disk_entries):
+    # each tier is bounded on its own
+    cache = LLMCache(tmp_path / "llm_cache.db", memory_entries=memory_entries, disk_entries=disk_entries)
+    cache.put(MODEL, "a", 1, "A")
+    cache.put(MODEL, "b", 1, "B")
+    assert cache.get(MODEL, "a", 1) == "A"
+    cache.put(MODEL, "c", 1, "C")
+    if memory_entries:
+        assert list(cache._memory) == [cache.make_key(MODEL, k, 1) for k in ("a", "c")]
+    else:
+        assert cache.get(MODEL, "b", 1) is None
+        assert cache.get(MODEL, "a", 1) == "A"
+    cache.close()
+
+
+def test_every_write_bumps_the_data_version(db):
+    def version():
+        with db.read() as conn:
+            return data_version(conn)
+
+    seen = [version()]
+    insert(db, [row("a", "2025-01-01", -1.0), row("b", "2025-01-02", -2.0)])
+    seen.append(version())
+    for sql in ("UPDATE transactions SET description = 'x' WHERE id = 'a'",
+                "DELETE FROM transactions WHERE id = 'b'"):
+        with db.write() as conn:
+            conn.execute(sql)
+        seen.append(version())
+    with db.write() as conn:
+        rebuild_derived(conn)
+    seen.append(version())
+    # one bump per row written, one per rebuild
+    assert [v - seen[0] for v in seen] == [0, 2, 3, 4, 5]
+
+
+def test_writes_invalidate_cached_answers(db, cache):
+    with db.read() as conn:
+        before = data_version(conn)
+    cache.put(MODEL, "How much did I spend?", before, "Nothing yet.")
+    insert(db, [row("a", "2025-01-01", -1.0)])
+    with db.read() as conn:
+        after = data_version(conn)
+    assert cache.get(MODEL, "How much did I spend?", after) is None
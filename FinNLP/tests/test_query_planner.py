@@ -0,0 +1,155 @@
+"""Question → Plan parsing, date ranges and the SQL the plans run."""
+
+import datetime
+
+import pytest
+from conftest import insert, row
+
+import Query_Planner as Q
+
+_vocabulary = Q.vocabulary
+
+TODAY = datetime.date(2025, 6, 18)
+VOCAB = {"categories": ["Food", "Groceries", "Transport", "Income"],
+         "merchants": ["Transport for London", "Uber", "Tesco"]}
+
+
+@pytest.fixture(autouse=True)
+def vocabulary(monkeypatch):
+    monkeypatch.setattr(Q, "vocabulary", lambda: VOCAB)
+
+
+def parse(question):
+    return Q.parse(question, TODAY)
+
+
+@pytest.mark.parametrize("question", [
+    "How much did I spend on Food and Groceries?",       # two categories
+    "How much did I spend at Uber and Tesco?",           # two merchants
+    "Did I spend more on Food than Transport?",
+    "Uber vs Tesco spending",
+    "How much did I spend on each category?",
+    "Average of my top 3 merchants",
+    "Why is my Food spending so high?",                  # open-ended
+    "How many coffees did I buy at Tesco?",              # counts something else than transactions
+    "How many cities did I pay in?",
+    "Hello there",
+    "",
+])
+def test_left_to_the_llm(question):
+    assert parse(question) is None
+
+
+def test_sum_for_category_last_month():
+    plan = parse("How much did I spend on Food last month?")
+    assert plan == Q.Plan(metric="sum", sign="expense", category="Food",
+                          date_from=datetime.date(2025, 5, 1), date_to=datetime.date(2025, 6, 1))
+
+
+def test_longest_term_wins():
+    # "Transport for London" is the merchant, not the category "Transport"
+    plan = parse("How much did I spend at Transport for London?")
+    assert (plan.merchant, plan.category) == ("Transport for London", None)
+
+
+def test_merchant_and_category_together():
+    plan = parse("How much did I spend at Uber on Transport?")
+    assert (plan.metric, plan.merchant, plan.category) == ("sum", "Uber", "Transport")
+
+
+def test_average_with_currency():
+    plan = parse("Average Uber payment in GBP")
+    assert (plan.metric, plan.sign, plan.merchant, plan.currency) == ("avg", "expense", "Uber", "GBP")
+
+
+def test_count_has_no_sign():
+    plan = parse("How many transactions at Tesco?")
+    assert (plan.metric, plan.sign, plan.merchant) == ("count", None, "Tesco")
+
+
+@pytest.mark.parametrize("question, distinct", [
+    ("How many times did I pay Uber?", None),
+    ("Transaction count at Tesco", None),
+    ("How many merchants did I pay this year?", "merchant"),
+    ("Number of different shops", "merchant"),
+    ("How many categories at Tesco?", "category"),
+])
+def test_count_targets(question, distinct):
+    plan = parse(question)
+    assert (plan.metric, plan.distinct) == ("count", distinct)
+
+
+def test_income():
+    plan = parse("How much did I earn this year?")
+    assert (plan.metric, plan.sign, plan.date_from, plan.date_to) == ("sum", "income", datetime.date(2025, 1, 1), None)
+
+
+@pytest.mark.parametrize("question, group_by, rank_by, sign, top_n", [
+    ("Top 5 merchants by spending this year", "merchant", "amount", "expense", 5),
+    ("Which category has the most transactions?", "category", "count", None, 5),
+    ("Which merchant did I pay most often?", "merchant", "count", "expense", 5),
+    ("Top 3 categories by number of transactions", "category", "count", None, 3),
+    ("Top 80 stores", "merchant", "amount", "expense", 50),
+])
+def test_top(question, group_by, rank_by, sign, top_n):
+    plan = parse(question)
+    assert (plan.metric, plan.group_by, plan.rank_by, plan.sign, plan.top_n) == ("top", group_by, rank_by, sign, top_n)
+
+
+@pytest.mark.parametrize("question, start, end", [
+    ("spent in March 2024", datetime.date(2024, 3, 1), datetime.date(2024, 4, 1)),
+    ("spent in december", datetime.date(2024, 12, 1), datetime.date(2025, 1, 1)),    # most recent December
+    ("spent in may", datetime.date(2025, 5, 1), datetime.date(2025, 6, 1)),
+    ("I may have spent too much", None, None),
+    ("between 2025-01-01 and 2025-01-31", datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)),
+    ("past 2 weeks", datetime.date(2025, 6, 4), None),
+    ("last year", datetime.date(2024, 1, 1), datetime.date(2025, 1, 1)),
+    ("during 2023", datetime.date(2023, 1, 1), datetime.date(2024, 1, 1)),
+])
+def test_dates(question, start, end):
+    assert Q.parse_dates(question, TODAY) == (start, end)
+
+
+def test_top_by_count_and_by_amount(db):
+    # Uber: 3 small rides; Tesco: 1 large shop
+    insert(db, [row(f"u{i}", "2025-06-01", -5.0, merchant="Uber", category="Transport") for i in range(3)]
+           + [row("t1", "2025-06-02", -100.0, merchant="Tesco", category="Groceries"),
+              row("s1", "2025-06-02", 900.0, merchant="ACME", category="Income")])
+    by_count = Q.run_plan(parse("Which merchant has the most transactions?"))
+    assert [(f["merchant"], f["transactions"]) for f in by_count["figures"]] == [("Uber", 3), ("ACME", 1), ("Tesco", 1)]
+    assert by_count["answer"].startswith("Top 3 merchants by number of transactions")
+    by_amount = Q.run_plan(parse("Top 2 merchants by spending"))
+    assert by_amount["figures"] == [{"merchant": "Tesco", "total": 100.0, "transactions": 1},
+                                    {"merchant": "Uber", "total": 15.0, "transactions": 3}]
+
+
+def test_sum_answer(db):
+    insert(db, [row("a", "2025-05-03", -12.5, category="Food"), row("b", "2025-05-20", -7.5, category="food"),
+                row("c", "2025-06-01", -50.0, category="Food")])
+    result = Q.run_plan(parse("How much did I spend on Food last month?"))
+    assert result["figures"] == {"total": 20.0, "average": 10.0, "transactions": 2}
+    assert result["answer"] == ("You spent 20.00 on Food from 2025-05-01 to 2025-05-31 "
+                                "(all currencies, unconverted) across 2 transactions.")
+
+
+def test_distinct_count(db):
+    insert(db, [row("a", "2025-06-01", -5.0, merchant="Uber", category="Transport"),
+                row("b", "2025-06-02", -6.0, merchant="uber", category="Transport"),
+                row("c", "2025-06-03", -7.0, merchant="Tesco", category="Groceries"),
+                row("d", "2025-06-04", -8.0, category="Groceries"),
+                row("e", "2025-06-05", 900.0, merchant="ACME", category="Income")])
+    result = Q.run_plan(parse("How many merchants did I pay?"))
+    # case-insensitive, like the merchant filters; no merchant is not one; income is not paid
+    assert result["figures"] == {"merchants": 2}
+    assert result["answer"] == "Your transactions span 2 merchants."
+    assert Q.run_plan(parse("How many categories at Tesco?"))["figures"] == {"categories": 1}
+
+
+def test_vocabulary_follows_the_counts(db):
+    insert(db, [row("a", "2025-06-01", -5.0, merchant="Uber", category="Transport"),
+                row("b", "2025-06-02", -6.0, merchant="Tesco"), row("c", "2025-06-03", -7.0)])
+    assert sorted(_vocabulary()["merchants"]) == ["Tesco", "Uber"]
+    with db.write() as conn:
+        conn.execute("DELETE FROM transactions WHERE id = 'b'")
+    vocab = _vocabulary()
+    assert (vocab["merchants"], vocab["categories"]) == (["Uber"], ["Transport"])
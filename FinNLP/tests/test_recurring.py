@@ -0,0 +1,78 @@
+"""Recurring series detection and the upcoming charges derived from it."""
+
+import datetime
+
+import pytest
+from conftest import insert, row
+
+import Recurring
+
+
+def _monthly(day: int, months: int, start=(2024, 11)) -> list:
+    year, month = start
+    dates = []
+    for k in range(months):
+        y, m = year + (month - 1 + k) // 12, (month - 1 + k) % 12 + 1
+        dates.append(datetime.date(y, m, day))
+    return dates
+
+
+def _rows(merchant, category, amounts, dates) -> list:
+    if not isinstance(amounts, list):
+        amounts = [amounts] * len(dates)
+    return [row(f"{merchant}-{i}", d.isoformat(), a, merchant=merchant, category=category)
+            for i, (a, d) in enumerate(zip(amounts, dates))]
+
+
+@pytest.fixture
+def series(db):
+    end = datetime.date(2025, 10, 1)
+    insert(db, (
+        _rows("Netflix", "Entertainment", -10.99, _monthly(15, 11))                    # 2024-11-15 .. 2025-09-15
+        + _rows("Gym", "Health", -12.0, [end - datetime.timedelta(weeks=k) for k in range(10)])
+        + _rows("ACME", "Income", 2500.0, _monthly(28, 11))
+        + _rows("Amazon Prime", "Shopping", -95.0, [datetime.date(2023, 11, 3), datetime.date(2024, 11, 4)])
+        # both sides of a band edge (1.5^6 = 11.39): still one series
+        + _rows("Spotify", "Entertainment", [-11.2, -11.6] * 5, _monthly(3, 10, start=(2024, 12)))
+        + _rows("Taxi", "Transport", -15.0, [datetime.date(2025, 1, d) for d in (1, 3, 4, 9, 20, 21, 30)])
+        + _rows("Old sub", "Entertainment", -5.0, _monthly(1, 5, start=(2024, 1)))
+    ))
+    return {r["merchant"]: r for r in Recurring.recurring(as_of="2025-10-01", horizon=40, target="GBP")["series"]}
+
+
+def test_periods(series):
+    assert {m: s["period"] for m, s in series.items()} == {
+        "Netflix": "monthly", "Gym": "weekly", "ACME": "monthly", "Amazon Prime": "annual",
+        "Spotify": "monthly", "Old sub": "monthly",
+    }
+
+
+def test_fixed_monthly_charge(series):
+    netflix = series["Netflix"]
+    assert (netflix["amount"], netflix["occurrences"], netflix["confidence"]) == (-10.99, 11, 1.0)
+    assert (netflix["first"], netflix["last"], netflix["active"]) == ("2024-11-15", "2025-09-15", True)
+
+
+def test_varying_amount_lowers_confidence(series):
+    spotify = series["Spotify"]
+    assert spotify["occurrences"] == 10
+    assert spotify["amount"] == -11.4
+    # cv = 0.2 / 11.4 → stability 1 - 0.5 * cv / CV_LIMIT
+    assert spotify["confidence"] == pytest.approx(1 - 0.5 * (0.2 / 11.4) / Recurring.CV_LIMIT, abs=0.01)
+
+
+def test_stale_series_is_inactive(series):
+    assert series["Old sub"]["active"] is False
+    assert series["Gym"]["active"] is True
+
+
+def test_upcoming_and_committed(db, series):
+    result = Recurring.recurring(as_of="2025-10-01", horizon=40, target="GBP")
+    upcoming = [(u["date"], u["merchant"]) for u in result["upcoming"] if u["merchant"] in ("Netflix", "ACME")]
+    # the next Netflix charge after 2025-10-15 (2025-11-15) is past the horizon
+    assert upcoming == [("2025-10-15", "Netflix"), ("2025-10-28", "ACME")]
+    gym = [u["date"] for u in result["upcoming"] if u["merchant"] == "Gym"]
+    assert gym == ["2025-10-08", "2025-10-15", "2025-10-22", "2025-10-29", "2025-11-05"]
+    # active expenses per month: Netflix, Gym (weekly), Spotify, Amazon Prime (annual); Old sub is stale
+    assert result["monthly_committed"] == pytest.approx(10.99 + 12.0 * 365.25 / 7 / 12 + 11.4 + 95.0 / 12, abs=0.01)
+    assert result["monthly_income"] == 2500.0
@@ -0,0 +1,71 @@
+"""Parameterized WHERE clauses of /transactions/filter: FTS, LIKE escaping and index modes."""
+
+import pytest
+from conftest import insert, row
+
+from Search import build_filter
+
+ROWS = [
+    row("a", "2025-01-01", -1.0, description="Weekly shop", merchant="Tesco", category="Groceries"),
+    row("b", "2025-01-01", -1.0, description="Meal deal", merchant="Tesco Express", category="Food"),
+    row("c", "2025-01-01", -1.0, description="Latest issue", merchant="Newsagent", category="Shopping"),
+    row("d", "2025-01-01", -1.0, description="Voucher", merchant="100% Fresh", category="Food"),
+    row("e", "2025-01-01", -1.0, description="Parking", merchant="A_B Car Parks", category="Transport"),
+    row("f", "2025-01-01", -1.0, description='The "Big" Shop', merchant="AxB Motors", category="Transport"),
+]
+
+
+def search(shard, fields: dict, mode: str = "substring") -> list:
+    where, params = build_filter(fields, mode)
+    with shard.read() as conn:
+        return [r[0] for r in conn.execute(f"SELECT id FROM transactions WHERE {where} ORDER BY id", params)]
+
+
+@pytest.fixture
+def shard(db):
+    insert(db, ROWS)
+    return db
+
+
+@pytest.mark.parametrize("fields, expected", [
+    ({"merchant": "tesco"}, ["a", "b"]),                 # trigram FTS, case-insensitive
+    ({"merchant": "sco"}, ["a", "b"]),
+    ({"category": "food", "merchant": "express"}, ["b"]),
+    ({"description": "shop"}, ["a", "f"]),
+    ({"description": '"big"'}, ["f"]),                   # quotes stay inside the phrase
+    ({"merchant": "%"}, ["d"]),                          # short terms: LIKE with % and _ escaped
+    ({"merchant": "_"}, ["e"]),
+    ({"merchant": "x'); DROP TABLE transactions; --"}, []),
+    ({"merchant": None, "category": ""}, ["a", "b", "c", "d", "e", "f"]),
+])
+def test_substring(shard, fields, expected):
+    assert search(shard, fields) == expected
+
+
+@pytest.mark.parametrize("mode, term, expected", [
+    ("exact", "tesco", ["a"]),
+    ("exact", "Tesco Ex", []),
+    ("prefix", "TES", ["a", "b"]),
+    ("prefix", "a_", ["e"]),                             # no wildcard in a range scan
+    ("substring", "tes", ["a", "b"]),
+])
+def test_modes(shard, mode, term, expected):
+    assert search(shard, {"merchant": term}, mode) == expected
+
+
+def test_description_is_always_substring(shard):
+    assert search(shard, {"description": "deal", "merchant": "tesco express"}, "exact") == ["b"]
+
+
+def test_exact_and_prefix_use_the_index(shard):
+    for mode in ("exact", "prefix"):
+        where, params = build_filter({"merchant": "Tesco"}, mode)
+        with shard.read() as conn:
+            plan = " ".join(r[-1] for r in conn.execute(f"EXPLAIN QUERY PLAN SELECT id FROM transactions WHERE {where}",
+                                                        params))
+        assert "idx_tx_merchant" in plan
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        build_filter({"merchant": "x"}, "regex")
@@ -0,0 +1,54 @@
+"""Tenant resolution by TenantMiddleware and isolation between shards."""
+
+import pytest
+from conftest import insert, row
+
+from Database import UnknownTenant, current_tenant, router
+
+
+@pytest.fixture
+def other(db):
+    """A second tenant with one transaction of its own."""
+    shard = router.get("tenant-b", create=True)
+    with shard.write() as conn:
+        conn.execute("DELETE FROM transactions")
+    insert(shard, [row("b1", "2025-01-02", -9.0, merchant="Other shop")])
+    return shard
+
+
+def test_shards_are_isolated(db, client, other):
+    insert(db, [row("a1", "2025-01-01", -5.0, merchant="Tesco"), row("a2", "2025-01-02", -6.0, merchant="Tesco")])
+    mine = client.get("/transactions")
+    assert {t["id"] for t in mine.json()} == {"a1", "a2"}
+    theirs = client.get("/transactions", headers={"X-Tenant-ID": "tenant-b"})
+    assert [t["id"] for t in theirs.json()] == ["b1"]
+    # separate files: separate data versions, so cached responses never cross tenants
+    assert db.path != other.path
+    assert mine.headers["etag"] != theirs.headers["etag"]
+
+
+def test_header_is_case_insensitive(client, other):
+    response = client.get("/transactions", headers={"X-Tenant-ID": " Tenant-B "})
+    assert [t["id"] for t in response.json()] == ["b1"]
+
+
+def test_unknown_tenant(client, monkeypatch):
+    monkeypatch.setattr(router, "autocreate", False)
+    response = client.get("/transactions", headers={"X-Tenant-ID": "nobody"})
+    assert response.status_code == 404
+    with pytest.raises(UnknownTenant):
+        router.get("nobody")
+
+
+@pytest.mark.parametrize("tenant", ["../default", "-dash", "x" * 64])
+def test_invalid_tenant(client, tenant):
+    assert client.get("/transactions", headers={"X-Tenant-ID": tenant}).status_code == 400
+
+
+def test_exempt_paths_ignore_the_header(client):
+    assert client.get("/healthz", headers={"X-Tenant-ID": "../bad"}).status_code == 200
+
+
+def test_current_tenant_follows_the_fixture(db):
+    assert router.get() is db
+    assert current_tenant.get().startswith("test-")